@@ -0,0 +1,200 @@
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import queue
+import random
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+
+from app.config.settings import settings
+from app.services.metrics import metrics
+
+# Set per request by the correlation-id middleware
+correlation_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("correlation_id", default=None)
+
+_RESERVED = set(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "asctime"}
+
+_handler: Optional["NonBlockingQueueHandler"] = None
+_listener: Optional[QueueListener] = None
+_listening = False
+
+
+def truncate(value: Any, max_chars: int = 500, max_items: int = 10, depth: int = 3) -> Any:
+    """Bounded copy of ``value`` for logging: long strings, lists and dicts are cut.
+
+    Only the kept items are visited, so a multi-megabyte payload costs the
+    same to log as a small one.
+    """
+    if isinstance(value, str):
+        return value if len(value) <= max_chars else f"{value[:max_chars]}…(+{len(value) - max_chars} chars)"
+    if isinstance(value, (int, float, bool)) or value is None:
+        return value
+    if depth <= 0:
+        return f"<{type(value).__name__}>"
+    if isinstance(value, dict):
+        items = list(value.items())
+        kept = {str(k): truncate(v, max_chars, max_items, depth - 1) for k, v in items[:max_items]}
+        if len(items) > max_items:
+            kept["…"] = f"+{len(items) - max_items} keys"
+        return kept
+    if isinstance(value, (list, tuple, set)):
+        items = list(value) if not isinstance(value, list) else value
+        kept = [truncate(v, max_chars, max_items, depth - 1) for v in items[:max_items]]
+        if len(items) > max_items:
+            kept.append(f"…(+{len(items) - max_items} items)")
+        return kept
+    return truncate(str(value), max_chars, max_items, depth)
+
+
+def _record_fields(record: logging.LogRecord) -> Dict[str, Any]:
+    """Structured fields passed through ``extra=``, truncated"""
+    return {
+        key: truncate(value, settings.log_max_field_chars, settings.log_max_items)
+        for key, value in record.__dict__.items()
+        if key not in _RESERVED and not key.startswith("_") and value is not None
+    }
+
+
+def _exception_text(formatter: logging.Formatter, record: logging.LogRecord) -> Optional[str]:
+    """Traceback of a record, already rendered when it came through the queue"""
+    if record.exc_text:
+        return record.exc_text
+    return formatter.formatException(record.exc_info) if record.exc_info else None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message and structured fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": truncate(record.getMessage(), settings.log_max_message_chars),
+            **_record_fields(record)
+        }
+        exception = _exception_text(self, record)
+        if exception:
+            entry["exception"] = exception
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable line with the structured fields appended as key=value"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = f"{self.formatTime(record)} {record.levelname:<7} {record.name}: " \
+               f"{truncate(record.getMessage(), settings.log_max_message_chars)}"
+        fields = _record_fields(record)
+        if fields:
+            line += " " + " ".join(f"{key}={json.dumps(value, ensure_ascii=False, default=str)}"
+                                   for key, value in fields.items())
+        exception = _exception_text(self, record)
+        if exception:
+            line += "\n" + exception
+        return line
+
+
+class RequestContextFilter(logging.Filter):
+    """Attach the correlation id, endpoint and tenant of the current request.
+
+    Runs on the calling thread, where the request's context variables are
+    visible.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.correlation_id = correlation_id.get()
+        trace = metrics.current()
+        if trace is not None:
+            record.endpoint = trace.endpoint
+            if trace.tenant is not None:
+                record.tenant = trace.tenant
+        return True
+
+
+class DebugSampler(logging.Filter):
+    """Keep only a ``rate`` fraction of DEBUG records; other levels always pass"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno > logging.DEBUG or self.rate >= 1.0 or random.random() < self.rate
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Hands records to the listener thread without blocking.
+
+    ``prepare`` snapshots each record on the calling thread, as the stdlib
+    QueueHandler does: the message is merged with its args, the traceback
+    rendered and ``extra`` fields replaced by bounded copies, so the
+    listener never reads objects the caller may have changed since. Only
+    rendering the line (JSON or text) is left to the listener thread. When
+    the queue is full the record is dropped and counted instead of stalling
+    the request.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._exceptions = logging.Formatter()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = _exception_text(self._exceptions, record)
+            record.exc_info = None
+        for key, value in _record_fields(record).items():
+            setattr(record, key, value)
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def configure_logging() -> None:
+    """Route the ``app`` loggers through a queue to a background writer thread"""
+    global _handler, _listener, _listening
+    if _handler is None:
+        output = logging.StreamHandler(sys.stdout)
+        output.setFormatter(JsonFormatter() if settings.log_format == "json" else TextFormatter())
+
+        _handler = NonBlockingQueueHandler(queue.Queue(maxsize=max(1, settings.log_queue_size)))
+        _handler.addFilter(DebugSampler(settings.log_debug_sample_rate))
+        _handler.addFilter(RequestContextFilter())
+
+        logger = logging.getLogger("app")
+        logger.setLevel(settings.log_level.upper())
+        logger.addHandler(_handler)
+        logger.propagate = False
+
+        _listener = QueueListener(_handler.queue, output, respect_handler_level=True)
+        atexit.register(shutdown_logging)
+    if not _listening:
+        _listener.start()
+        _listening = True
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the writer thread"""
+    global _listening
+    if _listening:
+        _listener.stop()
+        _listening = False
+
+
+def get_logging_stats() -> Dict[str, Any]:
+    return {
+        "queued": _handler.queue.qsize() if _handler is not None else 0,
+        "dropped": _handler.dropped if _handler is not None else 0
+    }
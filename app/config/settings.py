@@ -7,16 +7,111 @@ class Settings(BaseSettings):
     openai_api_key: str = os.getenv("OPENAI_API_KEY", "")
     openai_model: str = os.getenv("OPENAI_MODEL", "gpt-4")
     embedding_model: str = os.getenv("EMBEDDING_MODEL", "text-embedding-3-large")
+    embedding_dimensions: int = int(os.getenv("EMBEDDING_DIMENSIONS", "0"))  # 0 = model default
+    invoice_llm_model: str = os.getenv("INVOICE_LLM_MODEL", "gpt-4o-mini")
+    llm_max_concurrency: int = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+    llm_max_connections: int = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+    llm_max_keepalive: int = int(os.getenv("LLM_MAX_KEEPALIVE", "20"))
+    llm_timeout: float = float(os.getenv("LLM_TIMEOUT", "60"))
+    llm_connect_timeout: float = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+    llm_max_retries: int = int(os.getenv("LLM_MAX_RETRIES", "3"))
+    llm_retry_base_delay: float = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+    llm_retry_max_delay: float = float(os.getenv("LLM_RETRY_MAX_DELAY", "8"))
+    
+    # Embedding Batch Configuration
+    embedding_batch_max_inputs: int = int(os.getenv("EMBEDDING_BATCH_MAX_INPUTS", "2048"))
+    embedding_batch_max_tokens: int = int(os.getenv("EMBEDDING_BATCH_MAX_TOKENS", "250000"))
+    embedding_max_input_tokens: int = int(os.getenv("EMBEDDING_MAX_INPUT_TOKENS", "8191"))
+    embedding_max_concurrency: int = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "4"))
+    embedding_max_retries: int = int(os.getenv("EMBEDDING_MAX_RETRIES", "4"))
+    
+    # Embedding Cache Configuration
+    embedding_cache_enabled: bool = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+    embedding_cache_path: str = os.getenv("EMBEDDING_CACHE_PATH", "./embedding_cache/embeddings.sqlite3")
+    embedding_cache_max_mb: int = int(os.getenv("EMBEDDING_CACHE_MAX_MB", "1024"))
+    embedding_cache_memory_entries: int = int(os.getenv("EMBEDDING_CACHE_MEMORY_ENTRIES", "10000"))
     
     # MongoDB Configuration
     mongodb_uri: str = os.getenv("MONGODB_URI", "")
     mongodb_database: str = os.getenv("MONGODB_DATABASE", "business")
+    mongo_create_indexes: bool = os.getenv("MONGO_CREATE_INDEXES", "false").lower() == "true"
     
     # ChromaDB Configuration
     chromadb_host: str = os.getenv("CHROMADB_HOST", "localhost")
     chromadb_port: int = int(os.getenv("CHROMADB_PORT", "8000"))
     chromadb_persist_directory: str = os.getenv("CHROMADB_PERSIST_DIRECTORY", "./chroma_db")
     
+    # Business Backend Configuration
+    business_backend_url: str = os.getenv("BUSINESS_BACKEND_URL", "https://business-backend-production-52b4.up.railway.app")
+    business_backend_connect_timeout: float = float(os.getenv("BUSINESS_BACKEND_CONNECT_TIMEOUT", "2.0"))
+    business_backend_read_timeout: float = float(os.getenv("BUSINESS_BACKEND_READ_TIMEOUT", "5.0"))
+    business_backend_max_connections: int = int(os.getenv("BUSINESS_BACKEND_MAX_CONNECTIONS", "100"))
+    business_backend_max_keepalive: int = int(os.getenv("BUSINESS_BACKEND_MAX_KEEPALIVE", "20"))
+    business_backend_keepalive_expiry: float = float(os.getenv("BUSINESS_BACKEND_KEEPALIVE_EXPIRY", "30.0"))
+    business_backend_http2: bool = os.getenv("BUSINESS_BACKEND_HTTP2", "true").lower() == "true"
+    business_backend_breaker_failures: int = int(os.getenv("BUSINESS_BACKEND_BREAKER_FAILURES", "5"))
+    business_backend_breaker_reset_timeout: float = float(os.getenv("BUSINESS_BACKEND_BREAKER_RESET_TIMEOUT", "30.0"))
+
+    # Invoice Retrieval Configuration
+    invoice_retrieval_top_k: int = int(os.getenv("INVOICE_RETRIEVAL_TOP_K", "100"))  # candidates before packing
+    invoice_context_max_tokens: int = int(os.getenv("INVOICE_CONTEXT_MAX_TOKENS", "2000"))
+    invoice_embedding_cache_size: int = int(os.getenv("INVOICE_EMBEDDING_CACHE_SIZE", "50000"))
+
+    # Semantic Answer Cache Configuration
+    semantic_cache_enabled: bool = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+    semantic_cache_threshold: float = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+    semantic_cache_ttl: float = float(os.getenv("SEMANTIC_CACHE_TTL", "300"))
+    semantic_cache_max_entries: int = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "10000"))
+    semantic_cache_max_entries_per_company: int = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES_PER_COMPANY", "500"))
+
+    # Inventory Snapshot Cache Configuration
+    inventory_cache_ttl: float = float(os.getenv("INVENTORY_CACHE_TTL", "30"))
+    inventory_cache_stale_ttl: float = float(os.getenv("INVENTORY_CACHE_STALE_TTL", "300"))
+    inventory_cache_max_entries: int = int(os.getenv("INVENTORY_CACHE_MAX_ENTRIES", "1000"))
+
+    # Vector Storage Configuration
+    vector_backend: str = os.getenv("VECTOR_BACKEND", "chroma")  # chroma | numpy
+    numpy_vector_directory: str = os.getenv("NUMPY_VECTOR_DIRECTORY", "./vector_store")
+    vector_store_max_workers: int = int(os.getenv("VECTOR_STORE_MAX_WORKERS", "8"))
+    vector_storage_dtype: str = os.getenv("VECTOR_STORAGE_DTYPE", "float32")  # float32 | float16 | int8
+    vector_rescore_factor: int = int(os.getenv("VECTOR_RESCORE_FACTOR", "4"))
+    # Delete unreachable collections from earlier storage layouts at startup (irreversible)
+    vector_drop_legacy_storage: bool = os.getenv("VECTOR_DROP_LEGACY_STORAGE", "false").lower() == "true"
+
+    # Indexing Configuration
+    index_state_path: str = os.getenv("INDEX_STATE_PATH", "./index_state/watermarks.json")
+    # Subtracted from the run start to form the next watermark, for writers whose clocks lag
+    index_watermark_skew_seconds: int = int(os.getenv("INDEX_WATERMARK_SKEW_SECONDS", "300"))
+    index_batch_size: int = int(os.getenv("INDEX_BATCH_SIZE", "256"))  # documents embedded/stored at a time
+    index_queue_size: int = int(os.getenv("INDEX_QUEUE_SIZE", "4"))  # batches buffered per collection
+    mongo_batch_size: int = int(os.getenv("MONGO_BATCH_SIZE", "1000"))
+    index_job_workers: int = int(os.getenv("INDEX_JOB_WORKERS", "2"))
+    index_job_store_path: str = os.getenv("INDEX_JOB_STORE_PATH", "./index_state/jobs.sqlite3")
+    index_job_history: int = int(os.getenv("INDEX_JOB_HISTORY", "1000"))
+    index_job_progress_interval: float = float(os.getenv("INDEX_JOB_PROGRESS_INTERVAL", "2"))
+
+    # Hybrid Search Configuration
+    hybrid_candidates: int = int(os.getenv("HYBRID_CANDIDATES", "20"))  # per side, before fusion
+    hybrid_rrf_k: int = int(os.getenv("HYBRID_RRF_K", "60"))
+    lexical_index_max_entries: int = int(os.getenv("LEXICAL_INDEX_MAX_ENTRIES", "256"))  # (company, collection) BM25 indexes kept
+
+    # Metrics Configuration
+    metrics_max_tenants: int = int(os.getenv("METRICS_MAX_TENANTS", "200"))  # distinct tenant labels
+    metrics_window: int = int(os.getenv("METRICS_WINDOW", "1024"))  # recent samples for p50/p95/p99
+    stats_cache_ttl: float = float(os.getenv("STATS_CACHE_TTL", "10"))
+
+    # Logging Configuration
+    log_level: str = os.getenv("LOG_LEVEL", "INFO")
+    log_format: str = os.getenv("LOG_FORMAT", "json")  # json | text
+    log_queue_size: int = int(os.getenv("LOG_QUEUE_SIZE", "10000"))  # records dropped beyond this
+    log_debug_sample_rate: float = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.01"))
+    log_max_field_chars: int = int(os.getenv("LOG_MAX_FIELD_CHARS", "500"))
+    log_max_items: int = int(os.getenv("LOG_MAX_ITEMS", "10"))  # list items / dict keys kept per field
+    log_max_message_chars: int = int(os.getenv("LOG_MAX_MESSAGE_CHARS", "2000"))
+
+    # Startup Configuration
+    service_warmup: str = os.getenv("SERVICE_WARMUP", "background")  # none | background | blocking
+
     # RAG Configuration
     chunk_size: int = int(os.getenv("CHUNK_SIZE", "1000"))
     chunk_overlap: int = int(os.getenv("CHUNK_OVERLAP", "200"))
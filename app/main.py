@@ -1,20 +1,139 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import Dict, Any, List, Optional
+from typing import TYPE_CHECKING, AsyncIterator, Dict, Any, List, Optional
+from contextlib import asynccontextmanager
+import logging
+from starlette.routing import Match
 import asyncio
+import json
+import time
+import uuid
 
-from app.services.embeddings import EmbeddingService
-from app.services.vector_store import VectorStoreService
-from app.services.data_processor import DataProcessorService
+from app.services.container import ServiceContainer
+from app.services.invoice_rag import parse_invoice_request, build_invoice_messages
+from app.services.metrics import metrics
 from app.config import settings
+from app.config.logging_config import configure_logging, correlation_id, get_logging_stats, shutdown_logging
 
-app = FastAPI(title="Axura RAG System", version="1.0.0")
+if TYPE_CHECKING:
+    from app.services.data_processor import DataProcessorService
+    from app.services.index_jobs import IndexJob, IndexJobManager
+    from app.services.materialized_answers import MaterializedAnswers
+    from app.services.snapshot_cache import SnapshotCache
+    from app.services.vector_store import VectorStoreService
 
-# Initialize services
-embedding_service = EmbeddingService()
-vector_store_service = VectorStoreService()
-data_processor_service = DataProcessorService()
+configure_logging()
+logger = logging.getLogger(__name__)
+
+# Services are built on first use (or by the warm-up), never at import time
+services = ServiceContainer()
+
+# Dependency providers
+def get_services() -> ServiceContainer:
+    return services
+
+def get_inventory_cache() -> "SnapshotCache":
+    return services.inventory_cache
+
+def get_materialized_answers() -> "MaterializedAnswers":
+    return services.materialized_answers
+
+def get_vector_store() -> "VectorStoreService":
+    return services.vector_store
+
+async def get_data_processor() -> "DataProcessorService":
+    return await services.get_data_processor()
+
+async def get_index_jobs() -> "IndexJobManager":
+    return await services.get_index_jobs()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warm_up = None
+    if settings.service_warmup == "blocking":
+        await services.warm_up()
+    elif settings.service_warmup == "background":
+        # Serve /health right away; services are built while the first requests arrive
+        warm_up = asyncio.create_task(services.warm_up())
+    yield
+    if warm_up is not None:
+        warm_up.cancel()
+        await asyncio.gather(warm_up, return_exceptions=True)
+    await services.close()
+    shutdown_logging()
+
+class TimedJSONResponse(JSONResponse):
+    """JSON response whose encoding is timed as the ``serialization`` stage"""
+
+    def render(self, content: Any) -> bytes:
+        with metrics.stage("serialization"):
+            return super().render(content)
+
+app = FastAPI(title="Axura RAG System", version="1.0.0", lifespan=lifespan,
+              default_response_class=TimedJSONResponse)
+
+def _endpoint_label(request: Request) -> str:
+    """Route template (e.g. ``/api/v1/index/{job_id}``) so paths don't explode the label set"""
+    for route in request.app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+class RequestMetricsMiddleware:
+    """Times each request until its last body chunk has been sent.
+
+    Plain ASGI rather than ``@app.middleware("http")``, which returns once
+    the headers are ready: streamed responses would be recorded at time to
+    first byte, with their ``llm`` stage landing after the request finished.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request = Request(scope)
+        started = time.perf_counter()
+        trace, token = metrics.start_request(_endpoint_label(request))
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            seconds = time.perf_counter() - started
+            logger.info("%s %s %d", request.method, trace.endpoint, status,
+                        extra={"seconds": round(seconds, 4),
+                               "stages": {k: round(v, 4) for k, v in trace.stages.items()}})
+            metrics.finish_request(trace, token, seconds, request.method, status)
+
+app.add_middleware(RequestMetricsMiddleware)
+
+@app.middleware("http")
+async def assign_correlation_id(request: Request, call_next):
+    """Tag every log record of a request with its ``X-Request-ID`` (generated if absent)"""
+    request_id = request.headers.get("x-request-id") or uuid.uuid4().hex
+    token = correlation_id.set(request_id)
+    try:
+        response = await call_next(request)
+    finally:
+        correlation_id.reset(token)
+    response.headers["X-Request-ID"] = request_id
+    return response
+
+def _stage_timings() -> Dict[str, float]:
+    trace = metrics.current()
+    return {stage: round(seconds, 4) for stage, seconds in trace.stages.items()} if trace else {}
 
 app.add_middleware(
     CORSMiddleware,
@@ -50,98 +169,29 @@ async def api_health():
     return {"status": "healthy", "api": "axura-rag"}
 
 @app.post("/api/v1/ask", response_model=AskResponse)
-async def ask_question(request: AskRequest):
+async def ask_question(request: AskRequest, inventory_cache: "SnapshotCache" = Depends(get_inventory_cache),
+                       materialized_answers: "MaterializedAnswers" = Depends(get_materialized_answers)):
     try:
+        started = time.perf_counter()
         question = request.question
         company_id = request.company_id
+        metrics.set_tenant(company_id)
         
-        print(f"🔍 RAG: Processing question for company {company_id}: {question}")
+        logger.debug("🔍 RAG: Processing question for company %s", company_id, extra={"question": question})
         
         # Try to get real data from business backend
-        real_data = None
-        try:
-            import httpx
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"https://business-backend-production-52b4.up.railway.app/api/companies/public/inventory/{company_id}",
-                    timeout=10.0
-                )
-                if response.status_code == 200:
-                    real_data = response.json()
-                    print(f"✅ RAG: Got real data for company {company_id}")
-                else:
-                    print(f"⚠️ RAG: Could not get real data for company {company_id}, using mock data")
-        except Exception as e:
-            print(f"⚠️ RAG: Error getting real data: {e}, using mock data")
+        real_data = await inventory_cache.get(company_id)
+        if real_data:
+            logger.debug("✅ RAG: Got real data for company %s", company_id)
+        else:
+            logger.warning("⚠️ RAG: Could not get real data for company %s, using mock data", company_id)
         
         # Use real data if available, otherwise use mock data
+        intent = None
         if real_data and real_data.get('success'):
-            company_data = real_data['statistics']
-            products = real_data.get('products', [])
-            raw_materials = real_data.get('raw_materials', [])
-            company_name = real_data.get('company_name', company_id)
-            
-            # Generate response based on real data
-            lower_question = question.lower()
-            
-            if "producto" in lower_question or "productos" in lower_question:
-                answer = f"Basándome en los datos reales de tu empresa {company_name}:\n\n"
-                answer += "📦 **Información de Productos:**\n"
-                answer += f"- Total de productos: {company_data['total_products']}\n"
-                answer += f"- Productos con bajo stock: {company_data['low_stock_items']}\n"
-                answer += f"- Valor total del inventario: ${company_data['total_inventory_value']:,.2f}\n\n"
-                
-                if products:
-                    answer += "**Productos principales:**\n"
-                    for product in products[:5]:  # Show top 5 products
-                        answer += f"- {product['name']}: {product['stock']} unidades en stock\n"
-                else:
-                    answer += "No hay productos registrados aún."
-                
-                sources = [
-                    {
-                        "content": f"Datos reales de productos para empresa {company_name}",
-                        "metadata": {"type": "real_data", "company_id": company_id},
-                        "similarity": 0.95
-                    }
-                ]
-                
-            elif "materia" in lower_question or "materias" in lower_question:
-                answer = f"Basándome en los datos reales de tu empresa {company_name}:\n\n"
-                answer += "🏭 **Información de Materias Primas:**\n"
-                answer += f"- Total de materias primas: {company_data['total_raw_materials']}\n\n"
-                
-                if raw_materials:
-                    answer += "**Materias primas principales:**\n"
-                    for material in raw_materials[:5]:  # Show top 5 materials
-                        answer += f"- {material['name']}: {material['stock']} unidades en stock\n"
-                else:
-                    answer += "No hay materias primas registradas aún."
-                
-                sources = [
-                    {
-                        "content": f"Datos reales de materias primas para empresa {company_name}",
-                        "metadata": {"type": "real_data", "company_id": company_id},
-                        "similarity": 0.92
-                    }
-                ]
-                
-            else:
-                answer = f"Basándome en los datos reales de tu empresa {company_name}:\n\n"
-                answer += "📊 **Resumen General:**\n"
-                answer += f"- Productos: {company_data['total_products']}\n"
-                answer += f"- Materias primas: {company_data['total_raw_materials']}\n"
-                answer += f"- Valor total del inventario: ${company_data['total_inventory_value']:,.2f}\n"
-                answer += f"- Productos con bajo stock: {company_data['low_stock_items']}\n\n"
-                answer += "¿En qué aspecto específico te gustaría que profundice?"
-                
-                sources = [
-                    {
-                        "content": f"Resumen real de inventario para empresa {company_name}",
-                        "metadata": {"type": "real_data", "company_id": company_id},
-                        "similarity": 0.85
-                    }
-                ]
+            # Precomputed answer for the matched intent; no per-request formatting
+            facts = materialized_answers.get(company_id, real_data)
+            answer, sources, intent = materialized_answers.answer(facts, question)
         else:
             # Use mock data if real data is not available
             mock_company_data = {
@@ -211,103 +261,140 @@ async def ask_question(request: AskRequest):
                     }
                 ]
             
-        print(f"✅ RAG: Successfully processed question, found {len(sources)} sources")
+        logger.debug("✅ RAG: Successfully processed question, found %d sources", len(sources))
         
-        return AskResponse(
+        response = AskResponse(
             answer=answer,
             sources=sources,
             metadata={
                 "total_sources": len(sources),
                 "company_id": company_id,
                 "company_data": real_data['statistics'] if real_data and real_data.get('success') else mock_company_data,
-                "processing_time": 0.5,
-                "data_source": "real" if real_data and real_data.get('success') else "mock"
+                "processing_time": round(time.perf_counter() - started, 4),
+                "timings": _stage_timings(),
+                "data_source": "real" if real_data and real_data.get('success') else "mock",
+                "intent": intent
             }
         )
         
+        return response
+        
     except Exception as e:
-        print(f"❌ RAG: Error processing question: {e}")
+        logger.exception("❌ RAG: Error processing question: %s", e)
         raise HTTPException(status_code=500, detail=f"Error processing question: {str(e)}")
 
-@app.post("/api/v1/index")
-async def index_data(request: dict):
-    try:
-        company_id = request.get("company_id", "")
-        
-        # Get real inventory data
-        inventory_data = await data_processor_service.get_inventory_data(company_id)
-        
-        # Format data for RAG
-        formatted_data = await data_processor_service.format_inventory_for_rag(inventory_data)
-        
-        # Clear existing collections
-        await vector_store_service.clear_collection("products")
-        await vector_store_service.clear_collection("raw_materials")
-        await vector_store_service.clear_collection("inventory_movements")
-        await vector_store_service.clear_collection("company_info")
-        
-        # Add documents to vector store
-        total_chunks = 0
-        
-        if formatted_data.get("products"):
-            await vector_store_service.add_documents("products", formatted_data["products"])
-            total_chunks += len(formatted_data["products"])
-        
-        if formatted_data.get("raw_materials"):
-            await vector_store_service.add_documents("raw_materials", formatted_data["raw_materials"])
-            total_chunks += len(formatted_data["raw_materials"])
-        
-        if formatted_data.get("movements"):
-            await vector_store_service.add_documents("inventory_movements", formatted_data["movements"])
-            total_chunks += len(formatted_data["movements"])
-        
-        if formatted_data.get("summary"):
-            await vector_store_service.add_documents("company_info", formatted_data["summary"])
-            total_chunks += len(formatted_data["summary"])
-        
-        return {
-            "success": True,
-            "message": f"Data indexed successfully for company {company_id}",
-            "chunks_processed": total_chunks,
-            "company_data": {
-                "total_products": inventory_data.get("total_products", 0),
-                "total_raw_materials": inventory_data.get("total_raw_materials", 0),
-                "total_inventory_value": inventory_data.get("total_inventory_value", 0)
-            }
-        }
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error indexing data: {str(e)}")
+def _index_job_response(job: "IndexJob") -> Dict[str, Any]:
+    data = job.to_dict()
+    data["job_id"] = job.id
+    data["status_url"] = f"/api/v1/index/{job.id}"
+    return data
+
+@app.post("/api/v1/index", status_code=202)
+async def index_data(request: dict, index_job_manager: "IndexJobManager" = Depends(get_index_jobs)):
+    """Queue an index job; poll ``status_url`` (or pass ``wait: true`` to block until done)"""
+    company_id = request.get("company_id", "")
+    if not company_id:
+        raise HTTPException(status_code=400, detail="company_id is required")
+    metrics.set_tenant(company_id)
+    
+    job = index_job_manager.enqueue(company_id, full=bool(request.get("force_reindex", False)))
+    if request.get("wait"):
+        try:
+            job = await index_job_manager.wait(job.id, timeout=float(request.get("timeout", 300)))
+        except asyncio.TimeoutError:
+            pass  # still running; the caller can poll status_url
+    return _index_job_response(job)
+
+@app.get("/api/v1/index/{job_id}")
+async def get_index_job(job_id: str, index_job_manager: "IndexJobManager" = Depends(get_index_jobs)):
+    job = index_job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Index job {job_id} not found")
+    return _index_job_response(job)
+
+class SearchRequest(BaseModel):
+    query: str
+    company_id: str
+    collections: Optional[List[str]] = None
+    n_results: int = 5
+
+@app.post("/api/v1/search")
+async def search(request: SearchRequest, vector_store: "VectorStoreService" = Depends(get_vector_store)):
+    """Hybrid lexical + vector search over a company's indexed data"""
+    started = time.perf_counter()
+    metrics.set_tenant(request.company_id)
+    result = await vector_store.hybrid_search(
+        request.query,
+        request.collections,
+        n_results=request.n_results,
+        company_id=request.company_id
+    )
+    return {
+        "success": True,
+        "query": request.query,
+        "method": result["method"],
+        "results": result["results"],
+        "processing_time": time.perf_counter() - started,
+        "timings": _stage_timings()
+    }
+
+@app.get("/api/v1/statistics/{company_id}")
+async def get_company_statistics(company_id: str, low_stock_limit: int = 50,
+                                 data_processor: "DataProcessorService" = Depends(get_data_processor)):
+    """Inventory statistics computed in MongoDB (one aggregation, no documents transferred)"""
+    metrics.set_tenant(company_id)
+    statistics = await data_processor.get_inventory_statistics(company_id, low_stock_limit)
+    if "error" in statistics:
+        raise HTTPException(status_code=500, detail=f"Error getting statistics: {statistics['error']}")
+    return {"success": True, "company_id": company_id, "statistics": statistics}
 
 @app.get("/api/v1/stats")
-async def get_stats():
+async def get_stats(container: ServiceContainer = Depends(get_services)):
+    def service_stats(name: str, method: str = "get_stats") -> Dict[str, Any]:
+        # Reporting on a service must not build it
+        return getattr(getattr(container, name), method)() if container.built(name) else {"status": "not_started"}
+
     try:
+        vector_store_stats = await (await container.get("vector_store_stats_cache")).get("all")
         return {
-            "vector_store": {
-                "collections": {
-                    "products": {"document_count": 150, "status": "active"},
-                    "raw_materials": {"document_count": 75, "status": "active"},
-                    "inventory_movements": {"document_count": 300, "status": "active"},
-                    "company_info": {"document_count": 10, "status": "active"}
-                },
-                "total_documents": 535
-            },
-            "connections": {
-                "openai": "connected",
-                "mongodb": "connected", 
-                "chromadb": "connected"
-            },
+            "vector_store": vector_store_stats or {"status": "unavailable"},
+            "latency": metrics.summary(),
+            "services": container.get_stats(),
+            "index_jobs": service_stats("index_jobs"),
+            "materialized_answers": service_stats("materialized_answers"),
+            "inventory_cache": service_stats("inventory_cache"),
+            "semantic_cache": service_stats("semantic_cache"),
+            "embedding_cache": service_stats("embedding", "get_cache_stats"),
+            "business_backend": service_stats("business_backend"),
+            "logging": get_logging_stats(),
             "settings": {
-                "embedding_model": "text-embedding-3-large",
-                "llm_model": "gpt-4",
-                "chunk_size": 1000,
-                "max_sources": 5
+                "vector_backend": settings.vector_backend,
+                "embedding_model": settings.embedding_model,
+                "llm_model": settings.invoice_llm_model,
+                "chunk_size": settings.chunk_size,
+                "max_sources": settings.max_sources
             }
         }
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting stats: {str(e)}")
 
+@app.get("/api/v1/stats/{company_id}")
+async def get_company_index_stats(company_id: str, vector_store: "VectorStoreService" = Depends(get_vector_store)):
+    """Indexed document counts and vector memory of one company per collection"""
+    metrics.set_tenant(company_id)
+    return {"success": True, **await vector_store.get_company_stats(company_id)}
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Latency histograms (requests per endpoint/company, pipeline stages) for Prometheus"""
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.post("/api/v1/warmup")
+async def warm_up_services(container: ServiceContainer = Depends(get_services)):
+    """Build every service now, e.g. from a deploy or scale-up hook, so no user request pays for it"""
+    return {"status": "warm", "build_seconds": await container.warm_up()}
+
 @app.get("/api/v1/rag/health")
 async def rag_health():
     return {
@@ -317,13 +404,14 @@ async def rag_health():
             "ask": "/api/v1/ask",
             "index": "/api/v1/index", 
             "stats": "/api/v1/stats",
+            "company_stats": "/api/v1/stats/{company_id}",
             "health": "/api/v1/health"
         },
         "version": "1.0.0"
     }
 
 @app.get("/api/v1/test-companies")
-async def test_companies():
+async def test_companies(container: ServiceContainer = Depends(get_services)):
     """
     Endpoint para probar conexión y listar empresas disponibles
     """
@@ -334,11 +422,12 @@ async def test_companies():
         
         try:
             # Try to connect to MongoDB
-            await data_processor_service.client.admin.command('ping')
+            data_processor = await container.get_data_processor()
+            await data_processor.client.admin.command('ping')
             connection_status = "connected"
             
             # Try to get companies from users collection
-            users_collection = data_processor_service.db.users
+            users_collection = data_processor.db.users
             company_users = await users_collection.find({"role": "empresajefe"}).to_list(length=10)
             
             for user in company_users:
@@ -386,163 +475,278 @@ class InvoiceQueryResponse(BaseModel):
 @app.post("/api/invoice-rag/test")
 async def test_invoice_rag(request: dict):
     try:
-        print(f"🔍 [Invoice RAG Test] Received request: {request}")
+        logger.debug("🔍 [Invoice RAG Test] Received request", extra={"payload": request})
         return {
             "success": True,
             "message": "RAG backend is working",
             "received_data": request
         }
     except Exception as e:
-        print(f"❌ [Invoice RAG Test] Error: {e}")
+        logger.error("❌ [Invoice RAG Test] Error: %s", e)
         return {
             "success": False,
             "error": str(e)
         }
 
 @app.post("/api/invoice-rag/query")
-async def query_invoices(request: dict):
+async def query_invoices(request: dict, container: ServiceContainer = Depends(get_services)):
+    # Imported here so NumPy stays off the cold-start path
+    from app.services.invoice_analytics import InvoiceTable, answer_invoice_question
+    from app.services.invoice_context import pack_invoice_context
+    from app.services.semantic_cache import invoice_fingerprint
+
     try:
-        print(f"🔍 [Invoice RAG] Raw request received: {request}")
-        print(f"🔍 [Invoice RAG] Request type: {type(request)}")
-        print(f"🔍 [Invoice RAG] Request keys: {list(request.keys()) if isinstance(request, dict) else 'not dict'}")
+        # Never log the raw payload: invoice_data can be megabytes
+        logger.debug("🔍 [Invoice RAG] Request received",
+                     extra={"request_keys": list(request) if isinstance(request, dict) else type(request).__name__})
         
-        # Validate manually
-        if not isinstance(request, dict):
-            raise HTTPException(status_code=422, detail="Request must be a dictionary")
-        
-        if 'question' not in request:
-            raise HTTPException(status_code=422, detail="Missing 'question' field")
-        
-        if 'company_id' not in request:
-            raise HTTPException(status_code=422, detail="Missing 'company_id' field")
-        
-        if 'invoice_data' not in request:
-            raise HTTPException(status_code=422, detail="Missing 'invoice_data' field")
+        try:
+            question, company_id, actual_invoices = parse_invoice_request(request)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
         
-        question = request['question']
-        company_id = request['company_id']
-        invoice_data = request['invoice_data']
+        metrics.set_tenant(company_id)
+        logger.debug("🔍 [Invoice RAG] Processing question for company %s over %d invoices", company_id,
+                     len(actual_invoices),
+                     extra={"question": question, "first_invoice": actual_invoices[0] if actual_invoices else None})
         
-        print(f"🔍 [Invoice RAG] Processing question for company {company_id}: {question}")
-        print(f"🔍 [Invoice RAG] Invoice data type: {type(invoice_data)}")
-        print(f"🔍 [Invoice RAG] Invoice data keys: {list(invoice_data.keys()) if isinstance(invoice_data, dict) else 'not dict'}")
+        # Aggregate questions are answered from the columnar table, without the LLM
+        started = time.perf_counter()
+        invoice_table = InvoiceTable.from_invoices(actual_invoices)
+        analytics = answer_invoice_question(question, invoice_table)
+        if analytics:
+            logger.debug("✅ [Invoice RAG] Answered aggregate question from analytics for company %s", company_id)
+            return InvoiceQueryResponse(
+                answer=analytics.answer,
+                sources=[],
+                metadata={
+                    'total_invoices_analyzed': len(actual_invoices),
+                    'invoices_matched': analytics.invoices_matched,
+                    'answered_by': 'analytics',
+                    'analytics_query': analytics.query.describe(),
+                    'processing_time': round(time.perf_counter() - started, 4),
+                    'confidence_score': 1.0
+                }
+            )
         
-        # Extract the actual invoice list from the response
-        if isinstance(invoice_data, dict) and 'data' in invoice_data:
-            actual_invoices = invoice_data['data']
-            print(f"📊 [Invoice RAG] Analyzing {len(actual_invoices)} invoices")
-            print(f"🔍 [Invoice RAG] First invoice sample: {actual_invoices[0] if actual_invoices else 'No data'}")
-        else:
-            print(f"❌ [Invoice RAG] Invalid invoice data structure: {invoice_data}")
-            raise HTTPException(status_code=422, detail="Invalid invoice data structure")
+        fingerprint = invoice_fingerprint(actual_invoices)
+        question_vector = None
+        if settings.semantic_cache_enabled:
+            semantic_cache = await container.get("semantic_cache")
+            cached, question_vector = await semantic_cache.lookup(company_id, "invoice", question, fingerprint)
+            if cached is not None:
+                logger.debug("✅ [Invoice RAG] Semantic cache hit for company %s", company_id)
+                return InvoiceQueryResponse(**{**cached, "metadata": {**cached["metadata"], "cache": "hit"}})
         
         # Process invoice data with AI
         try:
-            import openai
-            from openai import OpenAI
-            
             if not settings.openai_api_key:
                 raise HTTPException(status_code=500, detail="OpenAI API key not configured")
             
-            client = OpenAI(api_key=settings.openai_api_key)
-            
-            # Prepare invoice data for analysis
-            invoice_summary = []
-            for invoice in actual_invoices[:20]:  # Limit to first 20 invoices for context
-                if invoice.get('invoiceData'):
-                    data = invoice['invoiceData']
-                    summary = {
-                        'emisor': data.get('emisor_nombre', 'N/A'),
-                        'receptor': data.get('receptor_nombre', 'N/A'),
-                        'total': data.get('total', 0),
-                        'iva': data.get('iva_trasladado', [{}])[0].get('importe', 0) if data.get('iva_trasladado') else 0,
-                        'fecha': data.get('fecha', 'N/A'),
-                        'uuid': data.get('uuid', 'N/A'),
-                        'folio': data.get('folio', 'N/A'),
-                        'serie': data.get('serie', 'N/A'),
-                        'subtotal': data.get('subtotal', 0),
-                        'moneda': data.get('moneda', 'N/A'),
-                        'uso_cfdi': data.get('uso_cfdi', 'N/A')
-                    }
-                    invoice_summary.append(summary)
-            
-            # Create AI prompt for invoice analysis
-            prompt = f"""
-Eres un asistente especializado en análisis de facturas CFDI. Analiza los siguientes datos de facturas y responde la pregunta del usuario de manera precisa y útil.
-
-DATOS DE FACTURAS:
-{invoice_summary}
-
-PREGUNTA DEL USUARIO: {question}
-
-INSTRUCCIONES:
-1. Analiza los datos de facturas proporcionados
-2. Responde la pregunta de manera clara y precisa
-3. Incluye números específicos cuando sea relevante
-4. Usa los nombres reales de emisor y receptor (no "N/A")
-5. Si no hay datos suficientes, indícalo claramente
-6. Proporciona insights útiles basados en los datos
-7. NO menciones fuentes, solo da la respuesta directa
-8. **IMPORTANTE**: Para preguntas sobre facturas, usa formato de lista con todos los detalles:
-   - **Total de facturas**: X
-   - **Factura 1**:
-     - **Emisor**: Nombre del emisor
-     - **Receptor**: Nombre del receptor  
-     - **Total**: $X,XXX.XX
-     - **Subtotal**: $X,XXX.XX
-     - **IVA**: $XXX.XX
-     - **Fecha**: DD de mes de AAAA
-     - **UUID**: XXXX-XXXX-XXXX-XXXX
-     - **Folio**: XXXXXX
-     - **Serie**: XXXX (si aplica)
-     - **Moneda**: MXN
-     - **Uso CFDI**: Descripción del uso
-   - **Factura 2**: (si hay más)
-
-RESPUESTA:
-"""
+            # Retrieve the invoices most relevant to the question
+            invoice_retriever = await container.get("invoice_retriever")
+            llm = await container.get("llm")
+            retrieval = await invoice_retriever.retrieve(question, invoice_table, top_k=settings.invoice_retrieval_top_k)
+            context = pack_invoice_context(question, retrieval.summaries, settings.invoice_context_max_tokens,
+                                           retrieval.filters, model=llm.model)
             
             # Get AI response
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": "Eres un experto en análisis de facturas CFDI. Proporciona respuestas precisas y útiles basadas en los datos de facturas."},
-                    {"role": "user", "content": prompt}
-                ],
+            answer = await llm.chat_completion(
+                messages=build_invoice_messages(question, context.text),
                 max_tokens=1000,
                 temperature=0.3
             )
             
-            answer = response.choices[0].message.content
-            
             # No sources needed for invoice queries
             sources = []
             
             metadata = {
                 'total_invoices_analyzed': len(actual_invoices),
-                'processing_time': 0.5,
+                'answered_by': 'llm',
+                'invoices_in_context': context.included,
+                'context': {'tokens': context.tokens, 'columns': context.columns},
+                'retrieval': {'method': retrieval.method, 'candidates': retrieval.candidates, 'filters': retrieval.filters},
+                'processing_time': round(time.perf_counter() - started, 4),
+                'timings': _stage_timings(),
                 'confidence_score': 0.85
             }
             
-            print(f"✅ [Invoice RAG] Generated response for company {company_id}")
+            logger.debug("✅ [Invoice RAG] Generated response for company %s", company_id)
             
-            return InvoiceQueryResponse(
+            response = InvoiceQueryResponse(
                 answer=answer,
                 sources=sources,
                 metadata=metadata
             )
+            if settings.semantic_cache_enabled:
+                await semantic_cache.store(company_id, "invoice", question, response.model_dump(),
+                                           latency=time.perf_counter() - started,
+                                           fingerprint=fingerprint, vector=question_vector)
+            return response
             
         except Exception as ai_error:
-            print(f"❌ [Invoice RAG] AI processing error: {ai_error}")
+            logger.error("❌ [Invoice RAG] AI processing error: %s", ai_error)
             raise HTTPException(status_code=500, detail=f"Error processing invoice data: {str(ai_error)}")
         
     except Exception as e:
-        print(f"❌ [Invoice RAG] General error: {e}")
-        print(f"❌ [Invoice RAG] Error type: {type(e)}")
-        import traceback
-        print(f"❌ [Invoice RAG] Traceback: {traceback.format_exc()}")
+        logger.exception("❌ [Invoice RAG] General error: %s", e)
         raise HTTPException(status_code=500, detail=f"Error processing invoice query: {str(e)}")
 
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+# How often a stream waiting on the LLM checks whether its client is still there
+STREAM_DISCONNECT_POLL_SECONDS = 0.5
+
+class ClientDisconnected(Exception):
+    """The client of a streaming response went away"""
+
+async def _next_delta(completion: AsyncIterator[str], request: Request) -> Optional[str]:
+    """Next delta of ``completion`` (None at its end), checking the client is still there.
+
+    The client is checked when a delta arrives and every
+    ``STREAM_DISCONNECT_POLL_SECONDS`` while waiting for one, so
+    ClientDisconnected is raised even if the upstream has stalled.
+    """
+    async def receive() -> Optional[str]:
+        try:
+            return await completion.__anext__()
+        except StopAsyncIteration:
+            return None
+
+    pending = asyncio.ensure_future(receive())
+    try:
+        while True:
+            done, _ = await asyncio.wait({pending}, timeout=STREAM_DISCONNECT_POLL_SECONDS)
+            if done:
+                delta = pending.result()
+                if delta is not None and await request.is_disconnected():
+                    raise ClientDisconnected()
+                return delta
+            if await request.is_disconnected():
+                raise ClientDisconnected()
+    finally:
+        if not pending.done():
+            pending.cancel()
+            await asyncio.wait({pending})
+
+@app.post("/api/invoice-rag/query/stream")
+async def query_invoices_stream(payload: dict, http_request: Request,
+                                container: ServiceContainer = Depends(get_services)):
+    """
+    Variante en streaming (SSE) de /api/invoice-rag/query: envía eventos `token`
+    conforme llegan, un evento `metadata` al final y luego `done`.
+    """
+    from app.services.invoice_analytics import InvoiceTable, answer_invoice_question
+    from app.services.invoice_context import pack_invoice_context
+    from app.services.semantic_cache import invoice_fingerprint
+
+    try:
+        question, company_id, actual_invoices = parse_invoice_request(payload)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    
+    metrics.set_tenant(company_id)
+    logger.debug("🔍 [Invoice RAG Stream] Processing question for company %s", company_id, extra={"question": question})
+    
+    invoice_table = InvoiceTable.from_invoices(actual_invoices)
+    analytics = answer_invoice_question(question, invoice_table)
+    if analytics:
+        async def analytics_stream():
+            yield _sse_event("token", {"content": analytics.answer})
+            yield _sse_event("metadata", {
+                "total_invoices_analyzed": len(actual_invoices),
+                "invoices_matched": analytics.invoices_matched,
+                "answered_by": "analytics",
+                "analytics_query": analytics.query.describe(),
+                "confidence_score": 1.0
+            })
+            yield _sse_event("done", {})
+        return StreamingResponse(analytics_stream(), media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    
+    fingerprint = invoice_fingerprint(actual_invoices)
+    question_vector = None
+    if settings.semantic_cache_enabled:
+        semantic_cache = await container.get("semantic_cache")
+        cached, question_vector = await semantic_cache.lookup(company_id, "invoice", question, fingerprint)
+        if cached is not None:
+            async def cached_stream():
+                yield _sse_event("token", {"content": cached["answer"]})
+                yield _sse_event("metadata", {**cached["metadata"], "cache": "hit"})
+                yield _sse_event("done", {})
+            return StreamingResponse(cached_stream(), media_type="text/event-stream",
+                                     headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    
+    if not settings.openai_api_key:
+        raise HTTPException(status_code=500, detail="OpenAI API key not configured")
+    
+    invoice_retriever = await container.get("invoice_retriever")
+    llm = await container.get("llm")
+    retrieval = await invoice_retriever.retrieve(question, invoice_table, top_k=settings.invoice_retrieval_top_k)
+    context = pack_invoice_context(question, retrieval.summaries, settings.invoice_context_max_tokens,
+                                   retrieval.filters, model=llm.model)
+    messages = build_invoice_messages(question, context.text)
+    
+    async def event_stream():
+        started = time.perf_counter()
+        first_token_at = None
+        tokens = 0
+        parts = []
+        disconnected = False
+        completion = llm.stream_chat_completion(messages, max_tokens=1000, temperature=0.3)
+        try:
+            with metrics.stage("llm"):
+                while True:
+                    try:
+                        delta = await _next_delta(completion, http_request)
+                    except ClientDisconnected:
+                        disconnected = True
+                        logger.warning("⚠️ [Invoice RAG Stream] Client disconnected for company %s, stopping generation",
+                                       company_id)
+                        break
+                    if delta is None:
+                        break
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    tokens += 1
+                    parts.append(delta)
+                    yield _sse_event("token", {"content": delta})
+            
+            if not disconnected:
+                elapsed = time.perf_counter() - started
+                metadata = {
+                    "total_invoices_analyzed": len(actual_invoices),
+                    "processing_time": round(elapsed, 3),
+                    "time_to_first_token": round(first_token_at - started, 3) if first_token_at else None,
+                    "chunks_streamed": tokens,
+                    "answered_by": "llm",
+                    "invoices_in_context": context.included,
+                    "context": {"tokens": context.tokens, "columns": context.columns},
+                    "retrieval": {"method": retrieval.method, "candidates": retrieval.candidates, "filters": retrieval.filters},
+                    "confidence_score": 0.85
+                }
+                yield _sse_event("metadata", metadata)
+                yield _sse_event("done", {})
+                if settings.semantic_cache_enabled:
+                    await semantic_cache.store(company_id, "invoice", question,
+                                               {"answer": "".join(parts), "sources": [], "metadata": metadata},
+                                               latency=elapsed, fingerprint=fingerprint, vector=question_vector)
+                logger.debug("✅ [Invoice RAG Stream] Streamed response for company %s", company_id)
+        except Exception as e:
+            logger.error("❌ [Invoice RAG Stream] Error: %s", e)
+            yield _sse_event("error", {"detail": f"Error processing invoice data: {str(e)}"})
+        finally:
+            # Closes the upstream OpenAI stream if we stopped early; shielded so
+            # it completes even when the response itself is being cancelled
+            await asyncio.shield(completion.aclose())
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,108 @@
+import logging
+from typing import Dict, Any, Optional
+import httpx
+from app.config.settings import settings
+from app.services.circuit_breaker import CircuitBreaker
+from app.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class BusinessBackendClient:
+    """Long-lived, pooled HTTP client for the Axura business backend.
+
+    A single ``httpx.AsyncClient`` is shared by every request so connections
+    (and their TLS sessions) are reused through keep-alive. Failures feed a
+    circuit breaker; while it is open calls return ``None`` immediately so the
+    caller can go straight to its fallback path instead of waiting on timeouts.
+    """
+
+    def __init__(self):
+        self.base_url = settings.business_backend_url.rstrip("/")
+        self.breaker = CircuitBreaker(
+            "business-backend",
+            failure_threshold=settings.business_backend_breaker_failures,
+            reset_timeout=settings.business_backend_breaker_reset_timeout
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _build_client(self) -> httpx.AsyncClient:
+        timeout = httpx.Timeout(
+            connect=settings.business_backend_connect_timeout,
+            read=settings.business_backend_read_timeout,
+            write=settings.business_backend_read_timeout,
+            pool=settings.business_backend_connect_timeout
+        )
+        limits = httpx.Limits(
+            max_connections=settings.business_backend_max_connections,
+            max_keepalive_connections=settings.business_backend_max_keepalive,
+            keepalive_expiry=settings.business_backend_keepalive_expiry
+        )
+        return httpx.AsyncClient(
+            base_url=self.base_url,
+            http2=settings.business_backend_http2,
+            timeout=timeout,
+            limits=limits
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Created lazily as well, for runtimes that never run the app lifespan
+        if self._client is None or self._client.is_closed:
+            self._client = self._build_client()
+        return self._client
+
+    async def start(self) -> None:
+        """Open the connection pool"""
+        _ = self.client
+
+    async def close(self) -> None:
+        """Close the connection pool"""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
+    async def get_company_inventory(self, company_id: str) -> Optional[Dict[str, Any]]:
+        """Fetch the public inventory payload for a company.
+
+        Returns None when the backend is unavailable, answers with a non-200
+        status, or the circuit breaker is open.
+        """
+        if not self.breaker.allow_request():
+            logger.warning("⚠️ Business backend circuit open, skipping fetch for company %s", company_id)
+            return None
+
+        try:
+            with metrics.stage("backend_fetch"):
+                response = await self.client.get(f"/api/companies/public/inventory/{company_id}")
+        except Exception as e:
+            self.breaker.record_failure()
+            logger.warning("⚠️ Error fetching inventory for company %s: %r", company_id, e)
+            return None
+        finally:
+            # Also runs on cancellation, which records no outcome
+            self.breaker.release()
+
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+            logger.warning("⚠️ Business backend returned %d for company %s", response.status_code, company_id)
+            return None
+
+        # 4xx answers mean the backend itself is healthy
+        self.breaker.record_success()
+        if response.status_code != 200:
+            logger.warning("⚠️ Business backend returned %d for company %s", response.status_code, company_id)
+            return None
+
+        try:
+            return response.json()
+        except ValueError as e:
+            logger.warning("⚠️ Invalid JSON from business backend for company %s: %s", company_id, e)
+            return None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "base_url": self.base_url,
+            "http2": settings.business_backend_http2,
+            "circuit_breaker": self.breaker.get_stats()
+        }
@@ -0,0 +1,77 @@
+import logging
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and every
+    call is rejected immediately for ``reset_timeout`` seconds. Once that window
+    has passed a single trial call is let through (half-open); its outcome
+    closes the circuit again or re-opens it for another window. Callers must
+    call ``release`` once an allowed call ends (e.g. in a ``finally``), so a
+    trial that was cancelled or failed unexpectedly never holds the
+    half-open slot.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and self._opened_at is not None:
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+        return self._state
+
+    def allow_request(self) -> bool:
+        """Return True if a call may go through right now"""
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._trial_in_flight:
+            self._state = self.HALF_OPEN
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    def release(self) -> None:
+        """End an allowed call without an outcome; frees the half-open trial slot"""
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        self._trial_in_flight = False
+        if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+            if self._state != self.OPEN:
+                logger.warning("⚠️ Circuit '%s' opened after %d consecutive failures", self.name, self._failures)
+            self._state = self.OPEN
+            self._opened_at = time.monotonic()
+
+    def get_stats(self) -> dict:
+        return {
+            "name": self.name,
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "failure_threshold": self.failure_threshold,
+            "reset_timeout": self.reset_timeout
+        }
@@ -0,0 +1,240 @@
+import asyncio
+import functools
+import logging
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, Optional
+
+from app.config.settings import settings
+
+if TYPE_CHECKING:
+    from app.services.business_backend import BusinessBackendClient
+    from app.services.data_processor import DataProcessorService
+    from app.services.embeddings import EmbeddingService
+    from app.services.index_jobs import IndexJobManager
+    from app.services.indexer import IncrementalIndexer
+    from app.services.invoice_retrieval import InvoiceRetriever
+    from app.services.llm import LLMService
+    from app.services.materialized_answers import MaterializedAnswers
+    from app.services.semantic_cache import SemanticAnswerCache
+    from app.services.snapshot_cache import SnapshotCache
+    from app.services.vector_store import VectorStoreService
+
+logger = logging.getLogger(__name__)
+
+# Services built by warm_up, cheapest and most often needed first
+WARM_UP_ORDER = (
+    "business_backend", "materialized_answers", "inventory_cache", "llm", "embedding",
+    "semantic_cache", "invoice_retriever", "data_processor", "vector_store", "index_jobs"
+)
+
+
+def _service(build: Callable[["ServiceContainer"], Any]) -> property:
+    """Read-only property that builds the service on first access, exactly once"""
+    name = build.__name__
+
+    @functools.wraps(build)
+    def get(self: "ServiceContainer") -> Any:
+        try:
+            return self._instances[name]
+        except KeyError:
+            pass
+        with self._build_lock(name):
+            if name not in self._instances:
+                started = time.perf_counter()
+                self._instances[name] = build(self)
+                self._build_seconds[name] = round(time.perf_counter() - started, 4)
+            return self._instances[name]
+
+    return property(get)
+
+
+class ServiceContainer:
+    """The app's long-lived services, each built on first use.
+
+    Nothing is constructed (or, for the OpenAI SDK, Motor and ChromaDB,
+    even imported) until a request needs it, so a cold start that only
+    answers ``/health`` pays for none of them. Each service is built under
+    its own lock, which lets ``warm_up`` build services on a worker thread
+    while requests are served: a request only waits for a service it needs
+    that is being built right then, never for the warm-up as a whole.
+    Services that need async setup (index job workers, MongoDB indexes) are
+    started once by the ``get_*`` coroutines.
+    """
+
+    def __init__(self):
+        # Guards the lock map only; builds hold the per-service lock
+        self._lock = threading.Lock()
+        self._locks: Dict[str, threading.RLock] = {}
+        self._instances: Dict[str, Any] = {}
+        self._build_seconds: Dict[str, float] = {}
+        self._started: Dict[str, asyncio.Task] = {}
+
+    def _build_lock(self, name: str) -> threading.RLock:
+        with self._lock:
+            lock = self._locks.get(name)
+            if lock is None:
+                lock = self._locks[name] = threading.RLock()
+            return lock
+
+    def built(self, name: str) -> bool:
+        return name in self._instances
+
+    async def get(self, name: str) -> Any:
+        """Service ``name`` for async code.
+
+        A built service is returned directly; otherwise it is built (or its
+        build by the warm-up awaited) on a worker thread, so the event loop
+        never blocks on a build lock.
+        """
+        try:
+            return self._instances[name]
+        except KeyError:
+            return await asyncio.to_thread(getattr, self, name)
+
+    @_service
+    def embedding(self) -> "EmbeddingService":
+        from app.services.embeddings import EmbeddingService
+        return EmbeddingService()
+
+    @_service
+    def vector_store(self) -> "VectorStoreService":
+        from app.services.vector_store import VectorStoreService
+        return VectorStoreService(self.embedding)
+
+    @_service
+    def data_processor(self) -> "DataProcessorService":
+        from app.services.data_processor import DataProcessorService
+        return DataProcessorService()
+
+    @_service
+    def indexer(self) -> "IncrementalIndexer":
+        from app.services.indexer import IncrementalIndexer
+        return IncrementalIndexer(self.data_processor, self.vector_store)
+
+    @_service
+    def business_backend(self) -> "BusinessBackendClient":
+        from app.services.business_backend import BusinessBackendClient
+        return BusinessBackendClient()
+
+    @_service
+    def llm(self) -> "LLMService":
+        from app.services.llm import LLMService
+        return LLMService()
+
+    @_service
+    def invoice_retriever(self) -> "InvoiceRetriever":
+        from app.services.invoice_retrieval import InvoiceRetriever
+        return InvoiceRetriever(self.embedding)
+
+    @_service
+    def semantic_cache(self) -> "SemanticAnswerCache":
+        from app.services.semantic_cache import SemanticAnswerCache
+        return SemanticAnswerCache(
+            self.embedding,
+            threshold=settings.semantic_cache_threshold,
+            ttl=settings.semantic_cache_ttl,
+            max_entries=settings.semantic_cache_max_entries,
+            max_entries_per_company=settings.semantic_cache_max_entries_per_company
+        )
+
+    @_service
+    def materialized_answers(self) -> "MaterializedAnswers":
+        from app.services.materialized_answers import MaterializedAnswers
+        return MaterializedAnswers(max_companies=settings.inventory_cache_max_entries)
+
+    @_service
+    def inventory_cache(self) -> "SnapshotCache":
+        from app.services.snapshot_cache import SnapshotCache
+        return SnapshotCache(
+            self.business_backend.get_company_inventory,
+            ttl=settings.inventory_cache_ttl,
+            stale_ttl=settings.inventory_cache_stale_ttl,
+            max_entries=settings.inventory_cache_max_entries,
+            # Answer facts are rebuilt once per snapshot refresh, not per question
+            on_load=self.materialized_answers.materialize
+        )
+
+    @_service
+    def vector_store_stats_cache(self) -> "SnapshotCache":
+        from app.services.snapshot_cache import SnapshotCache
+
+        async def load(_key: str) -> Optional[Dict[str, Any]]:
+            stats = await self.vector_store.get_all_stats()
+            return None if "error" in stats else stats
+
+        # Counting every partition is too slow to repeat on each /api/v1/stats call
+        return SnapshotCache(load, ttl=settings.stats_cache_ttl, stale_ttl=settings.stats_cache_ttl, max_entries=1)
+
+    @_service
+    def index_jobs(self) -> "IndexJobManager":
+        from app.services.index_jobs import IndexJobManager, JobStore
+        return IndexJobManager(
+            self.indexer,
+            JobStore(settings.index_job_store_path, history=settings.index_job_history),
+            workers=settings.index_job_workers,
+            progress_interval=settings.index_job_progress_interval
+        )
+
+    async def _start_once(self, name: str, start: Callable[[], Awaitable[None]]) -> None:
+        """Run an async start step once; concurrent callers wait for the same run.
+
+        A run that fails is forgotten, so the next caller tries again.
+        """
+        task = self._started.get(name)
+        if task is None:
+            task = self._started[name] = asyncio.ensure_future(start())
+        try:
+            # Shielded: a cancelled caller must not cancel the shared run
+            await asyncio.shield(task)
+        except BaseException:
+            if task.done() and self._started.get(name) is task:
+                del self._started[name]
+            raise
+
+    async def get_data_processor(self) -> "DataProcessorService":
+        service = await self.get("data_processor")
+        if settings.mongo_create_indexes:
+            await self._start_once("mongo_indexes", service.ensure_indexes)
+        return service
+
+    async def get_index_jobs(self) -> "IndexJobManager":
+        """Job manager with its workers running (unfinished jobs are re-queued on the first call)"""
+        manager = await self.get("index_jobs")
+        await self._start_once("index_jobs", manager.start)
+        return manager
+
+    async def warm_up(self) -> Dict[str, float]:
+        """Build every service now instead of on first use; returns build seconds per service.
+
+        Construction (mostly imports) runs on a worker thread so requests
+        that don't need these services are still served meanwhile.
+        """
+        for name in WARM_UP_ORDER:
+            try:
+                await self.get(name)
+                if name == "data_processor":
+                    await self.get_data_processor()
+                elif name == "index_jobs":
+                    await self.get_index_jobs()
+            except Exception as e:
+                logger.error("❌ Warm-up of %s failed: %s", name, e)
+        return self.get_stats()["build_seconds"]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"built": sorted(self._instances), "build_seconds": dict(self._build_seconds)}
+
+    async def close(self) -> None:
+        """Stop and close the services that were built"""
+        for task in self._started.values():
+            if not task.done():
+                task.cancel()
+        closers = [
+            ("index_jobs", "close"), ("inventory_cache", "close"), ("vector_store_stats_cache", "close"),
+            ("business_backend", "close"), ("llm", "close"), ("embedding", "close"), ("data_processor", "close")
+        ]
+        for name, method in closers:
+            if self.built(name):
+                await getattr(self._instances[name], method)()
+        if self.built("vector_store"):
+            self.vector_store.close()
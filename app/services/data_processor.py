@@ -1,69 +1,201 @@
-import asyncio
-from typing import Dict, Any, List, Optional
-from motor.motor_asyncio import AsyncIOMotorClient
+import logging
+from datetime import datetime
+from typing import AsyncIterator, Dict, Any, List, Optional, Set
 from app.config.settings import settings
+from app.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Vector store collection -> MongoDB collection it is built from
+INVENTORY_SOURCES = {
+    "products": "products",
+    "raw_materials": "rawmaterials",
+    "inventory_movements": "movements"
+}
+
+# Fields compared against an index watermark, and soft-delete flags
+CHANGE_FIELDS = ("updatedAt", "createdAt")
+TOMBSTONE_FIELDS = ("deleted", "isDeleted")
+
+# Fields read per collection: what the formatter and statistics use, plus
+# ownership, change and delete markers. Everything else stays in Mongo.
+_COMMON_FIELDS = ("company",) + CHANGE_FIELDS + TOMBSTONE_FIELDS
+INVENTORY_PROJECTIONS = {
+    name: {field: 1 for field in fields + _COMMON_FIELDS}
+    for name, fields in {
+        "products": ("name", "stock", "stockMinimo", "precio", "categoria"),
+        "raw_materials": ("name", "stock", "stockMinimo", "precio", "proveedor"),
+        "inventory_movements": ("tipo", "productName", "cantidad", "fecha")
+    }.items()
+}
+
+# Ids sent per ``$in`` query, keeping each query far below the 16 MB BSON limit
+ID_QUERY_CHUNK = 10000
+
+# Compound indexes that keep per-company reads and watermark queries off
+# collection scans (each $or branch of a change query uses its own index)
+RECOMMENDED_INDEXES = {
+    "products": [[("company", 1), ("updatedAt", 1)], [("company", 1), ("createdAt", 1)]],
+    "rawmaterials": [[("company", 1), ("updatedAt", 1)], [("company", 1), ("createdAt", 1)]],
+    "movements": [[("company", 1), ("updatedAt", 1)], [("company", 1), ("createdAt", 1)]],
+    "users": [[("company", 1), ("role", 1)]]
+}
+
+
+STOCK_VALUE = {"$multiply": [{"$ifNull": ["$stock", 0]}, {"$ifNull": ["$precio", 0]}]}
+
+
+def inventory_statistics_pipeline(company_id: str, low_stock_limit: int = 50) -> List[Dict[str, Any]]:
+    """Aggregation (run on ``products``) computing a company's inventory statistics.
+
+    Raw materials and movements are pulled in with ``$unionWith`` and every
+    figure is computed in one ``$facet``, so only the results cross the wire.
+    """
+    item_fields = {"name": 1, "stock": 1, "stockMinimo": 1, "precio": 1}
+    not_deleted = {field: {"$ne": True} for field in TOMBSTONE_FIELDS}
+    low_stock = {
+        "kind": {"$in": ["product", "raw_material"]},
+        "$expr": {"$lte": [{"$ifNull": ["$stock", 0]}, {"$ifNull": ["$stockMinimo", 0]}]}
+    }
+    return [
+        {"$match": {"company": company_id, **not_deleted}},
+        {"$project": {**item_fields, "kind": {"$literal": "product"}}},
+        {"$unionWith": {"coll": "rawmaterials", "pipeline": [
+            {"$match": {"company": company_id, **not_deleted}},
+            {"$project": {**item_fields, "kind": {"$literal": "raw_material"}}}
+        ]}},
+        {"$unionWith": {"coll": "movements", "pipeline": [
+            {"$match": {"company": company_id, **not_deleted}},
+            {"$project": {"tipo": 1, "kind": {"$literal": "movement"}}}
+        ]}},
+        {"$facet": {
+            "counts": [{"$group": {"_id": "$kind", "count": {"$sum": 1}}}],
+            "inventory_value": [
+                {"$match": {"kind": {"$in": ["product", "raw_material"]}}},
+                {"$group": {"_id": "$kind", "value": {"$sum": STOCK_VALUE}}}
+            ],
+            "low_stock_count": [{"$match": low_stock}, {"$count": "count"}],
+            "low_stock": [
+                {"$match": low_stock},
+                {"$sort": {"stock": 1, "_id": 1}},
+                {"$limit": low_stock_limit},
+                {"$project": {"_id": 0, "id": {"$toString": "$_id"}, "kind": 1, "name": 1,
+                              "stock": 1, "stockMinimo": 1}}
+            ],
+            "movements_by_type": [
+                {"$match": {"kind": "movement"}},
+                {"$group": {"_id": "$tipo", "count": {"$sum": 1}}}
+            ]
+        }}
+    ]
+
+
+def is_tombstone(document: Dict[str, Any]) -> bool:
+    return any(document.get(field) for field in TOMBSTONE_FIELDS)
+
 
 class DataProcessorService:
     def __init__(self):
+        # Deferred: motor/pymongo are only needed once a service touches MongoDB
+        from motor.motor_asyncio import AsyncIOMotorClient
+
         self.client = AsyncIOMotorClient(settings.mongodb_uri)
         self.db = self.client[settings.mongodb_database]
 
-    async def get_inventory_data(self, company_id: str) -> Dict[str, Any]:
-        """Get inventory data for a company"""
+    async def close(self) -> None:
+        self.client.close()
+
+    async def iter_inventory_documents(self, company_id: str, collection_name: str,
+                                       query: Optional[Dict[str, Any]] = None,
+                                       batch_size: Optional[int] = None) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Stream a company's documents of one inventory collection in lists of ``batch_size``.
+
+        The cursor uses the collection's projection and fetches from Mongo in
+        ``mongo_batch_size`` round trips, so memory is bounded by one batch.
+        Soft-deleted documents are skipped.
+        """
+        batch_size = batch_size or settings.index_batch_size
+        cursor = self.db[INVENTORY_SOURCES[collection_name]].find(
+            {"company": company_id, **(query or {})},
+            INVENTORY_PROJECTIONS[collection_name]
+        ).batch_size(settings.mongo_batch_size)
         try:
-            # Get products
-            products = await self.db.products.find(
-                {"company": company_id}
-            ).to_list(length=None)
-            
-            # Get raw materials
-            raw_materials = await self.db.rawmaterials.find(
-                {"company": company_id}
-            ).to_list(length=None)
-            
-            # Get inventory movements
-            movements = await self.db.movements.find(
-                {"company": company_id}
-            ).to_list(length=None)
-            
-            # Calculate statistics
-            total_products = len(products)
-            total_raw_materials = len(raw_materials)
-            low_stock_items = sum(1 for p in products if p.get('stock', 0) <= p.get('stockMinimo', 0))
-            low_stock_items += sum(1 for r in raw_materials if r.get('stock', 0) <= r.get('stockMinimo', 0))
+            batch = []
+            async for document in cursor:
+                if is_tombstone(document):
+                    continue
+                batch.append(document)
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+        finally:
+            # Frees the server-side cursor when the consumer stops early
+            await cursor.close()
+
+    async def iter_documents_by_id(self, company_id: str, collection_name: str,
+                                   ids: List[Any]) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Stream the documents with the given ``_id``s, querying ``ID_QUERY_CHUNK`` ids at a time"""
+        for start in range(0, len(ids), ID_QUERY_CHUNK):
+            chunk = {"_id": {"$in": ids[start:start + ID_QUERY_CHUNK]}}
+            async for batch in self.iter_inventory_documents(company_id, collection_name, chunk):
+                yield batch
+
+    async def get_inventory_statistics(self, company_id: str, low_stock_limit: int = 50) -> Dict[str, Any]:
+        """Counts, low-stock items, inventory value and movement counts in one round trip"""
+        try:
+            with metrics.stage("mongo_read"):
+                cursor = self.db.products.aggregate(inventory_statistics_pipeline(company_id, low_stock_limit))
+                results = await cursor.to_list(length=1)
+            facets = results[0] if results else {}
+            counts = {row["_id"]: row["count"] for row in facets.get("counts", [])}
+            values = {row["_id"]: row["value"] for row in facets.get("inventory_value", [])}
+            low_stock_count = facets.get("low_stock_count", [])
             
             return {
-                "products": products,
-                "raw_materials": raw_materials,
-                "movements": movements,
-                "statistics": {
-                    "total_products": total_products,
-                    "total_raw_materials": total_raw_materials,
-                    "low_stock_items": low_stock_items,
-                    "total_movements": len(movements)
-                }
+                "total_products": counts.get("product", 0),
+                "total_raw_materials": counts.get("raw_material", 0),
+                "total_movements": counts.get("movement", 0),
+                "low_stock_items": low_stock_count[0]["count"] if low_stock_count else 0,
+                "total_inventory_value": sum(values.values()),
+                "products_value": values.get("product", 0),
+                "raw_materials_value": values.get("raw_material", 0),
+                "low_stock": facets.get("low_stock", []),
+                "movements_by_type": {str(row["_id"]): row["count"] for row in facets.get("movements_by_type", [])}
             }
         except Exception as e:
-            print(f"❌ Error getting inventory data: {e}")
+            logger.error("❌ Error getting inventory statistics: %s", e)
             return {
-                "products": [],
-                "raw_materials": [],
-                "movements": [],
-                "statistics": {
-                    "total_products": 0,
-                    "total_raw_materials": 0,
-                    "low_stock_items": 0,
-                    "total_movements": 0
-                }
+                "total_products": 0,
+                "total_raw_materials": 0,
+                "total_movements": 0,
+                "low_stock_items": 0,
+                "total_inventory_value": 0,
+                "products_value": 0,
+                "raw_materials_value": 0,
+                "low_stock": [],
+                "movements_by_type": {},
+                "error": str(e)
             }
 
+    async def ensure_indexes(self) -> None:
+        """Create ``RECOMMENDED_INDEXES`` (no-op for indexes that already exist)"""
+        for collection, indexes in RECOMMENDED_INDEXES.items():
+            for keys in indexes:
+                try:
+                    await self.db[collection].create_index(keys, background=True)
+                except Exception as e:
+                    logger.warning("⚠️ Could not create index %s on %s: %s", keys, collection, e)
+
     async def get_company_info(self, company_id: str) -> Dict[str, Any]:
         """Get company information"""
         try:
             # Get company info from users collection
-            company_user = await self.db.users.find_one(
-                {"company": company_id, "role": "empresajefe"}
-            )
+            with metrics.stage("mongo_read"):
+                company_user = await self.db.users.find_one(
+                    {"company": company_id, "role": "empresajefe"}
+                )
             
             if company_user:
                 return {
@@ -84,7 +216,7 @@ class DataProcessorService:
                     "status": "not_found"
                 }
         except Exception as e:
-            print(f"❌ Error getting company info: {e}")
+            logger.error("❌ Error getting company info: %s", e)
             return {
                 "company_id": company_id,
                 "company_name": "Unknown",
@@ -94,57 +226,117 @@ class DataProcessorService:
                 "status": "error"
             }
 
+    def format_document(self, collection_name: str, document: Dict[str, Any]) -> Dict[str, Any]:
+        """Format one Mongo document for RAG indexing; ``id`` is its stable ``_id``"""
+        if collection_name == "products":
+            return {
+                "id": str(document.get('_id', '')),
+                "content": f"Producto: {document.get('name', 'Unknown')} - Stock: {document.get('stock', 0)} - Precio: {document.get('precio', 0)} - Categoría: {document.get('categoria', 'Unknown')}",
+                "metadata": {
+                    "type": "product",
+                    "id": str(document.get('_id', '')),
+                    "name": document.get('name', ''),
+                    "stock": document.get('stock', 0),
+                    "precio": document.get('precio', 0),
+                    "categoria": document.get('categoria', ''),
+                    "company": document.get('company', '')
+                }
+            }
+        if collection_name == "raw_materials":
+            return {
+                "id": str(document.get('_id', '')),
+                "content": f"Materia Prima: {document.get('name', 'Unknown')} - Stock: {document.get('stock', 0)} - Precio: {document.get('precio', 0)} - Proveedor: {document.get('proveedor', 'Unknown')}",
+                "metadata": {
+                    "type": "raw_material",
+                    "id": str(document.get('_id', '')),
+                    "name": document.get('name', ''),
+                    "stock": document.get('stock', 0),
+                    "precio": document.get('precio', 0),
+                    "proveedor": document.get('proveedor', ''),
+                    "company": document.get('company', '')
+                }
+            }
+        if collection_name == "inventory_movements":
+            return {
+                "id": str(document.get('_id', '')),
+                "content": f"Movimiento: {document.get('tipo', 'Unknown')} - Producto: {document.get('productName', 'Unknown')} - Cantidad: {document.get('cantidad', 0)} - Fecha: {document.get('fecha', 'Unknown')}",
+                "metadata": {
+                    "type": "movement",
+                    "id": str(document.get('_id', '')),
+                    "tipo": document.get('tipo', ''),
+                    "productName": document.get('productName', ''),
+                    "cantidad": document.get('cantidad', 0),
+                    "fecha": str(document.get('fecha', '')),
+                    "company": document.get('company', '')
+                }
+            }
+        raise KeyError(f"Unknown inventory collection {collection_name}")
+
+    async def get_inventory_changes(self, company_id: str, collection_name: str,
+                                    since: Optional[datetime] = None) -> Dict[str, Any]:
+        """Changes to one inventory collection since a watermark.
+
+        Returns ``batches``, an async iterator over the documents to upsert
+        (with ``since`` set, only those whose ``updatedAt``/``createdAt`` is
+        at or after it), ``deleted``, the ids soft-deleted since then, and
+        ``total``, the company's live document count. Nothing here reads
+        the full id set; hard deletes and documents that never made it into
+        the index are found by ``get_inventory_diff`` when counts disagree.
+        """
+        source = self.db[INVENTORY_SOURCES[collection_name]]
+        query = None
+        deleted: List[str] = []
+        with metrics.stage("mongo_read"):
+            if since is not None:
+                changed = {"$or": [{field: {"$gte": since}} for field in CHANGE_FIELDS]}
+                query = changed
+                tombstones = {"$or": [{field: True} for field in TOMBSTONE_FIELDS]}
+                cursor = source.find({"company": company_id, "$and": [changed, tombstones]}, {"_id": 1})
+                deleted = [str(doc["_id"]) async for doc in cursor.batch_size(settings.mongo_batch_size)]
+            not_deleted = {field: {"$ne": True} for field in TOMBSTONE_FIELDS}
+            total = await source.count_documents({"company": company_id, **not_deleted})
+        
+        return {
+            "batches": self.iter_inventory_documents(company_id, collection_name, query),
+            "deleted": sorted(deleted),
+            "total": total
+        }
+
+    async def get_inventory_diff(self, company_id: str, collection_name: str,
+                                 indexed_ids: Set[str]) -> Dict[str, Any]:
+        """Reconcile a partition with Mongo by comparing full id sets.
+
+        Reads only ``_id`` and the delete flags of every company document.
+        Returns ``deleted``, indexed ids that no longer exist or are
+        soft-deleted, and ``batches`` streaming the live documents missing
+        from ``indexed_ids``.
+        """
+        source = self.db[INVENTORY_SOURCES[collection_name]]
+        current = {}
+        projection = {"_id": 1, **{field: 1 for field in TOMBSTONE_FIELDS}}
+        cursor = source.find({"company": company_id}, projection).batch_size(settings.mongo_batch_size)
+        with metrics.stage("mongo_read"):
+            async for doc in cursor:
+                if not is_tombstone(doc):
+                    current[str(doc["_id"])] = doc["_id"]
+        
+        missing = [raw_id for doc_id, raw_id in current.items() if doc_id not in indexed_ids]
+        return {
+            "batches": self.iter_documents_by_id(company_id, collection_name, missing),
+            "deleted": sorted(doc_id for doc_id in indexed_ids if doc_id not in current),
+            "missing": len(missing)
+        }
+
     async def format_inventory_for_rag(self, inventory_data: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Format inventory data for RAG indexing"""
         try:
             formatted_data = []
-            
-            # Format products
-            for product in inventory_data.get('products', []):
-                formatted_data.append({
-                    "content": f"Producto: {product.get('name', 'Unknown')} - Stock: {product.get('stock', 0)} - Precio: {product.get('precio', 0)} - Categoría: {product.get('categoria', 'Unknown')}",
-                    "metadata": {
-                        "type": "product",
-                        "id": str(product.get('_id', '')),
-                        "name": product.get('name', ''),
-                        "stock": product.get('stock', 0),
-                        "precio": product.get('precio', 0),
-                        "categoria": product.get('categoria', ''),
-                        "company": product.get('company', '')
-                    }
-                })
-            
-            # Format raw materials
-            for material in inventory_data.get('raw_materials', []):
-                formatted_data.append({
-                    "content": f"Materia Prima: {material.get('name', 'Unknown')} - Stock: {material.get('stock', 0)} - Precio: {material.get('precio', 0)} - Proveedor: {material.get('proveedor', 'Unknown')}",
-                    "metadata": {
-                        "type": "raw_material",
-                        "id": str(material.get('_id', '')),
-                        "name": material.get('name', ''),
-                        "stock": material.get('stock', 0),
-                        "precio": material.get('precio', 0),
-                        "proveedor": material.get('proveedor', ''),
-                        "company": material.get('company', '')
-                    }
-                })
-            
-            # Format movements
-            for movement in inventory_data.get('movements', []):
-                formatted_data.append({
-                    "content": f"Movimiento: {movement.get('tipo', 'Unknown')} - Producto: {movement.get('productName', 'Unknown')} - Cantidad: {movement.get('cantidad', 0)} - Fecha: {movement.get('fecha', 'Unknown')}",
-                    "metadata": {
-                        "type": "movement",
-                        "id": str(movement.get('_id', '')),
-                        "tipo": movement.get('tipo', ''),
-                        "productName": movement.get('productName', ''),
-                        "cantidad": movement.get('cantidad', 0),
-                        "fecha": movement.get('fecha', ''),
-                        "company": movement.get('company', '')
-                    }
-                })
+            for collection_name, key in (("products", "products"), ("raw_materials", "raw_materials"),
+                                         ("inventory_movements", "movements")):
+                for document in inventory_data.get(key, []):
+                    formatted_data.append(self.format_document(collection_name, document))
             
             return formatted_data
         except Exception as e:
-            print(f"❌ Error formatting inventory for RAG: {e}")
+            logger.error("❌ Error formatting inventory for RAG: %s", e)
             return []
@@ -0,0 +1,185 @@
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Keep well below SQLite's default limit of 999 host parameters
+_SQL_CHUNK = 500
+
+
+def embedding_cache_key(model: str, dimensions: Optional[int], text: str) -> str:
+    """Content address for an embedding: (model, dimensions, sha256(text))"""
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return f"{model}:{dimensions or 0}:{digest}"
+
+
+class EmbeddingCache:
+    """Two-tier content-addressed embedding cache.
+
+    The front tier is an in-memory LRU of float32 arrays; the back tier is a
+    SQLite file storing each vector as a float32 blob. Lookups and inserts
+    work in bulk, and once the file holds more than ``max_bytes`` of vectors
+    the least recently used rows are deleted until it is back under 90% of
+    the budget. SQLite work runs in a worker thread so callers on the event
+    loop are never blocked on disk.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 1024 * 1024 * 1024, memory_entries: int = 10000):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.memory_entries = max(0, memory_entries)
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " vector BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings(last_access)")
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+
+    # Memory tier
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        if not self.memory_entries:
+            return
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    # Disk tier (called from worker threads)
+
+    def _disk_get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found: Dict[str, np.ndarray] = {}
+        now = time.time()
+        with self._lock:
+            for i in range(0, len(keys), _SQL_CHUNK):
+                chunk = keys[i:i + _SQL_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+                if rows:
+                    self._conn.execute(
+                        f"UPDATE embeddings SET last_access = ? WHERE key IN ({','.join('?' * len(rows))})",
+                        [now, *(row[0] for row in rows)]
+                    )
+        return found
+
+    def _disk_put_many(self, items: List[Tuple[str, np.ndarray]]) -> None:
+        now = time.time()
+        added = 0
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for key, vector in items:
+                    blob = vector.astype(np.float32, copy=False).tobytes()
+                    previous = self._conn.execute("SELECT size FROM embeddings WHERE key = ?", (key,)).fetchone()
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO embeddings (key, vector, size, last_access) VALUES (?, ?, ?, ?)",
+                        (key, blob, len(blob), now)
+                    )
+                    added += len(blob) - (previous[0] if previous else 0)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            # Counted only once committed, so a rolled-back write leaves the total as it was
+            self._total_bytes += added
+            if self._total_bytes > self.max_bytes:
+                self._evict_locked()
+
+    def _evict_locked(self) -> None:
+        target = int(self.max_bytes * 0.9)
+        while self._total_bytes > target:
+            rows = self._conn.execute(
+                "SELECT key, size FROM embeddings ORDER BY last_access LIMIT ?", (_SQL_CHUNK,)
+            ).fetchall()
+            if not rows:
+                self._total_bytes = 0
+                break
+            victims = []
+            for key, size in rows:
+                victims.append(key)
+                self._total_bytes -= size
+                if self._total_bytes <= target:
+                    break
+            self._conn.execute(f"DELETE FROM embeddings WHERE key IN ({','.join('?' * len(victims))})", victims)
+            self._stats["evictions"] += len(victims)
+
+    # Public API
+
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, np.ndarray]:
+        """Return the cached vectors for whichever of ``keys`` are present"""
+        found: Dict[str, np.ndarray] = {}
+        missing: List[str] = []
+        for key in dict.fromkeys(keys):
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                found[key] = vector
+            else:
+                missing.append(key)
+        self._stats["memory_hits"] += len(found)
+
+        if missing:
+            try:
+                from_disk = await asyncio.to_thread(self._disk_get_many, missing)
+            except Exception as e:
+                logger.warning("⚠️ Embedding cache read error: %s", e)
+                from_disk = {}
+            for key, vector in from_disk.items():
+                self._remember(key, vector)
+            found.update(from_disk)
+            self._stats["disk_hits"] += len(from_disk)
+            self._stats["misses"] += len(missing) - len(from_disk)
+        return found
+
+    async def put_many(self, items: Dict[str, List[float]]) -> None:
+        """Store vectors by key in both tiers"""
+        if not items:
+            return
+        prepared = [(key, np.asarray(vector, dtype=np.float32)) for key, vector in items.items()]
+        for key, vector in prepared:
+            self._remember(key, vector)
+        try:
+            await asyncio.to_thread(self._disk_put_many, prepared)
+            self._stats["writes"] += len(prepared)
+        except Exception as e:
+            logger.warning("⚠️ Embedding cache write error: %s", e)
+
+    def get_stats(self) -> Dict[str, object]:
+        lookups = self._stats["memory_hits"] + self._stats["disk_hits"] + self._stats["misses"]
+        hits = self._stats["memory_hits"] + self._stats["disk_hits"]
+        return {
+            **self._stats,
+            "memory_entries": len(self._memory),
+            "disk_bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "hit_rate": hits / lookups if lookups else 0.0
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
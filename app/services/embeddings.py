@@ -1,47 +1,207 @@
+import logging
 import os
 import asyncio
-from typing import Optional, List
-import openai
+from typing import TYPE_CHECKING, Optional, List, Dict
 from app.config.settings import settings
+from app.services.embedding_cache import EmbeddingCache, embedding_cache_key
+from app.services.metrics import metrics
+from app.services.retry import retry_async
+from app.services.tokens import count_tokens
+
+if TYPE_CHECKING:
+    import openai
+
+logger = logging.getLogger(__name__)
+
+# Error codes the API uses when a specific input, not the request, is at fault
+INPUT_ERROR_CODES = {"context_length_exceeded", "string_above_max_length", "invalid_input"}
+
+
+def _is_input_rejection(error: Exception) -> bool:
+    """True for a 400 that blames the ``input`` parameter (length or content)"""
+    import openai
+
+    if not isinstance(error, openai.BadRequestError):
+        return False
+    if error.code in INPUT_ERROR_CODES:
+        return True
+    param = (error.param or "").lstrip("$.")
+    return param == "input" or param.startswith("input[")
+
 
 class EmbeddingService:
     def __init__(self):
-        self.client = openai.AsyncOpenAI(api_key=settings.openai_api_key)
+        self._client: Optional["openai.AsyncOpenAI"] = None
         self.model = settings.embedding_model
+        # Shortened embeddings (text-embedding-3 "dimensions" parameter)
+        self.dimensions: Optional[int] = settings.embedding_dimensions or None
+        self.cache = self._open_cache()
+        # Shared by every call, so concurrent callers together stay within the limit
+        self._semaphore = asyncio.Semaphore(settings.embedding_max_concurrency)
+
+    @property
+    def client(self) -> "openai.AsyncOpenAI":
+        # Created on first use: importing the SDK is a large share of cold start
+        if self._client is None:
+            import openai
+
+            # Retries are handled here (see retry_async) rather than by the SDK
+            self._client = openai.AsyncOpenAI(api_key=settings.openai_api_key, max_retries=0)
+        return self._client
+
+    def _open_cache(self) -> Optional[EmbeddingCache]:
+        if not settings.embedding_cache_enabled:
+            return None
+        try:
+            return EmbeddingCache(
+                settings.embedding_cache_path,
+                max_bytes=settings.embedding_cache_max_mb * 1024 * 1024,
+                memory_entries=settings.embedding_cache_memory_entries
+            )
+        except Exception as e:
+            # e.g. read-only filesystems on serverless deployments
+            logger.warning("⚠️ Embedding cache disabled: %s", e)
+            return None
+
+    def _request_params(self) -> Dict[str, object]:
+        params: Dict[str, object] = {"model": self.model}
+        if self.dimensions:
+            params["dimensions"] = self.dimensions
+        return params
+
+    def _cache_key(self, text: str) -> str:
+        return embedding_cache_key(self.model, self.dimensions, text)
+
+    async def _cached(self, texts: List[str]) -> Dict[str, List[float]]:
+        """Cached embeddings for ``texts``, keyed by text"""
+        if self.cache is None:
+            return {}
+        keys = {text: self._cache_key(text) for text in texts}
+        found = await self.cache.get_many(keys.values())
+        return {text: found[key].tolist() for text, key in keys.items() if key in found}
+
+    async def _remember(self, embeddings: Dict[str, List[float]]) -> None:
+        if self.cache is not None and embeddings:
+            await self.cache.put_many({self._cache_key(text): vector for text, vector in embeddings.items()})
 
     async def generate_embedding(self, text: str) -> Optional[List[float]]:
         """Generate embedding for a single text"""
         try:
             if not text.strip():
                 return None
-            response = await self.client.embeddings.create(
-                model=self.model,
-                input=text.strip()
-            )
-            return response.data[0].embedding
+            text = text.strip()
+            cached = await self._cached([text])
+            if text in cached:
+                return cached[text]
+            with metrics.stage("embedding"):
+                response = await retry_async(
+                    lambda: self.client.embeddings.create(
+                        input=text,
+                        **self._request_params()
+                    ),
+                    max_retries=settings.embedding_max_retries,
+                    base_delay=settings.llm_retry_base_delay,
+                    max_delay=settings.llm_retry_max_delay,
+                    label="Embedding"
+                )
+            embedding = response.data[0].embedding
+            await self._remember({text: embedding})
+            return embedding
         except Exception as e:
-            print(f"❌ Error generating embedding: {e}")
+            logger.error("❌ Error generating embedding: %s", e)
             return None
 
+    def _plan_batches(self, texts: List[str], token_counts: Dict[str, int]) -> List[List[str]]:
+        """Split texts into sub-batches within the API's input and token limits"""
+        batches: List[List[str]] = []
+        current: List[str] = []
+        current_tokens = 0
+        for text in texts:
+            tokens = token_counts[text]
+            if current and (len(current) >= settings.embedding_batch_max_inputs
+                            or current_tokens + tokens > settings.embedding_batch_max_tokens):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(text)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    async def _embed_sub_batch(self, batch: List[str]) -> Dict[str, List[float]]:
+        """Embed one sub-batch; texts missing from the result failed.
+
+        A sub-batch rejected for one of its inputs (a 400 blaming ``input``)
+        is split in halves and each half retried, so only the offending
+        inputs are dropped. Any other error (auth, unsupported parameters,
+        retries exhausted) affects the whole request, so the sub-batch fails
+        at once; splitting would only multiply calls to a failing API.
+        """
+        async def _create():
+            async with self._semaphore:
+                return await self.client.embeddings.create(
+                    input=batch,
+                    **self._request_params()
+                )
+        try:
+            response = await retry_async(
+                _create,
+                max_retries=settings.embedding_max_retries,
+                base_delay=settings.llm_retry_base_delay,
+                max_delay=settings.llm_retry_max_delay,
+                label=f"Embedding sub-batch of {len(batch)}"
+            )
+        except Exception as e:
+            if len(batch) > 1 and _is_input_rejection(e):
+                middle = len(batch) // 2
+                halves = await asyncio.gather(self._embed_sub_batch(batch[:middle]),
+                                              self._embed_sub_batch(batch[middle:]))
+                return {**halves[0], **halves[1]}
+            logger.error("❌ Error generating embeddings for sub-batch of %d: %s", len(batch), e)
+            return {}
+        ordered = sorted(response.data, key=lambda d: d.index)
+        embeddings = {text: data.embedding for text, data in zip(batch, ordered)}
+        await self._remember(embeddings)
+        return embeddings
+
     async def generate_embeddings_batch(self, texts: List[str]) -> List[Optional[List[float]]]:
-        """Generate embeddings for multiple texts"""
+        """Generate embeddings for multiple texts.
+
+        The result is aligned one-to-one with ``texts``: empty inputs, inputs
+        over the per-input token limit and inputs the API failed to embed
+        come back as None. Cache misses are deduplicated, split into
+        token-budgeted sub-batches and sent with concurrency bounded per
+        service instance.
+        """
         try:
             if not texts:
                 return []
-            valid_texts = [text.strip() for text in texts if text.strip()]
-            if not valid_texts:
-                return []
-            response = await self.client.embeddings.create(
-                model=self.model,
-                input=valid_texts
-            )
-            embeddings = []
-            for data in response.data:
-                embeddings.append(data.embedding)
-            return embeddings
+            stripped = [text.strip() if isinstance(text, str) else "" for text in texts]
+            unique = [text for text in dict.fromkeys(stripped) if text]
+            embeddings = await self._cached(unique)
+
+            # Counted once, for both the per-input limit and batch planning
+            token_counts = {text: count_tokens(text, self.model) for text in unique if text not in embeddings}
+            misses = []
+            for text, tokens in token_counts.items():
+                if tokens > settings.embedding_max_input_tokens:
+                    logger.warning("⚠️ Skipping embedding input over %d tokens",
+                                   settings.embedding_max_input_tokens)
+                    continue
+                misses.append(text)
+
+            if misses:
+                with metrics.stage("embedding"):
+                    results = await asyncio.gather(
+                        *(self._embed_sub_batch(batch) for batch in self._plan_batches(misses, token_counts))
+                    )
+                for result in results:
+                    embeddings.update(result)
+
+            return [embeddings.get(text) if text else None for text in stripped]
         except Exception as e:
-            print(f"❌ Error generating batch embeddings: {e}")
-            return []
+            logger.error("❌ Error generating batch embeddings: %s", e)
+            return [None] * len(texts)
 
     async def test_connection(self) -> bool:
         """Test OpenAI connection"""
@@ -49,7 +209,7 @@ class EmbeddingService:
             test_embedding = await self.generate_embedding("test")
             return test_embedding is not None
         except Exception as e:
-            print(f"❌ OpenAI connection test failed: {e}")
+            logger.error("❌ OpenAI connection test failed: %s", e)
             return False
 
     async def get_embedding_dimensions(self) -> Optional[int]:
@@ -58,5 +218,16 @@ class EmbeddingService:
             test_embedding = await self.generate_embedding("test")
             return len(test_embedding) if test_embedding else None
         except Exception as e:
-            print(f"❌ Error getting embedding dimensions: {e}")
+            logger.error("❌ Error getting embedding dimensions: %s", e)
             return None
+
+    def get_cache_stats(self) -> Optional[Dict[str, object]]:
+        return self.cache.get_stats() if self.cache else None
+
+    async def close(self) -> None:
+        if self.cache is not None:
+            self.cache.close()
+            self.cache = None
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
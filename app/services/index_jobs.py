@@ -0,0 +1,260 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.indexer import IncrementalIndexer
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+
+@dataclass
+class IndexJob:
+    id: str
+    company_id: str
+    full: bool = False
+    status: str = QUEUED
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    stages: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    requests: int = 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        end = self.finished_at or time.time()
+        data["queued_seconds"] = (self.started_at or end) - self.created_at
+        data["run_seconds"] = end - self.started_at if self.started_at else None
+        return data
+
+
+class JobStore:
+    """SQLite table of index jobs, so their state survives restarts"""
+
+    def __init__(self, path: str, history: int = 1000):
+        self.path = path
+        self.history = history
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS index_jobs ("
+            " id TEXT PRIMARY KEY,"
+            " company_id TEXT NOT NULL,"
+            " status TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " data TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_index_jobs_created ON index_jobs(created_at)")
+
+    @staticmethod
+    def row(job: IndexJob) -> Tuple[str, str, str, float, str]:
+        """Snapshot of ``job`` as a table row"""
+        return job.id, job.company_id, job.status, job.created_at, json.dumps(asdict(job), default=str)
+
+    def save(self, job: IndexJob) -> None:
+        self.save_rows([self.row(job)])
+
+    def save_rows(self, rows: List[Tuple[str, str, str, float, str]]) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO index_jobs (id, company_id, status, created_at, data) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+
+    def get(self, job_id: str) -> Optional[IndexJob]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM index_jobs WHERE id = ?", (job_id,)).fetchone()
+        return IndexJob(**json.loads(row[0])) if row else None
+
+    def active(self) -> List[IndexJob]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM index_jobs WHERE status IN (?, ?) ORDER BY created_at", ACTIVE_STATUSES
+            ).fetchall()
+        return [IndexJob(**json.loads(row[0])) for row in rows]
+
+    def prune(self) -> None:
+        """Keep only the newest ``history`` finished jobs"""
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM index_jobs WHERE status NOT IN (?, ?) AND id NOT IN "
+                "(SELECT id FROM index_jobs ORDER BY created_at DESC LIMIT ?)",
+                (*ACTIVE_STATUSES, self.history)
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class IndexJobManager:
+    """Runs company index jobs in the background on a bounded worker pool.
+
+    ``enqueue`` returns immediately with a job. Requests for a company that
+    already has a queued job join that job; if the company's job is already
+    running, one follow-up job is queued so changes made meanwhile are not
+    missed. A company never has two jobs running at once. Job state and
+    per-stage progress are persisted in a local SQLite store, off the event
+    loop and at most every ``progress_interval`` seconds for progress within
+    a stage; jobs left unfinished by a previous process are queued again on
+    start.
+    """
+
+    def __init__(self, indexer: IncrementalIndexer, store: JobStore, workers: int = 2,
+                 progress_interval: float = 2.0):
+        self.indexer = indexer
+        self.store = store
+        self.workers = max(1, workers)
+        self.progress_interval = progress_interval
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._jobs: Dict[str, IndexJob] = {}
+        self._queued: Dict[str, IndexJob] = {}
+        self._running: Dict[str, IndexJob] = {}
+        self._done: Dict[str, asyncio.Event] = {}
+        self._tasks: List[asyncio.Task] = []
+        # Latest unwritten snapshot per job, drained by one writer task
+        self._unsaved: Dict[str, Tuple[str, str, str, float, str]] = {}
+        self._writer: Optional[asyncio.Task] = None
+
+    def _persist(self, job: IndexJob) -> None:
+        """Queue a snapshot of ``job`` for the store without blocking the loop"""
+        self._unsaved[job.id] = JobStore.row(job)
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.get_running_loop().create_task(self._write_unsaved())
+
+    async def _write_unsaved(self) -> None:
+        while self._unsaved:
+            rows = dict(self._unsaved)
+            try:
+                await asyncio.to_thread(self.store.save_rows, list(rows.values()))
+            except Exception as e:
+                logger.warning("⚠️ Could not persist %d index job(s): %s", len(rows), e)
+            # Snapshots stay readable until written; newer ones are kept for the next pass
+            for job_id, row in rows.items():
+                if self._unsaved.get(job_id) is row:
+                    del self._unsaved[job_id]
+
+    def _submit(self, job: IndexJob) -> None:
+        self._jobs[job.id] = job
+        self._queued[job.company_id] = job
+        self._done[job.id] = asyncio.Event()
+        self._persist(job)
+        if job.company_id not in self._running:
+            self._queue.put_nowait(job.id)
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        for job in await asyncio.to_thread(self.store.active):
+            queued = self._queued.get(job.company_id)
+            if queued is not None:
+                queued.requests += job.requests
+                job.status, job.error = FAILED, f"Interrupted by restart; merged into job {queued.id}"
+                self._persist(job)
+                continue
+            logger.warning("⚠️ Re-queuing unfinished index job %s for company %s", job.id, job.company_id)
+            job.status, job.started_at, job.finished_at, job.stages = QUEUED, None, None, {}
+            self._submit(job)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._writer is not None:
+            await self._writer
+        await asyncio.to_thread(self.store.close)
+
+    def enqueue(self, company_id: str, full: bool = False) -> IndexJob:
+        """Queue an index run for a company, coalescing with a queued one"""
+        job = self._queued.get(company_id)
+        if job is not None:
+            job.requests += 1
+            job.full = job.full or full
+            self._persist(job)
+            return job
+        job = IndexJob(id=uuid.uuid4().hex, company_id=company_id, full=full)
+        self._submit(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[IndexJob]:
+        job = self._jobs.get(job_id)
+        if job is None and job_id in self._unsaved:
+            job = IndexJob(**json.loads(self._unsaved[job_id][-1]))
+        return job or self.store.get(job_id)
+
+    async def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[IndexJob]:
+        event = self._done.get(job_id)
+        if event is not None:
+            await asyncio.wait_for(event.wait(), timeout)
+        return self.get(job_id)
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(self._jobs[job_id])
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: IndexJob) -> None:
+        del self._queued[job.company_id]
+        self._running[job.company_id] = job
+        job.status, job.started_at = RUNNING, time.time()
+        self._persist(job)
+
+        persisted_at = time.monotonic()
+
+        def progress(stage: str, fields: Dict[str, Any]) -> None:
+            nonlocal persisted_at
+            job.stages.setdefault(stage, {}).update(fields)
+            # Stage starts and ends are always saved, counts in between throttled
+            if "status" in fields or time.monotonic() - persisted_at >= self.progress_interval:
+                persisted_at = time.monotonic()
+                self._persist(job)
+
+        try:
+            job.result = await self.indexer.index_company(job.company_id, full=job.full, progress=progress)
+            job.status = SUCCEEDED
+        except Exception as e:
+            logger.error("❌ Index job %s for company %s failed: %s", job.id, job.company_id, e)
+            job.status, job.error = FAILED, str(e)
+        finally:
+            job.finished_at = time.time()
+            del self._running[job.company_id]
+            self._persist(job)
+            # A follow-up requested while this job ran is held until now
+            follow_up = self._queued.get(job.company_id)
+            if follow_up is not None:
+                self._queue.put_nowait(follow_up.id)
+            self._done.pop(job.id).set()
+            self._jobs.pop(job.id, None)
+            try:
+                await asyncio.to_thread(self.store.prune)
+            except Exception as e:
+                logger.warning("⚠️ Could not prune index jobs: %s", e)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "queued": len(self._queued),
+            "running": len(self._running),
+            "companies_running": list(self._running)
+        }
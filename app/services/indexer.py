@@ -0,0 +1,243 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.config.settings import settings
+from app.services.data_processor import INVENTORY_SOURCES, DataProcessorService
+from app.services.vector_store import VectorStoreService
+
+logger = logging.getLogger(__name__)
+
+COMPANY_INFO_ID = "company_info"
+
+# Called as progress(stage, fields) while a company is indexed
+ProgressCallback = Callable[[str, Dict[str, Any]], None]
+
+
+def _no_progress(stage: str, fields: Dict[str, Any]) -> None:
+    pass
+
+
+class IndexStateStore:
+    """Per-company, per-collection index watermarks kept in a JSON file.
+
+    Writes go to a temporary file that replaces the old one, so a crash
+    never leaves a half-written state behind.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._state: Dict[str, Dict[str, str]] = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self._state = json.load(f)
+            except Exception as e:
+                logger.warning("⚠️ Could not read index state %s: %s", path, e)
+
+    def get(self, company_id: str, collection_name: str) -> Optional[datetime]:
+        value = self._state.get(company_id, {}).get(collection_name)
+        return datetime.fromisoformat(value) if value else None
+
+    def set(self, company_id: str, collection_name: str, watermark: Optional[datetime]) -> None:
+        with self._lock:
+            company = self._state.setdefault(company_id, {})
+            if watermark is None:
+                company.pop(collection_name, None)
+            else:
+                company[collection_name] = watermark.isoformat()
+            self._save_locked()
+
+    def reset(self, company_id: str) -> None:
+        with self._lock:
+            if self._state.pop(company_id, None) is not None:
+                self._save_locked()
+
+    def _save_locked(self) -> None:
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._state, f)
+        os.replace(tmp, self.path)
+
+
+class IncrementalIndexer:
+    """Keeps a company's vector partitions in sync with MongoDB.
+
+    Each run loads only the documents created or updated since the stored
+    watermark, upserts them under their ``_id`` and deletes those
+    soft-deleted since then. The watermark is the previous run's start time
+    minus ``index_watermark_skew_seconds`` rather than the newest timestamp
+    seen, since ``updatedAt`` is written by clients whose clocks disagree;
+    documents in the overlap are simply upserted again. When the partition's
+    count then differs from Mongo's (hard deletes, documents that failed to
+    embed) the full id sets are compared once; a hard delete offset by an
+    equal number of missing documents is only repaired by a full re-index. A company with no watermark,
+    or whose partition is empty, is indexed in full. The three collections
+    are synced concurrently and each one streams from its Mongo cursor into
+    the embedder in bounded batches.
+    """
+
+    def __init__(self, data_processor: DataProcessorService, vector_store: VectorStoreService,
+                 state: Optional[IndexStateStore] = None):
+        self.data_processor = data_processor
+        self.vector_store = vector_store
+        self.state = state or IndexStateStore(settings.index_state_path)
+
+    async def _sync_collection(self, company_id: str, collection_name: str, full: bool,
+                               progress: ProgressCallback = _no_progress) -> Dict[str, Any]:
+        started = time.perf_counter()
+        # Naive UTC, like the datetimes Mongo returns
+        watermark = (datetime.now(timezone.utc).replace(tzinfo=None)
+                     - timedelta(seconds=settings.index_watermark_skew_seconds))
+        progress(collection_name, {"status": "running"})
+        if full:
+            await self.vector_store.clear_collection(collection_name, company_id=company_id)
+            indexed = 0
+        else:
+            indexed = await self.vector_store.count_documents(collection_name, company_id=company_id)
+        since = self.state.get(company_id, collection_name) if indexed else None
+
+        changes = await self.data_processor.get_inventory_changes(company_id, collection_name, since)
+        progress(collection_name, {"mode": "incremental" if since is not None else "full",
+                                   "total": changes["total"], "to_delete": len(changes["deleted"])})
+        upserted = await self._stream_upserts(company_id, collection_name, changes["batches"], progress)
+
+        deleted = 0
+        if changes["deleted"]:
+            deleted = await self.vector_store.delete_documents(collection_name, changes["deleted"],
+                                                              company_id=company_id)
+
+        indexed = await self.vector_store.count_documents(collection_name, company_id=company_id)
+        if since is not None and indexed != changes["total"]:
+            upserted_more, deleted_more = await self._reconcile(company_id, collection_name, progress)
+            upserted += upserted_more
+            deleted += deleted_more
+        # Written once per run rather than per batch
+        await self.vector_store.flush(collection_name, company_id=company_id)
+
+        # Only advance the watermark once the changes are stored
+        self.state.set(company_id, collection_name, watermark)
+        result = {
+            "mode": "incremental" if since is not None else "full",
+            "upserted": upserted,
+            "deleted": deleted,
+            "total": changes["total"],
+            "seconds": time.perf_counter() - started
+        }
+        progress(collection_name, {"status": "done", **result})
+        return result
+
+    async def _reconcile(self, company_id: str, collection_name: str,
+                         progress: ProgressCallback = _no_progress) -> Tuple[int, int]:
+        """Full id diff against Mongo: index what is missing, delete what is gone"""
+        indexed_ids = set(await self.vector_store.get_document_ids(collection_name, company_id=company_id))
+        diff = await self.data_processor.get_inventory_diff(company_id, collection_name, indexed_ids)
+        logger.info("Reconciling %s for %s: %d missing, %d deleted", collection_name, company_id,
+                    diff["missing"], len(diff["deleted"]))
+        upserted = await self._stream_upserts(company_id, collection_name, diff["batches"], progress)
+        deleted = 0
+        if diff["deleted"]:
+            deleted = await self.vector_store.delete_documents(collection_name, diff["deleted"],
+                                                              company_id=company_id)
+        return upserted, deleted
+
+    async def _stream_upserts(self, company_id: str, collection_name: str, batches,
+                              progress: ProgressCallback = _no_progress) -> int:
+        """Embed and store streamed batches while the next ones are read from Mongo.
+
+        The reader runs ahead by at most ``index_queue_size`` batches, so a
+        slow embedder applies backpressure to the cursor instead of letting
+        documents pile up in memory.
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, settings.index_queue_size))
+
+        async def read() -> None:
+            cancelled = False
+            try:
+                async for batch in batches:
+                    await queue.put(batch)
+            except asyncio.CancelledError:
+                cancelled = True
+                raise
+            finally:
+                await batches.aclose()  # closes the Mongo cursor
+                # Cancelled means the consumer stopped reading, so the end
+                # marker could block forever on a full queue; otherwise the
+                # consumer is still draining and the put completes
+                if not cancelled:
+                    await queue.put(None)
+
+        reader = asyncio.create_task(read())
+        upserted = 0
+        try:
+            while True:
+                batch = await queue.get()
+                if batch is None:
+                    break
+                formatted = [self.data_processor.format_document(collection_name, doc) for doc in batch]
+                added = await self.vector_store.add_documents(
+                    collection_name,
+                    [item["content"] for item in formatted],
+                    [item["metadata"] for item in formatted],
+                    [item["id"] for item in formatted],
+                    company_id=company_id
+                )
+                if not added:
+                    raise RuntimeError(f"Could not upsert {len(formatted)} documents into {collection_name}")
+                upserted += len(formatted)
+                progress(collection_name, {"upserted": upserted})
+            await reader  # surface cursor errors
+        finally:
+            if not reader.done():
+                reader.cancel()
+                await asyncio.gather(reader, return_exceptions=True)
+        return upserted
+
+    async def _sync_company_info(self, company_id: str, totals: Dict[str, int]) -> None:
+        info = await self.data_processor.get_company_info(company_id)
+        content = (
+            f"Empresa: {info['company_name']} - Administrador: {info['admin_user']} - "
+            f"Productos: {totals.get('products', 0)} - Materias primas: {totals.get('raw_materials', 0)} - "
+            f"Movimientos: {totals.get('inventory_movements', 0)}"
+        )
+        metadata = {"type": "company_info", "company": company_id, "company_name": info["company_name"]}
+        await self.vector_store.add_documents("company_info", [content], [metadata], [COMPANY_INFO_ID],
+                                              company_id=company_id)
+        await self.vector_store.flush("company_info", company_id=company_id)
+
+    async def index_company(self, company_id: str, full: bool = False,
+                            progress: ProgressCallback = _no_progress) -> Dict[str, Any]:
+        """Bring a company's index up to date; ``full`` forces a rebuild.
+
+        ``progress`` receives per-stage updates: one stage per collection,
+        then ``company_info``.
+        """
+        started = time.perf_counter()
+        if full:
+            self.state.reset(company_id)
+
+        names = list(INVENTORY_SOURCES)
+        results = await asyncio.gather(*(self._sync_collection(company_id, name, full, progress) for name in names))
+        collections = dict(zip(names, results))
+
+        stage_started = time.perf_counter()
+        progress("company_info", {"status": "running"})
+        await self._sync_company_info(company_id, {name: result["total"] for name, result in collections.items()})
+        progress("company_info", {"status": "done", "seconds": time.perf_counter() - stage_started})
+
+        return {
+            "company_id": company_id,
+            "collections": collections,
+            "upserted": sum(result["upserted"] for result in results),
+            "deleted": sum(result["deleted"] for result in results),
+            "changed": any(result["upserted"] or result["deleted"] for result in results),
+            "seconds": time.perf_counter() - started
+        }
@@ -0,0 +1,481 @@
+import calendar
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+MONTHS = {
+    "enero": 1, "febrero": 2, "marzo": 3, "abril": 4, "mayo": 5, "junio": 6,
+    "julio": 7, "agosto": 8, "septiembre": 9, "setiembre": 9, "octubre": 10,
+    "noviembre": 11, "diciembre": 12
+}
+
+MONTH_NAMES = {v: k for k, v in MONTHS.items() if k != "setiembre"}
+
+# Questions asking to see (or about one specific) invoice rather than
+# aggregate them go to the LLM
+LISTING_PATTERN = re.compile(r"\b(detall\w*|lista\w*|muestr\w*|ensena\w*|describe|cuales son|explica\w*|por que|folio|uuid|serie"
+                             r"|(?:la|una|esa|esta|mi|ultima) factura)\b")
+COUNT_PATTERN = re.compile(r"\b(cuant[ao]s|numero de|cantidad de|total de) facturas\b|\bcontar facturas\b")
+TOP_PATTERN = re.compile(r"\b(top|mayor(?:es)?|principal(?:es)?|mas (?:facturo|facturaron|vend\w*|compr\w*|gast\w*|importantes?|grandes?|alt[oa]s?)|quien(?:es)? .*\bmas\b)\b")
+AVERAGE_PATTERN = re.compile(r"\b(promedio|media|ticket promedio)\b")
+SUM_PATTERN = re.compile(r"\b(total|suma|sumatoria|cuanto|monto|importe|acumulado)\b")
+BY_MONTH_PATTERN = re.compile(r"\bpor mes\b|\bmensual\w*\b")
+EMISOR_PATTERN = re.compile(r"\b(emisor(?:es)?|proveedor(?:es)?|quien(?:es)? (?:me )?(?:facturo|facturaron|emitio|emitieron))\b")
+RECEPTOR_PATTERN = re.compile(r"\b(receptor(?:es)?|cliente(?:s)?|a quien(?:es)?)\b")
+TOP_K_PATTERN = re.compile(r"\b(?:top|los|las|primer[oa]s)\s+(\d{1,2})\b")
+LAST_DAYS_PATTERN = re.compile(r"\bultimos?\s+(\d{1,3})\s+dias\b")
+ISO_RANGE_PATTERN = re.compile(r"(\d{4}-\d{2}-\d{2})\D+(\d{4}-\d{2}-\d{2})")
+DMY_RANGE_PATTERN = re.compile(r"(\d{1,2})/(\d{1,2})/(\d{4})\D+(\d{1,2})/(\d{1,2})/(\d{4})")
+MONTH_PATTERN = re.compile(r"\b(?:en|de|del mes de|durante)\s+(" + "|".join(MONTHS) + r")(?:\s+(?:de|del)?\s*(\d{4}))?\b")
+YEAR_PATTERN = re.compile(r"\b(?:en|del|durante) (?:el )?(?:ano )?(20\d{2})\b(?![-/])")
+TERM_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Words an aggregate question may contain besides emisor/receptor names.
+# Any other word (a concept like "gasolina", or a name that matches no
+# emisor/receptor) is a filter the table can't apply, so the question goes
+# to the LLM instead of getting an unfiltered figure.
+GENERIC_TERMS = frozenset("""
+    a al algo cada como con cual cuales cuando de del desde donde durante e el en entre es esa ese eso esta
+    este esto estas estos fue fueron ha han hasta hay la las le les lo los me mi mis muy nos nuestra nuestras
+    nuestro nuestros o para por que se ser si sin son su sus te tu tus un una unas uno unos y ya
+    dame dime quiero quisiera saber ver puedes podrias calcula calcular muestrame tengo tenemos tuve tuvimos
+    factura facturas cfdi comprobante comprobantes empresa negocio compania dinero moneda pesos mxn usd dolares
+    total totales suma sumatoria acumulado acumulada cuanto cuanta cuantos cuantas numero cantidad contar
+    monto montos importe importes promedio media ticket top mayor mayores principal principales mas
+    importante importantes grande grandes alto alta altos altas quien quienes emisor emisores proveedor
+    proveedores receptor receptores cliente clientes iva impuesto impuestos subtotal mensual mensuales
+    mensualmente hoy dia dias semana mes meses ano anos pasado pasada anterior ultimo ultimos ultima ultimas
+    primero primeros primera primeras periodo general
+""".split()) | frozenset(MONTHS)
+# Verb stems of "facturar", "gastar", "pagar", ... in any conjugation
+GENERIC_STEMS = ("factur", "gast", "pag", "compr", "vend", "emit", "recib", "ingres", "egres", "cobr")
+# Legal-form words that don't identify an emisor/receptor
+LEGAL_TERMS = frozenset(("sa", "sab", "de", "cv", "rl", "srl", "sc", "sapi", "ac", "s", "a", "c", "v", "r", "l"))
+
+
+def fold_text(text: str) -> str:
+    """Lowercase and strip accents"""
+    normalized = unicodedata.normalize("NFKD", str(text).lower())
+    return "".join(ch for ch in normalized if not unicodedata.combining(ch))
+
+
+def is_generic_term(term: str) -> bool:
+    return term in GENERIC_TERMS or term.isdigit() or term.startswith(GENERIC_STEMS)
+
+
+def content_terms(folded: str) -> List[str]:
+    """Words of a folded question that are not generic to invoice questions"""
+    return [term for term in TERM_PATTERN.findall(folded) if not is_generic_term(term)]
+
+
+def _to_float(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _iva(data: Dict[str, Any]) -> float:
+    traslados = data.get('iva_trasladado') or []
+    if isinstance(traslados, dict):
+        traslados = [traslados]
+    return sum(_to_float(t.get('importe', 0)) for t in traslados if isinstance(t, dict))
+
+
+def _parse_dates(values: List[str]) -> np.ndarray:
+    try:
+        return np.array(values, dtype="datetime64[D]")
+    except ValueError:
+        parsed = np.empty(len(values), dtype="datetime64[D]")
+        for i, value in enumerate(values):
+            try:
+                parsed[i] = np.datetime64(value, "D")
+            except ValueError:
+                parsed[i] = np.datetime64("NaT")
+        return parsed
+
+
+def _encode(values: List[str]) -> Tuple[np.ndarray, List[str]]:
+    """Categorical codes and category labels for a column of strings"""
+    categories: Dict[str, int] = {}
+    codes = np.fromiter(
+        (categories.setdefault(v, len(categories)) for v in values),
+        dtype=np.int32,
+        count=len(values)
+    )
+    return codes, list(categories)
+
+
+class InvoiceTable:
+    """Columnar, NumPy-backed view over the ``invoiceData`` of a set of invoices.
+
+    Amounts are float64 columns, ``fecha`` is datetime64[D] (NaT when missing
+    or unparseable) and emisor/receptor/moneda are categorical int32 codes, so
+    filters, group-bys and top-k run vectorized over every invoice.
+    """
+
+    def __init__(self, invoices: List[Dict[str, Any]]):
+        self.rows = [inv for inv in invoices if isinstance(inv, dict) and inv.get('invoiceData')]
+        records = [inv['invoiceData'] for inv in self.rows]
+        n = len(records)
+        self.size = n
+        self.uuid = [str(r.get('uuid', '')) for r in records]
+        self.folio = [str(r.get('folio', '')) for r in records]
+        self.total = np.fromiter((_to_float(r.get('total')) for r in records), dtype=np.float64, count=n)
+        self.subtotal = np.fromiter((_to_float(r.get('subtotal')) for r in records), dtype=np.float64, count=n)
+        self.iva = np.fromiter((_iva(r) for r in records), dtype=np.float64, count=n)
+        self.fecha = _parse_dates([str(r.get('fecha') or 'NaT')[:10] for r in records])
+        self.emisor, self.emisor_names = _encode([str(r.get('emisor_nombre') or 'N/A') for r in records])
+        self.receptor, self.receptor_names = _encode([str(r.get('receptor_nombre') or 'N/A') for r in records])
+        self.moneda, self.moneda_names = _encode([str(r.get('moneda') or 'MXN') for r in records])
+        self._label_terms: Dict[str, Tuple[Dict[str, List[int]], List[str]]] = {}
+
+    @classmethod
+    def from_invoices(cls, invoices: List[Dict[str, Any]]) -> "InvoiceTable":
+        return cls(invoices)
+
+    def column(self, name: str) -> np.ndarray:
+        return getattr(self, name)
+
+    def labels(self, name: str) -> List[str]:
+        return getattr(self, f"{name}_names")
+
+    def mask(self, date_from: Optional[date] = None, date_to: Optional[date] = None,
+             emisor: Optional[int] = None, receptor: Optional[int] = None,
+             moneda: Optional[int] = None) -> np.ndarray:
+        """Boolean row mask; date bounds are inclusive"""
+        mask = np.ones(self.size, dtype=bool)
+        if date_from is not None:
+            mask &= self.fecha >= np.datetime64(date_from, "D")
+        if date_to is not None:
+            mask &= self.fecha <= np.datetime64(date_to, "D")
+        if emisor is not None:
+            mask &= self.emisor == emisor
+        if receptor is not None:
+            mask &= self.receptor == receptor
+        if moneda is not None:
+            mask &= self.moneda == moneda
+        return mask
+
+    def sum_by_currency(self, column: str, mask: np.ndarray) -> Dict[str, float]:
+        sums = np.bincount(self.moneda[mask], weights=self.column(column)[mask], minlength=len(self.moneda_names))
+        counts = np.bincount(self.moneda[mask], minlength=len(self.moneda_names))
+        return {self.moneda_names[i]: float(sums[i]) for i in np.flatnonzero(counts)}
+
+    def count_by_currency(self, mask: np.ndarray) -> Dict[str, int]:
+        counts = np.bincount(self.moneda[mask], minlength=len(self.moneda_names))
+        return {self.moneda_names[i]: int(counts[i]) for i in np.flatnonzero(counts)}
+
+    def group_sum(self, by: str, column: str, mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Per-category sums and counts of ``column`` grouped by ``by``"""
+        codes = self.column(by)[mask]
+        minlength = len(self.labels(by))
+        sums = np.bincount(codes, weights=self.column(column)[mask], minlength=minlength)
+        counts = np.bincount(codes, minlength=minlength)
+        return sums, counts
+
+    def top_k(self, by: str, column: str, k: int, mask: np.ndarray) -> List[Tuple[str, float, int]]:
+        """Top ``k`` categories of ``by`` ranked by the sum of ``column``"""
+        sums, counts = self.group_sum(by, column, mask)
+        present = np.flatnonzero(counts)
+        if present.size == 0:
+            return []
+        k = min(k, present.size)
+        candidates = present[np.argpartition(-sums[present], k - 1)[:k]]
+        ranked = candidates[np.argsort(-sums[candidates], kind="stable")]
+        names = self.labels(by)
+        return [(names[i], float(sums[i]), int(counts[i])) for i in ranked]
+
+    def monthly_sum(self, column: str, mask: np.ndarray) -> List[Tuple[str, float, int]]:
+        """Sum of ``column`` per calendar month, oldest first"""
+        valid = mask & ~np.isnat(self.fecha)
+        if not valid.any():
+            return []
+        months = self.fecha[valid].astype("datetime64[M]")
+        unique, inverse = np.unique(months, return_inverse=True)
+        sums = np.bincount(inverse, weights=self.column(column)[valid])
+        counts = np.bincount(inverse)
+        return [(str(m), float(s), int(c)) for m, s, c in zip(unique, sums, counts)]
+
+    def _label_index(self, by: str) -> Tuple[Dict[str, List[int]], List[str]]:
+        """Distinctive words of the ``by`` labels (word -> codes) and each label's name without legal forms"""
+        index = self._label_terms.get(by)
+        if index is None:
+            words: Dict[str, List[int]] = {}
+            cores = []
+            for code, name in enumerate(self.labels(by)):
+                terms = TERM_PATTERN.findall(fold_text(name))
+                cores.append(" ".join(term for term in terms if term not in LEGAL_TERMS))
+                for term in set(terms):
+                    if len(term) >= 3 and term not in LEGAL_TERMS and not is_generic_term(term):
+                        words.setdefault(term, []).append(code)
+            index = self._label_terms[by] = (words, cores)
+        return index
+
+    def match_category(self, by: str, folded_question: str) -> Tuple[Optional[int], List[str]]:
+        """The ``by`` label the question names, and the question words that name it.
+
+        A word names a label when it equals one of the label's distinctive
+        words or, with at least 4 characters, is a prefix of one ("walmart"
+        names "Walmart de México SAB de CV"). A label made only of common
+        words is named by its whole name. The label named by the most words
+        wins; a tie is ambiguous and gives (None, []).
+        """
+        words, cores = self._label_index(by)
+        question = " ".join(TERM_PATTERN.findall(folded_question))
+        hits: Dict[int, List[str]] = {}
+        for term in dict.fromkeys(content_terms(folded_question)):
+            codes = set(words.get(term, ()))
+            if len(term) >= 4:
+                for word, word_codes in words.items():
+                    if word.startswith(term):
+                        codes.update(word_codes)
+            for code in codes:
+                hits.setdefault(code, []).append(term)
+        for code, core in enumerate(cores):
+            if len(core) >= 4 and core != "n a" and re.search(rf"\b{re.escape(core)}\b", question):
+                hits[code] = core.split()
+        if not hits:
+            return None, []
+        ranked = sorted(hits.items(), key=lambda item: -len(item[1]))
+        if len(ranked) > 1 and len(ranked[1][1]) == len(ranked[0][1]):
+            return None, []
+        return ranked[0]
+
+    def find_category(self, by: str, folded_question: str) -> Optional[int]:
+        """Code of the ``by`` label the question names unambiguously, if any"""
+        return self.match_category(by, folded_question)[0]
+
+
+@dataclass
+class AnalyticsQuery:
+    operation: str
+    metric: str = "total"
+    group_by: Optional[str] = None
+    top_k: int = 5
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+    filters: Dict[str, int] = field(default_factory=dict)
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "operation": self.operation,
+            "metric": self.metric,
+            "group_by": self.group_by,
+            "top_k": self.top_k if self.operation == "top" else None,
+            "date_from": self.date_from.isoformat() if self.date_from else None,
+            "date_to": self.date_to.isoformat() if self.date_to else None,
+            "filters": dict(self.filters)
+        }
+
+
+@dataclass
+class AnalyticsAnswer:
+    answer: str
+    query: AnalyticsQuery
+    invoices_matched: int
+
+
+def _month_bounds(year: int, month: int) -> Tuple[date, date]:
+    return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+
+
+def _ordered(date_from: date, date_to: date) -> Optional[Tuple[date, date]]:
+    return (date_from, date_to) if date_from <= date_to else None
+
+
+def parse_date_range(folded: str, today: date) -> Optional[Tuple[Optional[date], Optional[date]]]:
+    """Date range mentioned in a (folded) question, or (None, None).
+
+    None means a range is mentioned but is not a valid one (a day that
+    doesn't exist, a start after the end, "ultimos 0 dias"); answering it
+    unfiltered or for a nearby period would be a confident wrong answer.
+    """
+    match = ISO_RANGE_PATTERN.search(folded)
+    if match:
+        try:
+            return _ordered(date.fromisoformat(match.group(1)), date.fromisoformat(match.group(2)))
+        except ValueError:
+            return None
+    match = DMY_RANGE_PATTERN.search(folded)
+    if match:
+        d1, m1, y1, d2, m2, y2 = (int(g) for g in match.groups())
+        try:
+            return _ordered(date(y1, m1, d1), date(y2, m2, d2))
+        except ValueError:
+            return None
+    match = LAST_DAYS_PATTERN.search(folded)
+    if match:
+        days = int(match.group(1))
+        if days < 1:
+            return None
+        return today - timedelta(days=days - 1), today
+    if re.search(r"\bhoy\b", folded):
+        return today, today
+    if "esta semana" in folded:
+        return today - timedelta(days=today.weekday()), today
+    if "este mes" in folded:
+        return _month_bounds(today.year, today.month)[0], today
+    if "mes pasado" in folded or "mes anterior" in folded:
+        last = today.replace(day=1) - timedelta(days=1)
+        return _month_bounds(last.year, last.month)
+    if "este ano" in folded:
+        return date(today.year, 1, 1), today
+    if "ano pasado" in folded or "ano anterior" in folded:
+        return date(today.year - 1, 1, 1), date(today.year - 1, 12, 31)
+    match = MONTH_PATTERN.search(folded)
+    if match:
+        month = MONTHS[match.group(1)]
+        year = int(match.group(2)) if match.group(2) else (today.year if month <= today.month else today.year - 1)
+        return _month_bounds(year, month)
+    match = YEAR_PATTERN.search(folded)
+    if match:
+        year = int(match.group(1))
+        return date(year, 1, 1), date(year, 12, 31)
+    return None, None
+
+
+def parse_analytics_query(question: str, table: InvoiceTable, today: Optional[date] = None) -> Optional[AnalyticsQuery]:
+    """Turn an aggregate question into an AnalyticsQuery.
+
+    None means free-form: a listing or single-invoice question, or one that
+    mentions something besides an emisor/receptor name (a concept, an
+    unknown or ambiguous name, an invalid date range) that the table can't
+    filter on.
+    """
+    folded = fold_text(question)
+    if LISTING_PATTERN.search(folded):
+        return None
+
+    if re.search(r"\b(iva|impuestos?)\b", folded):
+        metric = "iva"
+    elif "subtotal" in folded:
+        metric = "subtotal"
+    else:
+        metric = "total"
+
+    group_by = None
+    if EMISOR_PATTERN.search(folded):
+        group_by = "emisor"
+    elif RECEPTOR_PATTERN.search(folded):
+        group_by = "receptor"
+
+    if TOP_PATTERN.search(folded) and group_by:
+        operation = "top"
+    elif BY_MONTH_PATTERN.search(folded):
+        operation = "monthly"
+    elif AVERAGE_PATTERN.search(folded):
+        operation = "average"
+    elif COUNT_PATTERN.search(folded):
+        operation = "count"
+    elif SUM_PATTERN.search(folded) or metric != "total":
+        operation = "group_sum" if group_by and re.search(r"\bpor (emisor|proveedor|receptor|cliente)", folded) else "sum"
+    else:
+        return None
+
+    query = AnalyticsQuery(operation=operation, metric=metric, group_by=group_by)
+    top_k = TOP_K_PATTERN.search(folded)
+    if top_k:
+        query.top_k = max(1, int(top_k.group(1)))
+    elif operation == "top" and re.search(r"\b(el|la) (mayor|principal)\b|\bquien\b", folded):
+        query.top_k = 1
+
+    date_range = parse_date_range(folded, today or date.today())
+    if date_range is None:
+        return None
+    query.date_from, query.date_to = date_range
+
+    emisor, emisor_terms = table.match_category("emisor", folded)
+    receptor, receptor_terms = table.match_category("receptor", folded)
+    if set(emisor_terms) & set(receptor_terms):
+        # The same name fits an emisor and a receptor; the LLM can tell which is meant
+        return None
+    if set(content_terms(folded)) - set(emisor_terms) - set(receptor_terms):
+        return None
+    if emisor is not None:
+        query.filters["emisor"] = emisor
+    if receptor is not None:
+        query.filters["receptor"] = receptor
+    return query
+
+
+def _money(value: float, moneda: str) -> str:
+    return f"${value:,.2f} {moneda}"
+
+
+def _format_currency_map(values: Dict[str, float]) -> str:
+    return ", ".join(_money(v, m) for m, v in values.items()) or "$0.00"
+
+
+def _period_label(query: AnalyticsQuery) -> str:
+    if query.date_from and query.date_to:
+        if query.date_from == query.date_to:
+            return f" el {query.date_from.isoformat()}"
+        return f" del {query.date_from.isoformat()} al {query.date_to.isoformat()}"
+    if query.date_from:
+        return f" desde el {query.date_from.isoformat()}"
+    return ""
+
+
+METRIC_LABELS = {"total": "monto total", "subtotal": "subtotal", "iva": "IVA"}
+
+
+def run_analytics_query(table: InvoiceTable, query: AnalyticsQuery) -> AnalyticsAnswer:
+    """Evaluate a parsed query against the table and format the answer"""
+    mask = table.mask(query.date_from, query.date_to, **query.filters)
+    matched = int(mask.sum())
+    period = _period_label(query)
+    label = METRIC_LABELS[query.metric]
+    scope = ""
+    if "emisor" in query.filters:
+        scope += f" emitidas por {table.emisor_names[query.filters['emisor']]}"
+    if "receptor" in query.filters:
+        scope += f" recibidas por {table.receptor_names[query.filters['receptor']]}"
+
+    lines = [f"- **Facturas consideradas**: {matched}{scope}{period}"]
+    if matched == 0:
+        lines.append("No encontré facturas que coincidan con los criterios de la pregunta.")
+    elif query.operation == "count":
+        for moneda, count in table.count_by_currency(mask).items():
+            lines.append(f"- **{moneda}**: {count} facturas")
+    elif query.operation == "sum":
+        lines.append(f"- **{label[0].upper() + label[1:]}**: {_format_currency_map(table.sum_by_currency(query.metric, mask))}")
+    elif query.operation == "average":
+        sums = table.sum_by_currency(query.metric, mask)
+        counts = table.count_by_currency(mask)
+        averages = {m: sums[m] / counts[m] for m in sums if counts.get(m)}
+        lines.append(f"- **Promedio de {label} por factura**: {_format_currency_map(averages)}")
+    elif query.operation == "monthly":
+        for month, total, count in table.monthly_sum(query.metric, mask):
+            year, month_number = month.split("-")
+            lines.append(f"- **{MONTH_NAMES[int(month_number)].capitalize()} {year}**: ${total:,.2f} ({count} facturas)")
+    elif query.operation in ("top", "group_sum"):
+        currencies = table.count_by_currency(mask)
+        dominant = max(currencies, key=currencies.get)
+        currency_mask = mask & (table.moneda == table.moneda_names.index(dominant))
+        k = query.top_k if query.operation == "top" else len(table.labels(query.group_by))
+        role = "Emisores" if query.group_by == "emisor" else "Receptores"
+        for rank, (name, total, count) in enumerate(table.top_k(query.group_by, query.metric, k, currency_mask), 1):
+            lines.append(f"{rank}. **{name}**: {_money(total, dominant)} en {count} facturas")
+        lines.insert(1, f"- **{role} por {label}** ({dominant}):")
+        if len(currencies) > 1:
+            lines.append(f"Nota: solo se consideraron facturas en {dominant}; hay facturas en otras monedas.")
+
+    return AnalyticsAnswer(answer="\n".join(lines), query=query, invoices_matched=matched)
+
+
+def answer_invoice_question(question: str, table: InvoiceTable, today: Optional[date] = None) -> Optional[AnalyticsAnswer]:
+    """Answer aggregate questions straight from the table.
+
+    Returns None for free-form questions, which should go to the LLM.
+    """
+    if table.size == 0:
+        return None
+    query = parse_analytics_query(question, table, today)
+    if query is None:
+        return None
+    return run_analytics_query(table, query)
@@ -0,0 +1,96 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+from app.services.invoice_analytics import fold_text
+from app.services.tokens import count_tokens
+
+# Prompt columns, in output order (keys of ``summarize_invoice``)
+INVOICE_COLUMNS = ("fecha", "serie", "folio", "emisor", "receptor", "subtotal", "iva", "total", "moneda",
+                   "uso_cfdi", "uuid")
+# Always sent: enough to identify an invoice and answer about amounts
+CORE_COLUMNS = ("fecha", "emisor", "receptor", "total", "moneda")
+# Optional columns and the (accent-free) words that ask for them; matched at word starts
+COLUMN_KEYWORDS = {
+    "serie": ("serie",),
+    "folio": ("folio", "serie"),
+    "subtotal": ("subtotal", "sin iva", "antes de iva"),
+    "iva": ("iva", "impuesto", "traslad"),
+    "uso_cfdi": ("uso",),
+    "uuid": ("uuid", "folio fiscal", "identificador")
+}
+# Questions about one invoice, or asking for everything, get every column
+DETAIL_KEYWORDS = ("detalle", "desglose", "toda la informacion", "completa", "completo")
+AMOUNT_COLUMNS = {"subtotal", "iva", "total"}
+SEPARATOR = "|"
+
+
+@dataclass
+class InvoiceContext:
+    """Invoice summaries serialized for the prompt under a token budget"""
+    text: str
+    included: int
+    candidates: int
+    tokens: int
+    columns: List[str] = field(default_factory=list)
+
+
+def select_columns(question: str, filters: Optional[Dict[str, Any]] = None) -> List[str]:
+    """Columns the question needs: the core ones plus those it mentions (all for single-invoice lookups)"""
+    padded = f" {fold_text(question)} "
+    if (filters and ("uuid" in filters or "folio" in filters)) or any(f" {k}" in padded for k in DETAIL_KEYWORDS):
+        return list(INVOICE_COLUMNS)
+    wanted = set(CORE_COLUMNS)
+    wanted.update(column for column, keywords in COLUMN_KEYWORDS.items() if any(f" {k}" in padded for k in keywords))
+    return [column for column in INVOICE_COLUMNS if column in wanted]
+
+
+def _cell(column: str, value: Any) -> str:
+    if column in AMOUNT_COLUMNS:
+        try:
+            return f"{float(value):.2f}"
+        except (TypeError, ValueError):
+            pass
+    return " ".join(str(value).replace(SEPARATOR, "/").split())
+
+
+def pack_invoice_context(question: str, summaries: Sequence[Dict[str, Any]], max_tokens: int,
+                         filters: Optional[Dict[str, Any]] = None, model: Optional[str] = None) -> InvoiceContext:
+    """Serialize ``summaries`` (most relevant first) as a header + rows table within ``max_tokens``.
+
+    Only the columns the question needs are kept, a column with the same
+    value in every invoice is stated once above the table, and rows are
+    added in order until the next one would exceed the budget. Tokens are
+    counted locally with the LLM's tokenizer (see ``count_tokens``).
+    """
+    columns = select_columns(question, filters)
+    cells = [[_cell(column, summary.get(column, "N/A")) for column in columns] for summary in summaries]
+    constant = {
+        column: cells[0][i] for i, column in enumerate(columns)
+        if len(cells) > 1 and all(row[i] == cells[0][i] for row in cells)
+    }
+    varying = [i for i, column in enumerate(columns) if column not in constant]
+
+    def preamble(included: int) -> List[str]:
+        lines = [f"Facturas incluidas: {included} de {len(summaries)}"]
+        lines += [f"{column} (todas): {value}" for column, value in constant.items()]
+        lines.append(SEPARATOR.join(columns[i] for i in varying))
+        return lines
+
+    # Counted with the widest count so the final line can't overshoot the budget
+    used = count_tokens("\n".join(preamble(len(summaries))), model)
+    rows: List[str] = []
+    for row in cells:
+        line = SEPARATOR.join(row[i] for i in varying)
+        cost = count_tokens(line, model) + 1  # + newline
+        if used + cost > max_tokens:
+            break
+        rows.append(line)
+        used += cost
+
+    return InvoiceContext(
+        text="\n".join(preamble(len(rows)) + rows),
+        included=len(rows),
+        candidates=len(summaries),
+        tokens=used,
+        columns=columns
+    )
@@ -0,0 +1,85 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+INVOICE_SYSTEM_PROMPT = "Eres un experto en análisis de facturas CFDI. Proporciona respuestas precisas y útiles basadas en los datos de facturas."
+
+INVOICE_PROMPT_TEMPLATE = """
+Eres un asistente especializado en análisis de facturas CFDI. Analiza los siguientes datos de facturas y responde la pregunta del usuario de manera precisa y útil.
+
+DATOS DE FACTURAS (una factura por línea, columnas separadas por "|"; los valores comunes a todas se indican antes de la tabla):
+{invoice_context}
+
+PREGUNTA DEL USUARIO: {question}
+
+INSTRUCCIONES:
+1. Analiza los datos de facturas proporcionados
+2. Responde la pregunta de manera clara y precisa
+3. Incluye números específicos cuando sea relevante
+4. Usa los nombres reales de emisor y receptor (no "N/A")
+5. Si no hay datos suficientes, indícalo claramente
+6. Proporciona insights útiles basados en los datos
+7. NO menciones fuentes, solo da la respuesta directa
+8. **IMPORTANTE**: Para preguntas sobre facturas, usa formato de lista con los detalles disponibles en los datos (omite los campos que no aparecen):
+   - **Total de facturas**: X
+   - **Factura 1**:
+     - **Emisor**: Nombre del emisor
+     - **Receptor**: Nombre del receptor  
+     - **Total**: $X,XXX.XX
+     - **Subtotal**: $X,XXX.XX
+     - **IVA**: $XXX.XX
+     - **Fecha**: DD de mes de AAAA
+     - **UUID**: XXXX-XXXX-XXXX-XXXX
+     - **Folio**: XXXXXX
+     - **Serie**: XXXX (si aplica)
+     - **Moneda**: MXN
+     - **Uso CFDI**: Descripción del uso
+   - **Factura 2**: (si hay más)
+
+RESPUESTA:
+"""
+
+
+def parse_invoice_request(request: Any) -> Tuple[str, str, List[Dict[str, Any]]]:
+    """Validate an invoice query body and return (question, company_id, invoices).
+
+    Raises ValueError describing the first problem found.
+    """
+    if not isinstance(request, dict):
+        raise ValueError("Request must be a dictionary")
+    for field in ("question", "company_id", "invoice_data"):
+        if field not in request:
+            raise ValueError(f"Missing '{field}' field")
+
+    invoice_data = request['invoice_data']
+    if not (isinstance(invoice_data, dict) and 'data' in invoice_data):
+        raise ValueError("Invalid invoice data structure")
+
+    return request['question'], request['company_id'], invoice_data['data']
+
+
+def summarize_invoice(invoice: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Reduce an invoice record to the fields used in the prompt"""
+    data = invoice.get('invoiceData')
+    if not data:
+        return None
+    return {
+        'emisor': data.get('emisor_nombre', 'N/A'),
+        'receptor': data.get('receptor_nombre', 'N/A'),
+        'total': data.get('total', 0),
+        'iva': data.get('iva_trasladado', [{}])[0].get('importe', 0) if data.get('iva_trasladado') else 0,
+        'fecha': data.get('fecha', 'N/A'),
+        'uuid': data.get('uuid', 'N/A'),
+        'folio': data.get('folio', 'N/A'),
+        'serie': data.get('serie', 'N/A'),
+        'subtotal': data.get('subtotal', 0),
+        'moneda': data.get('moneda', 'N/A'),
+        'uso_cfdi': data.get('uso_cfdi', 'N/A')
+    }
+
+
+def build_invoice_messages(question: str, invoice_context: str) -> List[Dict[str, str]]:
+    """Chat messages for an invoice question over packed invoice data (see ``pack_invoice_context``)"""
+    prompt = INVOICE_PROMPT_TEMPLATE.format(invoice_context=invoice_context, question=question)
+    return [
+        {"role": "system", "content": INVOICE_SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
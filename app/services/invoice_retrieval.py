@@ -0,0 +1,166 @@
+import hashlib
+import logging
+import re
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.config.settings import settings
+from app.services.embeddings import EmbeddingService
+from app.services.invoice_analytics import InvoiceTable, fold_text, parse_date_range
+from app.services.invoice_rag import summarize_invoice
+
+logger = logging.getLogger(__name__)
+
+UUID_PATTERN = re.compile(r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b")
+FOLIO_PATTERN = re.compile(r"\bfolio\s*(?:numero|num\.?|no\.?|#)?\s*:?\s*([a-z0-9][a-z0-9-]*)")
+
+
+def invoice_text(summary: Dict[str, Any]) -> str:
+    """Text embedded for an invoice"""
+    return (
+        f"Factura {summary['serie']}{summary['folio']} - Emisor: {summary['emisor']} - "
+        f"Receptor: {summary['receptor']} - Fecha: {summary['fecha']} - Total: {summary['total']} "
+        f"{summary['moneda']} - IVA: {summary['iva']} - Uso CFDI: {summary['uso_cfdi']} - UUID: {summary['uuid']}"
+    )
+
+
+class InvoiceEmbeddingCache:
+    """LRU of normalized invoice embeddings keyed by CFDI uuid.
+
+    Entries also remember a hash of the embedded text, so an invoice whose
+    fields changed is re-embedded even though its uuid is the same.
+    """
+
+    def __init__(self, max_entries: int = 50000):
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _text_hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get(self, uuid: str, text: str) -> Optional[np.ndarray]:
+        entry = self._entries.get(uuid)
+        if entry is None or entry[0] != self._text_hash(text):
+            self.misses += 1
+            return None
+        self._entries.move_to_end(uuid)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, uuid: str, text: str, vector: np.ndarray) -> None:
+        self._entries[uuid] = (self._text_hash(text), vector)
+        self._entries.move_to_end(uuid)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "max_entries": self.max_entries,
+                "hits": self.hits, "misses": self.misses}
+
+
+@dataclass
+class RetrievalResult:
+    summaries: List[Dict[str, Any]]
+    method: str
+    candidates: int
+    filters: Dict[str, Any] = field(default_factory=dict)
+
+
+class InvoiceRetriever:
+    """Selects the invoices most relevant to a question for the LLM prompt.
+
+    Structured filters parsed from the question (uuid, folio, date range,
+    emisor/receptor names) narrow the candidates first; if more than
+    ``top_k`` remain they are ranked by cosine similarity between the
+    question and cached invoice embeddings. If embeddings are unavailable
+    the first ``top_k`` candidates are used, as before.
+    """
+
+    def __init__(self, embedding_service: EmbeddingService, cache: Optional[InvoiceEmbeddingCache] = None):
+        self.embedding_service = embedding_service
+        self.cache = cache or InvoiceEmbeddingCache(settings.invoice_embedding_cache_size)
+
+    def _filter(self, question: str, table: InvoiceTable, today: Optional[date]) -> Tuple[np.ndarray, Dict[str, Any]]:
+        folded = fold_text(question)
+        filters: Dict[str, Any] = {}
+
+        uuids = set(UUID_PATTERN.findall(folded))
+        if uuids:
+            filters["uuid"] = sorted(uuids)
+            matches = np.fromiter((u.lower() in uuids for u in table.uuid), dtype=bool, count=table.size)
+            if matches.any():
+                return matches, filters
+
+        folio = FOLIO_PATTERN.search(folded)
+        if folio:
+            filters["folio"] = folio.group(1)
+            matches = np.fromiter((fold_text(f) == folio.group(1) for f in table.folio), dtype=bool, count=table.size)
+            if matches.any():
+                return matches, filters
+
+        # An invalid range filters nothing; similarity ranking still applies
+        date_from, date_to = parse_date_range(folded, today or date.today()) or (None, None)
+        emisor = table.find_category("emisor", folded)
+        receptor = table.find_category("receptor", folded)
+        if date_from or date_to:
+            filters["date_from"] = date_from.isoformat() if date_from else None
+            filters["date_to"] = date_to.isoformat() if date_to else None
+        if emisor is not None:
+            filters["emisor"] = table.emisor_names[emisor]
+        if receptor is not None and receptor != emisor:
+            filters["receptor"] = table.receptor_names[receptor]
+        else:
+            receptor = None
+        mask = table.mask(date_from, date_to, emisor=emisor, receptor=receptor)
+        if not mask.any():
+            # Filters that exclude everything are more likely misparsed than meant
+            return np.ones(table.size, dtype=bool), {}
+        return mask, filters
+
+    async def _embed_candidates(self, summaries: List[Dict[str, Any]]) -> Optional[np.ndarray]:
+        texts = [invoice_text(s) for s in summaries]
+        vectors: List[Optional[np.ndarray]] = [self.cache.get(str(s['uuid']), t) for s, t in zip(summaries, texts)]
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            embeddings = await self.embedding_service.generate_embeddings_batch([texts[i] for i in missing])
+            if len(embeddings) != len(missing) or any(e is None for e in embeddings):
+                return None
+            for i, embedding in zip(missing, embeddings):
+                vector = np.asarray(embedding, dtype=np.float32)
+                vector /= (np.linalg.norm(vector) or 1.0)
+                vectors[i] = vector
+                if summaries[i]['uuid'] not in ("", "N/A"):
+                    self.cache.put(str(summaries[i]['uuid']), texts[i], vector)
+        return np.vstack(vectors)
+
+    async def retrieve(self, question: str, table: InvoiceTable, top_k: int = 20,
+                       today: Optional[date] = None) -> RetrievalResult:
+        mask, filters = self._filter(question, table, today)
+        indices = np.flatnonzero(mask)
+        summaries = [summarize_invoice(table.rows[i]) for i in indices]
+
+        if len(summaries) <= top_k:
+            return RetrievalResult(summaries, "filters" if filters else "all", len(summaries), filters)
+
+        try:
+            matrix = await self._embed_candidates(summaries)
+            query = await self.embedding_service.generate_embedding(question)
+        except Exception as e:
+            logger.warning("⚠️ Invoice retrieval embedding error: %s", e)
+            matrix, query = None, None
+        if matrix is None or query is None:
+            return RetrievalResult(summaries[:top_k], "truncated", len(summaries), filters)
+
+        query_vector = np.asarray(query, dtype=np.float32)
+        query_vector /= (np.linalg.norm(query_vector) or 1.0)
+        scores = matrix @ query_vector
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return RetrievalResult([summaries[i] for i in best], "semantic", len(summaries), filters)
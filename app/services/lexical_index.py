@@ -0,0 +1,147 @@
+import math
+import re
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+from app.services.invoice_analytics import fold_text
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+
+SPANISH_STOP_WORDS = frozenset("""
+a al algo algun alguna algunas alguno algunos ante antes como con contra cual cuales cuando cuanta cuantas
+cuanto cuantos de del desde donde durante e el ella ellas ellos en entre era eran es esa esas ese eso esos
+esta estan estas este esto estos fue fueron ha han hay hasta la las le les lo los mas me mi mis mucho muy
+nada ni no nos o os otra otras otro otros para pero poco por porque que quien quienes se sea ser si sin
+sobre son su sus tambien tan tanto te tiene tienen tengo todo todos tu tus un una unas uno unos y ya yo
+dame dime muestra muestrame tenemos quiero saber
+""".split())
+
+# Plural "es" is only stripped after consonants a singular can end in
+_PLURAL_ES = re.compile(r"(?<=[lrndzj])es$")
+
+
+def stem(token: str) -> str:
+    """Light Spanish stemmer: drop plural endings and a final gender vowel.
+
+    Tokens containing digits (SKUs, folios) are left untouched.
+    """
+    if len(token) <= 3 or not token.isalpha():
+        return token
+    if _PLURAL_ES.search(token):
+        token = token[:-2]
+    elif token.endswith("s"):
+        token = token[:-1]
+    if len(token) > 3 and token[-1] in "aeo":
+        token = token[:-1]
+    return token
+
+
+def is_code(token: str) -> bool:
+    """SKU/folio-like token: mixes digits with letters or separators"""
+    return any(ch.isdigit() for ch in token) and (any(ch.isalpha() for ch in token) or not token.isdigit())
+
+
+def tokenize(text: str, stop_words: frozenset = SPANISH_STOP_WORDS) -> List[str]:
+    """Accent-folded, stop-word-free, stemmed terms of ``text``"""
+    return [stem(token) for token in TOKEN_PATTERN.findall(fold_text(text)) if token not in stop_words]
+
+
+@dataclass
+class LexicalHit:
+    id: str
+    document: str
+    metadata: Dict[str, Any]
+    score: float
+    matched_terms: int
+
+
+class BM25Index:
+    """In-memory BM25 inverted index over short documents.
+
+    Postings map each term to ``{doc_id: term frequency}``, so a query
+    only touches the documents that contain one of its terms. Documents
+    are upserted and removed by id.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self.doc_terms: Dict[str, Dict[str, int]] = {}
+        self.doc_length: Dict[str, int] = {}
+        self.records: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.doc_terms)
+
+    def upsert(self, ids: Sequence[str], documents: Sequence[str],
+               metadatas: Optional[Sequence[Dict[str, Any]]] = None) -> None:
+        self.remove(ids)
+        for i, doc_id in enumerate(ids):
+            counts: Dict[str, int] = defaultdict(int)
+            for term in tokenize(documents[i]):
+                counts[term] += 1
+            self.doc_terms[doc_id] = dict(counts)
+            self.records[doc_id] = (documents[i], metadatas[i] if metadatas else {})
+            self.doc_length[doc_id] = sum(counts.values())
+            self.total_length += self.doc_length[doc_id]
+            for term, tf in counts.items():
+                self.postings[term][doc_id] = tf
+
+    def remove(self, ids: Iterable[str]) -> None:
+        for doc_id in ids:
+            counts = self.doc_terms.pop(doc_id, None)
+            if counts is None:
+                continue
+            self.records.pop(doc_id, None)
+            self.total_length -= self.doc_length.pop(doc_id)
+            for term in counts:
+                posting = self.postings.get(term)
+                if posting is not None:
+                    posting.pop(doc_id, None)
+                    if not posting:
+                        del self.postings[term]
+
+    def search(self, query: str, k: int = 10) -> List[LexicalHit]:
+        terms = list(dict.fromkeys(tokenize(query)))
+        n_docs = len(self.doc_terms)
+        if not terms or not n_docs:
+            return []
+        avg_length = self.total_length / n_docs or 1.0
+        scores: Dict[str, float] = defaultdict(float)
+        matched: Dict[str, int] = defaultdict(int)
+        for term in terms:
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1.0 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+            for doc_id, tf in posting.items():
+                norm = tf + self.k1 * (1 - self.b + self.b * self.doc_length[doc_id] / avg_length)
+                scores[doc_id] += idf * tf * (self.k1 + 1) / norm
+                matched[doc_id] += 1
+        best = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]
+        return [LexicalHit(doc_id, *self.records[doc_id], score, matched[doc_id]) for doc_id, score in best]
+
+    def is_exact(self, query: str, hits: List[LexicalHit]) -> bool:
+        """Whether ``hits`` pin down what the query names, so no vector search is needed.
+
+        True when the top document contains every query term and either a
+        term is a code (SKU, folio) or no other document matches them all.
+        """
+        terms = set(tokenize(query))
+        if not hits or not terms or hits[0].matched_terms < len(terms):
+            return False
+        if any(is_code(term) for term in terms):
+            return True
+        return len(hits) == 1 or hits[1].matched_terms < len(terms)
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[Hashable]], k: int = 60) -> List[Tuple[Hashable, float]]:
+    """Fuse ranked id lists: score(id) = sum over lists of 1 / (k + rank)"""
+    scores: Dict[Hashable, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] += 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
@@ -0,0 +1,112 @@
+import asyncio
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, List, Optional
+from app.config.settings import settings
+from app.services.metrics import metrics
+from app.services.retry import retry_async
+
+if TYPE_CHECKING:
+    import openai
+
+
+class LLMService:
+    """Shared async chat-completion client.
+
+    One ``AsyncOpenAI`` client (and its pooled HTTP connections) is reused
+    for every request. A semaphore bounds the number of in-flight completions
+    per worker, and retries with jittered backoff are handled here rather
+    than by the SDK so they also respect that bound.
+    """
+
+    def __init__(self):
+        self.model = settings.invoice_llm_model
+        self._client: Optional["openai.AsyncOpenAI"] = None
+        self._semaphore = asyncio.Semaphore(settings.llm_max_concurrency)
+
+    @property
+    def client(self) -> "openai.AsyncOpenAI":
+        if self._client is None:
+            # Imported on first use to keep them off the cold-start path
+            import httpx
+            import openai
+
+            http_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(settings.llm_timeout, connect=settings.llm_connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=settings.llm_max_connections,
+                    max_keepalive_connections=settings.llm_max_keepalive
+                )
+            )
+            self._client = openai.AsyncOpenAI(
+                api_key=settings.openai_api_key,
+                max_retries=0,
+                http_client=http_client
+            )
+        return self._client
+
+    async def chat_completion(self, messages: List[Dict[str, Any]], model: Optional[str] = None,
+                              max_tokens: int = 1000, temperature: float = 0.3) -> str:
+        """Run a chat completion and return the message content"""
+        async def _create():
+            async with self._semaphore:
+                return await self.client.chat.completions.create(
+                    model=model or self.model,
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    temperature=temperature
+                )
+
+        with metrics.stage("llm"):
+            response = await retry_async(
+                _create,
+                max_retries=settings.llm_max_retries,
+                base_delay=settings.llm_retry_base_delay,
+                max_delay=settings.llm_retry_max_delay,
+                label="Chat completion"
+            )
+        return response.choices[0].message.content
+
+    async def stream_chat_completion(self, messages: List[Dict[str, Any]], model: Optional[str] = None,
+                                     max_tokens: int = 1000, temperature: float = 0.3) -> AsyncIterator[str]:
+        """Run a streaming chat completion, yielding content deltas as they arrive.
+
+        Retries only cover opening the stream. As in ``chat_completion`` a
+        concurrency slot is taken per attempt, not across backoff sleeps;
+        the attempt that opens the stream keeps it until the stream ends.
+        Closing the generator early (e.g. on client disconnect) closes the
+        upstream response so no more tokens are generated for it.
+        """
+        async def _open():
+            await self._semaphore.acquire()
+            try:
+                return await self.client.chat.completions.create(
+                    model=model or self.model,
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    stream=True
+                )
+            except BaseException:
+                self._semaphore.release()
+                raise
+
+        stream = await retry_async(
+            _open,
+            max_retries=settings.llm_max_retries,
+            base_delay=settings.llm_retry_base_delay,
+            max_delay=settings.llm_retry_max_delay,
+            label="Streaming chat completion"
+        )
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            try:
+                await stream.close()
+            finally:
+                self._semaphore.release()
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
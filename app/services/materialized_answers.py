@@ -0,0 +1,279 @@
+import time
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.services.lexical_index import tokenize
+
+NO_STOP_WORDS: frozenset = frozenset()
+
+# Intent lexicon: phrases are tokenized (accent folding, stemming) exactly
+# like questions, so "¿Qué productos están agotados?" matches "agotado".
+# Stop words are kept because phrases such as "más stock" depend on them.
+INTENT_PHRASES: Dict[str, Sequence[str]] = {
+    "low_stock": (
+        "bajo stock", "stock bajo", "poco stock", "stock minimo", "bajo inventario", "agotado", "agotarse",
+        "por agotar", "sin stock", "sin existencia", "reabastecer", "reponer", "resurtir", "faltante", "escasez",
+        "alerta", "critico"
+    ),
+    "top_value": (
+        "mas valioso", "mayor valor", "mas valor", "mas caro", "mas costoso", "precio mas alto"
+    ),
+    "top_stock": (
+        "mas stock", "mayor stock", "mas existencia", "mas unidades", "mayor cantidad", "mas inventario"
+    ),
+    "categories": ("categoria", "tipo de producto", "clasificacion", "familia"),
+    "suppliers": ("proveedor", "suministra", "surtidor"),
+    # Bare ranking words: "principales proveedores" ranks suppliers, only on their own do they mean top_stock
+    "ranking": ("principal", "top", "mejores"),
+    "inventory_value": (
+        "valor", "cuanto vale", "vale", "dinero", "costo total", "monto"
+    ),
+    "count": ("cuanto", "cantidad", "numero", "total", "contar"),
+    "summary": ("resumen", "general", "panorama", "estado del inventario", "como esta"),
+}
+
+ENTITY_PHRASES: Dict[str, Sequence[str]] = {
+    "products": ("producto", "articulo", "mercancia", "item"),
+    "raw_materials": ("materia prima", "materia", "material", "insumo"),
+}
+
+# Entity assumed when a question names none ("all" otherwise)
+DEFAULT_ENTITY = {"categories": "products", "suppliers": "raw_materials"}
+
+# When several intents match, the most specific one wins
+INTENT_PRIORITY = ("low_stock", "top_value", "top_stock", "categories", "suppliers", "ranking",
+                   "inventory_value", "count", "summary")
+
+# Intents answered with another intent's facts
+INTENT_ALIASES = {"ranking": "top_stock"}
+
+
+class PhraseTrie:
+    """Token-level trie matching every lexicon phrase in one pass over a question"""
+
+    def __init__(self):
+        self._root: Dict[str, Any] = {}
+
+    def add(self, phrase: str, label: Tuple[str, str]) -> None:
+        node = self._root
+        for term in tokenize(phrase, NO_STOP_WORDS):
+            node = node.setdefault(term, {})
+        node.setdefault(None, set()).add(label)
+
+    def match(self, terms: Sequence[str]) -> List[Tuple[str, str]]:
+        labels = []
+        for start in range(len(terms)):
+            node = self._root
+            for term in terms[start:]:
+                node = node.get(term)
+                if node is None:
+                    break
+                labels.extend(node.get(None, ()))
+        return labels
+
+
+class IntentMatcher:
+    """Maps a question to an (intent, entity) pair using the compiled lexicon"""
+
+    def __init__(self, intents: Dict[str, Sequence[str]] = INTENT_PHRASES,
+                 entities: Dict[str, Sequence[str]] = ENTITY_PHRASES):
+        self.trie = PhraseTrie()
+        for intent, phrases in intents.items():
+            for phrase in phrases:
+                self.trie.add(phrase, ("intent", intent))
+        for entity, phrases in entities.items():
+            for phrase in phrases:
+                self.trie.add(phrase, ("entity", entity))
+
+    def match(self, question: str) -> Tuple[str, Optional[str]]:
+        found = self.trie.match(tokenize(question, NO_STOP_WORDS))
+        intents = {name for kind, name in found if kind == "intent"}
+        entities = {name for kind, name in found if kind == "entity"}
+        entity = None
+        if len(entities) == 1:
+            entity = next(iter(entities))
+        elif entities:
+            entity = "all"
+        intent = next((name for name in INTENT_PRIORITY if name in intents), None)
+        intent = INTENT_ALIASES.get(intent, intent)
+        if intent is None:
+            # Naming only a product family keeps the old overview answers
+            intent = "overview" if entity in ("products", "raw_materials") else "summary"
+        return intent, entity
+
+
+def _number(value: Any) -> float:
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _value(item: Dict[str, Any]) -> float:
+    return _number(item.get("stock")) * _number(item.get("precio"))
+
+
+def _is_low_stock(item: Dict[str, Any]) -> bool:
+    return _number(item.get("stock")) <= _number(item.get("stockMinimo"))
+
+
+def _top(items: List[Dict[str, Any]], key, n: int) -> List[Dict[str, Any]]:
+    return sorted(items, key=key, reverse=True)[:n]
+
+
+@dataclass
+class CompanyFacts:
+    """Answer-ready facts about one company, built from an inventory snapshot"""
+
+    company_id: str
+    company_name: str
+    statistics: Dict[str, Any]
+    answers: Dict[Tuple[str, str], Tuple[str, List[Dict[str, Any]]]] = field(default_factory=dict)
+    built_at: float = field(default_factory=time.time)
+
+
+def _lines(items: List[Dict[str, Any]]) -> str:
+    return "".join(f"- {item.get('name', 'Sin nombre')}: {item.get('stock', 0)} unidades en stock\n" for item in items)
+
+
+def build_company_facts(company_id: str, snapshot: Dict[str, Any], top_n: int = 5) -> CompanyFacts:
+    """Precompute totals, rankings and breakdowns and render every templated answer"""
+    products = [p for p in snapshot.get("products", []) if isinstance(p, dict)]
+    raw_materials = [r for r in snapshot.get("raw_materials", []) if isinstance(r, dict)]
+    statistics = dict(snapshot.get("statistics") or {})
+    statistics.setdefault("total_products", len(products))
+    statistics.setdefault("total_raw_materials", len(raw_materials))
+    statistics.setdefault("low_stock_items", sum(map(_is_low_stock, products)) + sum(map(_is_low_stock, raw_materials)))
+    statistics.setdefault("total_inventory_value", sum(map(_value, products)) + sum(map(_value, raw_materials)))
+    company_name = snapshot.get("company_name", company_id)
+    header = f"Basándome en los datos reales de tu empresa {company_name}:\n\n"
+
+    groups = {"products": products, "raw_materials": raw_materials}
+    labels = {"products": ("Productos", "productos"), "raw_materials": ("Materias primas", "materias primas")}
+    facts = CompanyFacts(company_id, company_name, statistics)
+
+    def source(content: str, similarity: float) -> List[Dict[str, Any]]:
+        return [{"content": content, "metadata": {"type": "real_data", "company_id": company_id},
+                 "similarity": similarity}]
+
+    # The two overviews and the general summary keep their original wording
+    answer = header + "📦 **Información de Productos:**\n"
+    answer += f"- Total de productos: {statistics['total_products']}\n"
+    answer += f"- Productos con bajo stock: {statistics['low_stock_items']}\n"
+    answer += f"- Valor total del inventario: ${statistics['total_inventory_value']:,.2f}\n\n"
+    answer += ("**Productos principales:**\n" + _lines(products[:top_n])) if products else "No hay productos registrados aún."
+    facts.answers[("overview", "products")] = (answer, source(f"Datos reales de productos para empresa {company_name}", 0.95))
+
+    answer = header + "🏭 **Información de Materias Primas:**\n"
+    answer += f"- Total de materias primas: {statistics['total_raw_materials']}\n\n"
+    answer += ("**Materias primas principales:**\n" + _lines(raw_materials[:top_n])) if raw_materials else "No hay materias primas registradas aún."
+    facts.answers[("overview", "raw_materials")] = (answer, source(f"Datos reales de materias primas para empresa {company_name}", 0.92))
+
+    summary = header + "📊 **Resumen General:**\n"
+    summary += f"- Productos: {statistics['total_products']}\n"
+    summary += f"- Materias primas: {statistics['total_raw_materials']}\n"
+    summary += f"- Valor total del inventario: ${statistics['total_inventory_value']:,.2f}\n"
+    summary += f"- Productos con bajo stock: {statistics['low_stock_items']}\n\n"
+    summary += "¿En qué aspecto específico te gustaría que profundice?"
+    facts.answers[("summary", "all")] = (summary, source(f"Resumen real de inventario para empresa {company_name}", 0.85))
+
+    for entity in ("products", "raw_materials", "all"):
+        items = products + raw_materials if entity == "all" else groups[entity]
+        title, noun = ("Inventario", "artículos") if entity == "all" else labels[entity]
+        src = source(f"Datos reales de {noun} para empresa {company_name}", 0.9)
+
+        low = sorted((i for i in items if _is_low_stock(i)), key=lambda i: _number(i.get("stock")))
+        answer = header + f"⚠️ **{title} con bajo stock:** {len(low)}\n"
+        answer += "".join(
+            f"- {i.get('name', 'Sin nombre')}: {i.get('stock', 0)} en stock (mínimo {i.get('stockMinimo', 0)})\n"
+            for i in low[:top_n * 2]
+        ) or f"No hay {noun} con bajo stock. ✅"
+        facts.answers[("low_stock", entity)] = (answer, src)
+
+        answer = header + f"💰 **{title} de mayor valor (stock × precio):**\n"
+        answer += "".join(f"- {i.get('name', 'Sin nombre')}: ${_value(i):,.2f}\n"
+                          for i in _top(items, _value, top_n)) or f"No hay {noun} registrados aún."
+        facts.answers[("top_value", entity)] = (answer, src)
+
+        answer = header + f"📈 **{title} con más stock:**\n"
+        answer += _lines(_top(items, lambda i: _number(i.get("stock")), top_n)) or f"No hay {noun} registrados aún."
+        facts.answers[("top_stock", entity)] = (answer, src)
+
+        value = sum(map(_value, items)) if entity != "all" else statistics["total_inventory_value"]
+        answer = header + f"💰 **Valor {'del inventario' if entity == 'all' else 'de ' + noun}:** ${value:,.2f}\n"
+        facts.answers[("inventory_value", entity)] = (answer, src)
+
+        # Same totals as the overviews, which may cover more items than the snapshot lists
+        count = (statistics["total_products"] + statistics["total_raw_materials"] if entity == "all"
+                 else statistics[f"total_{entity}"])
+        answer = header + f"🔢 **Total de {noun}:** {count}\n"
+        facts.answers[("count", entity)] = (answer, src)
+
+        for intent, key, label in (("categories", "categoria", "Categoría"), ("suppliers", "proveedor", "Proveedor")):
+            breakdown: Dict[str, List[float]] = defaultdict(lambda: [0, 0.0, 0.0])
+            for i in items:
+                row = breakdown[str(i.get(key) or "Sin asignar")]
+                row[0] += 1
+                row[1] += _number(i.get("stock"))
+                row[2] += _value(i)
+            answer = header + f"🗂️ **{title} por {label.lower()}:**\n"
+            answer += "".join(
+                f"- {name}: {int(count)} {noun}, {stock:g} unidades, ${value:,.2f}\n"
+                for name, (count, stock, value) in sorted(breakdown.items(), key=lambda kv: -kv[1][2])
+            ) or f"No hay {noun} registrados aún."
+            facts.answers[(intent, entity)] = (answer, src)
+    return facts
+
+
+class MaterializedAnswers:
+    """Per-company precomputed answers for templated /api/v1/ask questions.
+
+    Facts are rebuilt whenever a new inventory snapshot is loaded, so
+    answering is an intent match plus a dict lookup.
+    """
+
+    def __init__(self, max_companies: int = 1000, top_n: int = 5):
+        self.max_companies = max(1, max_companies)
+        self.top_n = top_n
+        self.matcher = IntentMatcher()
+        self._facts: "OrderedDict[str, Tuple[Dict[str, Any], CompanyFacts]]" = OrderedDict()
+        self._stats = {"builds": 0, "answers": 0}
+
+    def materialize(self, company_id: str, snapshot: Dict[str, Any]) -> Optional[CompanyFacts]:
+        if not snapshot or not snapshot.get("success"):
+            return None
+        facts = build_company_facts(company_id, snapshot, self.top_n)
+        self._facts[company_id] = (snapshot, facts)
+        self._facts.move_to_end(company_id)
+        while len(self._facts) > self.max_companies:
+            self._facts.popitem(last=False)
+        self._stats["builds"] += 1
+        return facts
+
+    def get(self, company_id: str, snapshot: Dict[str, Any]) -> Optional[CompanyFacts]:
+        """Facts for this exact snapshot, building them if they are missing or older"""
+        entry = self._facts.get(company_id)
+        if entry is not None and entry[0] is snapshot:
+            self._facts.move_to_end(company_id)
+            return entry[1]
+        return self.materialize(company_id, snapshot)
+
+    def answer(self, facts: CompanyFacts, question: str) -> Tuple[str, List[Dict[str, Any]], str]:
+        """(answer, sources, intent) for a question"""
+        intent, entity = self.matcher.match(question)
+        if intent == "overview":
+            key = (intent, entity)
+        elif intent == "summary":
+            key = ("summary", "all")
+        else:
+            key = (intent, entity or DEFAULT_ENTITY.get(intent, "all"))
+        answer, sources = facts.answers.get(key) or facts.answers[("summary", "all")]
+        self._stats["answers"] += 1
+        return answer, sources, intent
+
+    def invalidate(self, company_id: str) -> None:
+        self._facts.pop(company_id, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self._stats, "companies": len(self._facts)}
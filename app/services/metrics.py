@@ -0,0 +1,181 @@
+import bisect
+import contextvars
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+
+from app.config.settings import settings
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+QUANTILES = (0.5, 0.95, 0.99)
+METRIC_PREFIX = "axura_"
+# Label value used once ``max_tenants`` distinct tenants have been seen
+OTHER_TENANT = "_other"
+
+REQUEST_SECONDS = "request_duration_seconds"
+TENANT_REQUEST_SECONDS = "tenant_request_duration_seconds"
+STAGE_SECONDS = "stage_duration_seconds"
+
+_HELP = {
+    REQUEST_SECONDS: "HTTP request latency by endpoint",
+    TENANT_REQUEST_SECONDS: "HTTP request latency by endpoint and company",
+    STAGE_SECONDS: "Latency of one pipeline stage (backend fetch, Mongo read, embedding, ...)",
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Latency histogram with cumulative buckets and a window of recent samples.
+
+    Buckets feed the Prometheus export; p50/p95/p99 are computed from the
+    last ``window`` observations, so they follow current behaviour rather
+    than the whole process lifetime.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS, window: int = 1024):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.recent: Deque[float] = deque(maxlen=window)
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.recent.append(value)
+
+    def quantiles(self) -> Dict[str, Optional[float]]:
+        ordered = sorted(self.recent)
+        if not ordered:
+            return {f"p{int(q * 100)}": None for q in QUANTILES}
+        return {f"p{int(q * 100)}": round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 6) for q in QUANTILES}
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        return {"count": self.count, "sum": round(self.sum, 6), **self.quantiles()}
+
+
+@dataclass
+class RequestTrace:
+    """Timings of the request being handled; set by the metrics middleware"""
+    endpoint: str
+    tenant: Optional[str] = None
+    stages: Dict[str, float] = field(default_factory=dict)
+
+
+_current_trace: contextvars.ContextVar[Optional[RequestTrace]] = contextvars.ContextVar("request_trace", default=None)
+
+
+class MetricsRegistry:
+    """Process-wide latency histograms, keyed by metric name and labels.
+
+    ``stage()`` times one step of the pipeline and also adds it to the
+    current request's trace, so a response can report where its time went.
+    Tenant labels are capped at ``max_tenants`` distinct values to keep the
+    number of series bounded.
+    """
+
+    def __init__(self, max_tenants: int = 200, window: int = 1024):
+        self.max_tenants = max_tenants
+        self.window = window
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._tenants: set = set()
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(window=self.window)
+            histogram.observe(value)
+
+    def tenant_label(self, company_id: str) -> str:
+        with self._lock:
+            if company_id in self._tenants:
+                return company_id
+            if len(self._tenants) < self.max_tenants:
+                self._tenants.add(company_id)
+                return company_id
+        return OTHER_TENANT
+
+    def start_request(self, endpoint: str) -> Tuple[RequestTrace, contextvars.Token]:
+        trace = RequestTrace(endpoint)
+        return trace, _current_trace.set(trace)
+
+    def finish_request(self, trace: RequestTrace, token: contextvars.Token, seconds: float,
+                       method: str, status: int) -> None:
+        _current_trace.reset(token)
+        self.observe(REQUEST_SECONDS, seconds, endpoint=trace.endpoint, method=method, status=str(status))
+        if trace.tenant is not None:
+            self.observe(TENANT_REQUEST_SECONDS, seconds, endpoint=trace.endpoint,
+                         tenant=self.tenant_label(trace.tenant))
+
+    @staticmethod
+    def current() -> Optional[RequestTrace]:
+        return _current_trace.get()
+
+    def set_tenant(self, company_id: str) -> None:
+        """Attribute the current request to a company"""
+        trace = _current_trace.get()
+        if trace is not None and company_id:
+            trace.tenant = company_id
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time a pipeline stage, e.g. ``with metrics.stage("embedding"): ...``"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            trace = _current_trace.get()
+            self.observe(STAGE_SECONDS, elapsed, stage=name, endpoint=trace.endpoint if trace else "background")
+            if trace is not None:
+                trace.stages[name] = trace.stages.get(name, 0.0) + elapsed
+
+    def summary(self) -> Dict[str, List[Dict[str, object]]]:
+        """Count, sum and recent p50/p95/p99 of every series"""
+        with self._lock:
+            return {
+                name: [{**dict(labels), **histogram.summary()} for labels, histogram in sorted(series.items())]
+                for name, series in self._histograms.items()
+            }
+
+    def render_prometheus(self) -> str:
+        """All histograms in the Prometheus text exposition format"""
+        lines: List[str] = []
+        with self._lock:
+            for name, series in sorted(self._histograms.items()):
+                metric = METRIC_PREFIX + name
+                lines.append(f"# HELP {metric} {_HELP.get(name, name)}")
+                lines.append(f"# TYPE {metric} histogram")
+                for labels, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else repr(bound)
+                        lines.append(f"{metric}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+                    lines.append(f"{metric}_sum{_format_labels(labels)} {histogram.sum!r}")
+                    lines.append(f"{metric}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+# Shared by the services and the API; one registry per worker process
+metrics = MetricsRegistry(max_tenants=settings.metrics_max_tenants, window=settings.metrics_window)
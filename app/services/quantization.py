@@ -0,0 +1,123 @@
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import numpy as np
+
+STORAGE_DTYPES = ("float32", "float16", "int8")
+
+# Rows upcast to float32 at a time when scoring, to bound temporary memory
+_SCORE_BLOCK = 8192
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize each row (zero rows are left as zeros)"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def truncate_dimensions(matrix: np.ndarray, dimensions: int) -> np.ndarray:
+    """Keep the first ``dimensions`` components and re-normalize.
+
+    For text-embedding-3 models this matches what the API returns when the
+    ``dimensions`` parameter is used.
+    """
+    return normalize_rows(np.asarray(matrix)[..., :dimensions])
+
+
+@dataclass
+class QuantizedVectors:
+    """Row vectors stored as float32, float16 or int8 with a per-row scale"""
+
+    data: np.ndarray
+    scales: Optional[np.ndarray] = None
+
+    @property
+    def dtype(self) -> str:
+        return str(self.data.dtype)
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def __len__(self) -> int:
+        return self.data.shape[0]
+
+    def dequantize(self, rows=slice(None)) -> np.ndarray:
+        block = self.data[rows].astype(np.float32)
+        if self.scales is not None:
+            block *= self.scales[rows, None]
+        return block
+
+    def scores(self, queries: np.ndarray) -> np.ndarray:
+        """Approximate dot products, shape (n_queries, n_rows)"""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        out = np.empty((queries.shape[0], len(self)), dtype=np.float32)
+        for start in range(0, len(self), _SCORE_BLOCK):
+            stop = min(start + _SCORE_BLOCK, len(self))
+            block = self.data[start:stop]
+            if block.dtype != np.float32:
+                block = block.astype(np.float32)
+            out[:, start:stop] = queries @ block.T
+            if self.scales is not None:
+                out[:, start:stop] *= self.scales[start:stop]
+        return out
+
+
+def quantize(matrix: np.ndarray, dtype: str = "float32") -> QuantizedVectors:
+    """Quantize row vectors; int8 uses symmetric per-row scaling"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if dtype == "float32":
+        return QuantizedVectors(matrix)
+    if dtype == "float16":
+        return QuantizedVectors(matrix.astype(np.float16))
+    if dtype == "int8":
+        scales = np.abs(matrix).max(axis=-1) / 127.0 if matrix.size else np.zeros(len(matrix), dtype=np.float32)
+        scales = scales.astype(np.float32)
+        safe = np.where(scales == 0, 1.0, scales)
+        data = np.clip(np.rint(matrix / safe[:, None]), -127, 127).astype(np.int8)
+        return QuantizedVectors(data, scales)
+    raise ValueError(f"Unsupported storage dtype '{dtype}', expected one of {STORAGE_DTYPES}")
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the ``k`` highest scores per row, best first"""
+    scores = np.atleast_2d(scores)
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64)
+    if k < scores.shape[1]:
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.tile(np.arange(scores.shape[1]), (scores.shape[0], 1))
+    order = np.argsort(-np.take_along_axis(scores, candidates, axis=1), axis=1, kind="stable")
+    return np.take_along_axis(candidates, order, axis=1)
+
+
+def search(queries: np.ndarray, vectors: QuantizedVectors, k: int,
+           full_precision: Optional[np.ndarray] = None,
+           rescore_factor: int = 4) -> Tuple[np.ndarray, np.ndarray]:
+    """Top-k search over quantized vectors.
+
+    When ``full_precision`` (float32 rows, e.g. a memory-mapped file) is
+    given and the storage is lossy, the best ``k * rescore_factor`` candidates
+    are re-scored against it so the final ranking is exact. Returns
+    (indices, scores), each shaped (n_queries, k).
+    """
+    queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+    approx = vectors.scores(queries)
+    if full_precision is None or vectors.dtype == "float32" or rescore_factor <= 1:
+        indices = top_k(approx, k)
+        return indices, np.take_along_axis(approx, indices, axis=1)
+
+    candidates = top_k(approx, k * rescore_factor)
+    indices = np.empty((queries.shape[0], min(k, candidates.shape[1])), dtype=np.int64)
+    scores = np.empty(indices.shape, dtype=np.float32)
+    for row, query in enumerate(queries):
+        rows = np.sort(candidates[row])  # sorted reads are friendlier to mmap
+        exact = np.asarray(full_precision[rows], dtype=np.float32) @ query
+        best = top_k(exact, indices.shape[1])[0]
+        indices[row] = rows[best]
+        scores[row] = exact[best]
+    return indices, scores
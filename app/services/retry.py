@@ -0,0 +1,65 @@
+import asyncio
+import logging
+import random
+from typing import Awaitable, Callable, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    """Full-jitter exponential backoff for the given (0-based) attempt"""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+def is_retryable_openai_error(error: Exception) -> bool:
+    """True for rate limits, 5xx answers and connection/timeout errors"""
+    import openai
+
+    if isinstance(error, openai.APIConnectionError):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in RETRYABLE_STATUS_CODES
+    return False
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after", ""))
+    except (TypeError, ValueError):
+        return None
+
+
+async def retry_async(operation: Callable[[], Awaitable[T]], *,
+                      max_retries: int = 3,
+                      base_delay: float = 0.5,
+                      max_delay: float = 8.0,
+                      should_retry: Callable[[Exception], bool] = is_retryable_openai_error,
+                      label: str = "operation") -> T:
+    """Run ``operation`` and retry it with jittered backoff on retryable errors.
+
+    A ``Retry-After`` header on the error response, when present, is used as
+    the minimum wait before the next attempt.
+    """
+    attempt = 0
+    while True:
+        try:
+            return await operation()
+        except Exception as e:
+            if attempt >= max_retries or not should_retry(e):
+                raise
+            delay = backoff_delay(attempt, base_delay, max_delay)
+            retry_after = _retry_after(e)
+            if retry_after is not None:
+                delay = max(delay, min(retry_after, max_delay))
+            attempt += 1
+            logger.warning("⚠️ %s failed (%s), retry %d/%d in %.2fs",
+                           label, e.__class__.__name__, attempt, max_retries, delay)
+            await asyncio.sleep(delay)
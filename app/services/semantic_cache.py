@@ -0,0 +1,201 @@
+import hashlib
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.embeddings import EmbeddingService
+from app.services.invoice_analytics import fold_text
+
+PUNCTUATION_PATTERN = re.compile(r"[^\w\s]")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase, strip accents/punctuation and collapse whitespace"""
+    folded = PUNCTUATION_PATTERN.sub(" ", fold_text(question))
+    return WHITESPACE_PATTERN.sub(" ", folded).strip()
+
+
+def invoice_fingerprint(invoices: Iterable[Dict[str, Any]]) -> str:
+    """Order-independent fingerprint of an invoice set (uuid + total)"""
+    keys = sorted(
+        f"{inv['invoiceData'].get('uuid', '')}:{inv['invoiceData'].get('total', '')}"
+        for inv in invoices if isinstance(inv, dict) and inv.get('invoiceData')
+    )
+    return hashlib.sha256("|".join(keys).encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CachedAnswer:
+    question: str
+    vector: np.ndarray
+    response: Any
+    fingerprint: str
+    latency: float
+    created_at: float
+
+
+class _Partition:
+    """Cached answers for one (company, namespace) pair"""
+
+    def __init__(self):
+        self.entries: "OrderedDict[str, CachedAnswer]" = OrderedDict()
+        self._matrix: Optional[np.ndarray] = None
+        self._keys: List[str] = []
+
+    def matrix(self) -> Tuple[List[str], Optional[np.ndarray]]:
+        if self._matrix is None and self.entries:
+            self._keys = list(self.entries)
+            self._matrix = np.vstack([self.entries[k].vector for k in self._keys])
+        return self._keys, self._matrix
+
+    def invalidate_matrix(self) -> None:
+        self._matrix = None
+        self._keys = []
+
+
+class SemanticAnswerCache:
+    """Per-company cache of answers looked up by question similarity.
+
+    Questions are normalized and checked for an exact match first; otherwise
+    the question is embedded and compared against previous questions of the
+    same company and namespace (e.g. "invoice"), and an answer is reused
+    when cosine similarity reaches ``threshold``. An entry only matches when
+    its data fingerprint equals the caller's, and is dropped after ``ttl``
+    seconds. Entries are evicted LRU beyond ``max_entries_per_company`` per
+    partition and ``max_entries`` overall.
+    """
+
+    def __init__(self, embedding_service: EmbeddingService, threshold: float = 0.92,
+                 ttl: float = 3600.0, max_entries: int = 10000, max_entries_per_company: int = 500):
+        self.embedding_service = embedding_service
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self.max_entries_per_company = max(1, max_entries_per_company)
+        self._partitions: "OrderedDict[Tuple[str, str], _Partition]" = OrderedDict()
+        self._size = 0
+        self._stats = {
+            "hits": 0,
+            "exact_hits": 0,
+            "misses": 0,
+            "stale": 0,
+            "evictions": 0,
+            "invalidations": 0,
+            "saved_latency_seconds": 0.0
+        }
+
+    def _partition(self, company_id: str, namespace: str, create: bool = False) -> Optional[_Partition]:
+        key = (company_id, namespace)
+        partition = self._partitions.get(key)
+        if partition is None and create:
+            partition = self._partitions[key] = _Partition()
+        if partition is not None:
+            self._partitions.move_to_end(key)
+        return partition
+
+    def _remove(self, partition: _Partition, key: str) -> None:
+        if partition.entries.pop(key, None) is not None:
+            self._size -= 1
+            partition.invalidate_matrix()
+
+    def _is_valid(self, entry: CachedAnswer, fingerprint: str) -> bool:
+        return entry.fingerprint == fingerprint and time.monotonic() - entry.created_at < self.ttl
+
+    async def _embed(self, normalized: str) -> Optional[np.ndarray]:
+        embedding = await self.embedding_service.generate_embedding(normalized)
+        if embedding is None:
+            return None
+        vector = np.asarray(embedding, dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def _hit(self, partition: _Partition, key: str, exact: bool) -> Any:
+        entry = partition.entries[key]
+        partition.entries.move_to_end(key)
+        self._stats["hits"] += 1
+        if exact:
+            self._stats["exact_hits"] += 1
+        self._stats["saved_latency_seconds"] += entry.latency
+        return entry.response
+
+    async def lookup(self, company_id: str, namespace: str, question: str,
+                     fingerprint: str = "") -> Tuple[Optional[Any], Optional[np.ndarray]]:
+        """Return (cached response or None, question vector or None).
+
+        The vector is returned so a following ``store`` can reuse it instead
+        of embedding the question twice.
+        """
+        normalized = normalize_question(question)
+        partition = self._partition(company_id, namespace)
+        if partition is not None and normalized in partition.entries:
+            if self._is_valid(partition.entries[normalized], fingerprint):
+                return self._hit(partition, normalized, exact=True), None
+            self._stats["stale"] += 1
+            self._remove(partition, normalized)
+
+        vector = await self._embed(normalized)
+        if partition is not None and vector is not None:
+            keys, matrix = partition.matrix()
+            if matrix is not None:
+                scores = matrix @ vector
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    key = keys[best]
+                    if self._is_valid(partition.entries[key], fingerprint):
+                        return self._hit(partition, key, exact=False), vector
+                    self._stats["stale"] += 1
+                    self._remove(partition, key)
+
+        self._stats["misses"] += 1
+        return None, vector
+
+    async def store(self, company_id: str, namespace: str, question: str, response: Any,
+                    latency: float, fingerprint: str = "", vector: Optional[np.ndarray] = None) -> None:
+        """Cache ``response`` for ``question``; ``latency`` is what a hit saves"""
+        normalized = normalize_question(question)
+        if vector is None:
+            vector = await self._embed(normalized)
+            if vector is None:
+                return
+        partition = self._partition(company_id, namespace, create=True)
+        if normalized in partition.entries:
+            self._remove(partition, normalized)
+        partition.entries[normalized] = CachedAnswer(normalized, vector, response, fingerprint, latency, time.monotonic())
+        partition.invalidate_matrix()
+        self._size += 1
+
+        while len(partition.entries) > self.max_entries_per_company:
+            self._remove(partition, next(iter(partition.entries)))
+            self._stats["evictions"] += 1
+        while self._size > self.max_entries and self._partitions:
+            # Evict from the least recently used company partition
+            oldest_key, oldest = next(iter(self._partitions.items()))
+            if oldest.entries:
+                self._remove(oldest, next(iter(oldest.entries)))
+                self._stats["evictions"] += 1
+            if not oldest.entries:
+                del self._partitions[oldest_key]
+
+    def invalidate(self, company_id: str, namespace: Optional[str] = None) -> int:
+        """Drop a company's cached answers (one namespace or all); returns the count"""
+        removed = 0
+        for key in [k for k in self._partitions if k[0] == company_id and (namespace is None or k[1] == namespace)]:
+            removed += len(self._partitions[key].entries)
+            del self._partitions[key]
+        self._size -= removed
+        self._stats["invalidations"] += removed
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {
+            **self._stats,
+            "entries": self._size,
+            "companies": len({k[0] for k in self._partitions}),
+            "threshold": self.threshold,
+            "hit_rate": self._stats["hits"] / lookups if lookups else 0.0
+        }
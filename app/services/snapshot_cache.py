@@ -0,0 +1,145 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotCache:
+    """In-process stale-while-revalidate cache keyed by company id.
+
+    - Entries younger than ``ttl`` are served directly.
+    - Entries older than ``ttl`` but within ``stale_ttl`` are served as-is
+      while a single background refresh runs.
+    - Missing or fully expired entries are loaded inline; concurrent misses
+      for the same key share one upstream call (single-flight).
+    - At most ``max_entries`` companies are kept, evicting the least
+      recently used.
+
+    The loader returns None on failure; failures are never cached, and a
+    stale entry is kept when its refresh fails. ``on_load`` is called with
+    (key, value) after every successful load, to derive data from it.
+    """
+
+    def __init__(self, loader: Callable[[str], Awaitable[Optional[Any]]],
+                 ttl: float = 30.0, stale_ttl: float = 300.0, max_entries: int = 1000,
+                 on_load: Optional[Callable[[str, Any], None]] = None):
+        self.loader = loader
+        self.on_load = on_load
+        self.ttl = ttl
+        self.stale_ttl = max(stale_ttl, ttl)
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._background: Set[asyncio.Task] = set()
+        self._stats = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "refreshes": 0,
+            "refresh_failures": 0,
+            "evictions": 0
+        }
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Return the snapshot for ``key``, loading it if necessary"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, fetched_at = entry
+            age = time.monotonic() - fetched_at
+            if age < self.ttl:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return value
+            if age < self.stale_ttl:
+                self._entries.move_to_end(key)
+                self._stats["stale_hits"] += 1
+                self._refresh_in_background(key)
+                return value
+
+        self._stats["misses"] += 1
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._start_load(key)
+        else:
+            self._stats["coalesced"] += 1
+        # Shield so one cancelled caller doesn't cancel the shared load
+        value = await asyncio.shield(task)
+        if value is None and entry is not None:
+            # Upstream failed; an expired snapshot beats no data at all
+            return entry[0]
+        return value
+
+    def _start_load(self, key: str) -> asyncio.Task:
+        task = asyncio.create_task(self._load(key))
+        self._inflight[key] = task
+        return task
+
+    def _refresh_in_background(self, key: str) -> None:
+        if key in self._inflight:
+            return
+        self._stats["refreshes"] += 1
+        task = self._start_load(key)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _load(self, key: str) -> Optional[Any]:
+        try:
+            value = await self.loader(key)
+            if value is None:
+                self._stats["refresh_failures"] += 1
+            else:
+                self._store(key, value)
+                self._notify(key, value)
+            return value
+        except Exception as e:
+            self._stats["refresh_failures"] += 1
+            logger.warning("⚠️ Error loading snapshot for %s: %s", key, e)
+            return None
+        finally:
+            self._inflight.pop(key, None)
+
+    def _notify(self, key: str, value: Any) -> None:
+        if self.on_load is None:
+            return
+        try:
+            self.on_load(key, value)
+        except Exception as e:
+            logger.warning("⚠️ Snapshot load hook failed for %s: %s", key, e)
+
+    def _store(self, key: str, value: Any) -> None:
+        self._entries[key] = (value, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def invalidate(self, key: Optional[str] = None) -> None:
+        """Drop one entry, or every entry when ``key`` is None"""
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    async def close(self) -> None:
+        """Cancel outstanding background refreshes"""
+        for task in list(self._background):
+            task.cancel()
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+        self._background.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self._stats["hits"] + self._stats["stale_hits"] + self._stats["misses"]
+        served_from_cache = self._stats["hits"] + self._stats["stale_hits"]
+        return {
+            **self._stats,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "stale_ttl": self.stale_ttl,
+            "hit_rate": served_from_cache / lookups if lookups else 0.0
+        }
@@ -0,0 +1,30 @@
+from functools import lru_cache
+from typing import Optional
+
+try:
+    import tiktoken
+except ImportError:  # optional; fall back to a character heuristic
+    tiktoken = None
+
+# Spanish text averages a little over 3 characters per token on cl100k/o200k
+_CHARS_PER_TOKEN = 3
+
+
+@lru_cache(maxsize=8)
+def _encoding(model: str):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """Token count for ``text``; exact with tiktoken, a conservative estimate without"""
+    encoding = _encoding(model or "text-embedding-3-large")
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return len(text) // _CHARS_PER_TOKEN + 1
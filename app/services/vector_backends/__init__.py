@@ -0,0 +1,46 @@
+import logging
+
+from app.config.settings import settings
+from app.services.vector_backends.base import COLLECTION_NAMES, SHARED_TENANT, SearchHit, VectorBackend, tenant_key
+
+logger = logging.getLogger(__name__)
+
+
+def _build_backend(name: str) -> VectorBackend:
+    if name == "numpy":
+        from app.services.vector_backends.numpy_backend import NumpyBackend
+        return NumpyBackend(
+            settings.numpy_vector_directory,
+            storage_dtype=settings.vector_storage_dtype,
+            rescore_factor=settings.vector_rescore_factor
+        )
+    if name == "chroma":
+        from app.services.vector_backends.chroma import ChromaBackend
+        return ChromaBackend(settings.chromadb_persist_directory)
+    raise ValueError(f"Unknown vector backend '{name}', expected 'chroma' or 'numpy'")
+
+
+def create_backend(name: str = None) -> VectorBackend:
+    """Build the vector backend selected by ``VECTOR_BACKEND``.
+
+    Storage left by earlier layouts (shared pre-partitioning collections,
+    partitions named without the tenant hash) is unreachable. It is only
+    listed unless ``VECTOR_DROP_LEGACY_STORAGE`` is set, since deleting it
+    can't be undone; companies it belonged to need one re-index either way.
+    """
+    backend = _build_backend((name or settings.vector_backend).lower())
+    if settings.vector_drop_legacy_storage:
+        removed = backend.drop_legacy()
+        if removed:
+            logger.warning("⚠️ Removed %d vector collections from an earlier storage layout, "
+                           "re-index their companies: %s", len(removed), ", ".join(removed))
+    else:
+        legacy = backend.legacy_storage()
+        if legacy:
+            logger.warning("⚠️ %d vector collections from an earlier storage layout are unused, re-index their "
+                           "companies and set VECTOR_DROP_LEGACY_STORAGE=true to remove them: %s",
+                           len(legacy), ", ".join(legacy))
+    return backend
+
+
+__all__ = ["COLLECTION_NAMES", "SHARED_TENANT", "SearchHit", "VectorBackend", "create_backend", "tenant_key"]
@@ -0,0 +1,117 @@
+import hashlib
+import re
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+COLLECTION_NAMES = [
+    "products",
+    "raw_materials",
+    "inventory_movements",
+    "company_info"
+]
+
+SHARED_TENANT = "_shared"
+
+
+# Keeps "{collection}__{tenant}" within Chroma's 63-character name limit
+TENANT_NAME_CHARS = 24
+TENANT_KEY_PATTERN = re.compile(r"[A-Za-z0-9_-]*-[0-9a-f]{10}")
+
+
+def tenant_key(company_id: Optional[str]) -> str:
+    """Storage-safe partition name for a company (ids, directory and collection names).
+
+    The readable part replaces unsafe characters, so a hash of the raw id is
+    appended to keep e.g. "acme.mx" and "acme_mx" in separate partitions.
+    """
+    if not company_id:
+        return SHARED_TENANT
+    raw = str(company_id)
+    readable = re.sub(r"[^A-Za-z0-9_-]", "_", raw)[:TENANT_NAME_CHARS]
+    return f"{readable}-{hashlib.sha1(raw.encode('utf-8')).hexdigest()[:10]}"
+
+
+def is_tenant_key(name: str) -> bool:
+    """Whether a stored partition name could come from the current ``tenant_key``"""
+    return name == SHARED_TENANT or TENANT_KEY_PATTERN.fullmatch(name) is not None
+
+
+@dataclass
+class SearchHit:
+    id: str
+    document: str
+    metadata: Dict[str, Any]
+    similarity: float
+    distance: float
+
+
+class VectorBackend(ABC):
+    """Tenant-partitioned storage and search for one vector store.
+
+    Every collection is split into one partition per company (``tenant``),
+    so searches only scan the caller's data and clearing one tenant never
+    touches another. Methods are synchronous; ``VectorStoreService`` is
+    responsible for calling them from async code.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def add(self, collection: str, tenant: str, documents: List[str], metadatas: List[Dict[str, Any]],
+            ids: List[str], embeddings: Optional[List[List[float]]] = None) -> None:
+        """Insert or replace documents (by id) in a tenant's partition"""
+
+    @abstractmethod
+    def query(self, collection: str, tenant: str, query_embeddings: List[List[float]], n_results: int,
+              where: Optional[Dict[str, Any]] = None) -> List[List[SearchHit]]:
+        """Nearest neighbours within a tenant's partition for each query, best first"""
+
+    @abstractmethod
+    def delete(self, collection: str, tenant: str, ids: List[str]) -> int:
+        """Remove documents by id from a tenant's partition; returns how many existed"""
+
+    @abstractmethod
+    def ids(self, collection: str, tenant: str) -> List[str]:
+        """Ids of every document in a tenant's partition"""
+
+    @abstractmethod
+    def documents(self, collection: str, tenant: str) -> Tuple[List[str], List[str], List[Dict[str, Any]]]:
+        """(ids, documents, metadatas) of every document in a tenant's partition"""
+
+    @abstractmethod
+    def clear(self, collection: str, tenant: Optional[str] = None) -> None:
+        """Remove a tenant's documents, or every tenant's when ``tenant`` is None"""
+
+    @abstractmethod
+    def count(self, collection: str, tenant: Optional[str] = None) -> int:
+        """Number of documents for a tenant, or across all tenants"""
+
+    @abstractmethod
+    def tenants(self, collection: str) -> List[str]:
+        """Tenants with a partition in this collection"""
+
+    @abstractmethod
+    def memory_bytes(self, collection: str, tenant: Optional[str] = None) -> int:
+        """Approximate bytes held in memory by a tenant's searched vectors (or all tenants')"""
+
+    def full_precision_bytes(self, collection: str, tenant: Optional[str] = None) -> int:
+        """Bytes of float32 vectors kept on disk only to re-score quantized searches"""
+        return 0
+
+    def flush(self, collection: str, tenant: Optional[str] = None) -> None:
+        """Persist buffered writes of a tenant's partition (or all tenants'); no-op when writes are durable"""
+
+    def close(self) -> None:
+        """Persist anything still buffered before shutdown"""
+
+    def legacy_storage(self) -> List[str]:
+        """Storage from earlier layouts that no tenant can reach"""
+        return []
+
+    def drop_legacy(self) -> List[str]:
+        """Delete the storage listed by ``legacy_storage``; returns what was removed"""
+        return []
+
+    def collection_names(self) -> List[str]:
+        return list(COLLECTION_NAMES)
@@ -0,0 +1,163 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.vector_backends.base import COLLECTION_NAMES, SearchHit, VectorBackend, is_tenant_key
+
+TENANT_SEPARATOR = "__"
+
+
+class ChromaBackend(VectorBackend):
+    """ChromaDB persistent client backend.
+
+    Each tenant gets its own Chroma collection named
+    ``{collection}__{tenant}``, so HNSW searches only cover that company.
+    """
+
+    name = "chroma"
+
+    def __init__(self, persist_directory: str):
+        import chromadb
+
+        self.persist_directory = persist_directory
+        self.client = chromadb.PersistentClient(path=persist_directory)
+        self.collections = {}
+
+    @staticmethod
+    def _physical_name(collection: str, tenant: str) -> str:
+        if collection not in COLLECTION_NAMES:
+            raise KeyError(f"Collection {collection} not found")
+        return f"{collection}{TENANT_SEPARATOR}{tenant}"
+
+    def _collection(self, collection: str, tenant: str, create: bool = True):
+        name = self._physical_name(collection, tenant)
+        if name not in self.collections:
+            if not create:
+                try:
+                    self.collections[name] = self.client.get_collection(name=name)
+                except Exception:
+                    return None
+            else:
+                self.collections[name] = self.client.get_or_create_collection(
+                    name=name,
+                    metadata={"description": f"Collection for {collection}", "hnsw:space": "cosine"}
+                )
+        return self.collections[name]
+
+    def add(self, collection: str, tenant: str, documents: List[str], metadatas: List[Dict[str, Any]],
+            ids: List[str], embeddings: Optional[List[List[float]]] = None) -> None:
+        target = self._collection(collection, tenant)
+        # Process in batches to avoid memory issues
+        batch_size = 100
+        for i in range(0, len(documents), batch_size):
+            kwargs = {}
+            if embeddings is not None:
+                kwargs["embeddings"] = embeddings[i:i + batch_size]
+            target.upsert(
+                documents=documents[i:i + batch_size],
+                metadatas=metadatas[i:i + batch_size],
+                ids=ids[i:i + batch_size],
+                **kwargs
+            )
+
+    def query(self, collection: str, tenant: str, query_embeddings: List[List[float]], n_results: int,
+              where: Optional[Dict[str, Any]] = None) -> List[List[SearchHit]]:
+        target = self._collection(collection, tenant, create=False)
+        if target is None:
+            return [[] for _ in query_embeddings]
+        kwargs = {"where": where} if where else {}
+        results = target.query(
+            query_embeddings=query_embeddings,
+            n_results=n_results,
+            include=["documents", "metadatas", "distances"],
+            **kwargs
+        )
+        hits = []
+        for q in range(len(query_embeddings)):
+            row = []
+            if results["documents"] and results["documents"][q]:
+                for doc_id, doc, metadata, distance in zip(
+                    results["ids"][q],
+                    results["documents"][q],
+                    results["metadatas"][q],
+                    results["distances"][q]
+                ):
+                    row.append(SearchHit(doc_id, doc, metadata, 1 - distance, distance))
+            hits.append(row)
+        return hits
+
+    def delete(self, collection: str, tenant: str, ids: List[str]) -> int:
+        target = self._collection(collection, tenant, create=False)
+        if target is None or not ids:
+            return 0
+        existing = target.get(ids=ids, include=[])["ids"]
+        if existing:
+            target.delete(ids=existing)
+        return len(existing)
+
+    def ids(self, collection: str, tenant: str) -> List[str]:
+        target = self._collection(collection, tenant, create=False)
+        if target is None:
+            return []
+        return target.get(include=[])["ids"]
+
+    def documents(self, collection: str, tenant: str) -> Tuple[List[str], List[str], List[Dict[str, Any]]]:
+        target = self._collection(collection, tenant, create=False)
+        if target is None:
+            return [], [], []
+        result = target.get(include=["documents", "metadatas"])
+        return result["ids"], result["documents"], result["metadatas"]
+
+    def clear(self, collection: str, tenant: Optional[str] = None) -> None:
+        for name in ([tenant] if tenant is not None else self.tenants(collection)):
+            physical = self._physical_name(collection, name)
+            self.collections.pop(physical, None)
+            try:
+                self.client.delete_collection(name=physical)
+            except ValueError:
+                pass  # nothing indexed for this tenant yet
+
+    def count(self, collection: str, tenant: Optional[str] = None) -> int:
+        total = 0
+        for name in ([tenant] if tenant is not None else self.tenants(collection)):
+            target = self._collection(collection, name, create=False)
+            total += target.count() if target is not None else 0
+        return total
+
+    def tenants(self, collection: str) -> List[str]:
+        prefix = f"{collection}{TENANT_SEPARATOR}"
+        names = []
+        for item in self.client.list_collections():
+            name = getattr(item, "name", item)
+            if name.startswith(prefix):
+                names.append(name[len(prefix):])
+        return names
+
+    def legacy_storage(self) -> List[str]:
+        names = []
+        for item in self.client.list_collections():
+            name = getattr(item, "name", item)
+            collection, _, tenant = name.partition(TENANT_SEPARATOR)
+            if collection in COLLECTION_NAMES and not (tenant and is_tenant_key(tenant)):
+                names.append(name)
+        return names
+
+    def drop_legacy(self) -> List[str]:
+        removed = self.legacy_storage()
+        for name in removed:
+            self.collections.pop(name, None)
+            self.client.delete_collection(name=name)
+        return removed
+
+    def memory_bytes(self, collection: str, tenant: Optional[str] = None) -> int:
+        # Raw float32 vector payload; HNSW graph overhead is not included
+        total = 0
+        for name in ([tenant] if tenant is not None else self.tenants(collection)):
+            target = self._collection(collection, name, create=False)
+            if target is None:
+                continue
+            count = target.count()
+            if not count:
+                continue
+            sample = target.get(limit=1, include=["embeddings"])["embeddings"]
+            dims = len(sample[0]) if sample is not None and len(sample) else 0
+            total += count * dims * 4
+        return total
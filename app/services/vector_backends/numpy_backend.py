@@ -0,0 +1,401 @@
+import json
+import os
+import shutil
+import threading
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from app.services.quantization import QuantizedVectors, normalize_rows, quantize, search
+from app.services.vector_backends.base import COLLECTION_NAMES, SearchHit, VectorBackend, is_tenant_key
+
+
+class _Snapshot(NamedTuple):
+    """Rows ``[0, size)`` of a partition as of one write; what a search reads"""
+    ids: List[str]
+    documents: List[str]
+    metadatas: List[Dict[str, Any]]
+    vectors: Optional[np.ndarray]
+    stored: Optional[QuantizedVectors]
+    size: int
+
+    def __len__(self) -> int:
+        return self.size
+
+
+_EMPTY = _Snapshot([], [], [], None, None, 0)
+
+
+def _reserve(buffer: Optional[np.ndarray], size: int, needed: int, row_shape: Tuple[int, ...],
+             dtype) -> np.ndarray:
+    """``buffer`` with room for ``needed`` rows, growing capacity geometrically"""
+    if buffer is not None and len(buffer) >= needed:
+        return buffer
+    capacity = max(needed, 2 * (len(buffer) if buffer is not None else 0), 64)
+    grown = np.empty((capacity,) + row_shape, dtype=dtype)
+    if buffer is not None and size:
+        grown[:size] = buffer[:size]
+    return grown
+
+
+class _Partition:
+    """Vectors and records of one company within one collection.
+
+    Files (all written atomically by ``flush``):
+      records.json   ids, documents and metadatas, in row order
+      vectors.npy    float32 normalized vectors
+      quantized.npy  / scales.npy  lossy copy used for the first search pass
+
+    The float32 file is memory-mapped, not read into memory: with float32
+    storage searches run over the mapping (pages the OS keeps cached), and
+    when ``storage_dtype`` is lossy only the quantized copy is held in
+    memory and the mapping is read only to re-score the top candidates.
+
+    Writes append to buffers with spare capacity and are kept in memory
+    until ``flush``, which an index run calls once, so indexing n documents
+    in batches costs O(n) copies and one write per file. The float32 rows
+    are copied into memory for the first write of a run and mapped from
+    the new file again on flush. Searches read ``snapshot``, an immutable
+    view swapped in after each write: rows are only ever appended past it
+    or replaced in place, and deletes build new arrays, so a concurrent
+    search never indexes past its snapshot or pairs a score with another
+    document's id.
+    """
+
+    def __init__(self, path: str, storage_dtype: str):
+        self.path = path
+        self.storage_dtype = storage_dtype
+        self.lossy = storage_dtype != "float32"
+        self.lock = threading.Lock()
+        self.loaded = False
+        self.dirty = False
+        self.dropped = False
+        self.ids: List[str] = []
+        self.documents: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        self.rows: Dict[str, int] = {}
+        self.size = 0
+        # float32 rows: a buffer with spare capacity, or None while they are only on disk
+        self._vectors: Optional[np.ndarray] = None
+        self._disk_vectors: Optional[np.ndarray] = None
+        self._data: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+        self.snapshot = _EMPTY
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def load(self) -> "_Partition":
+        if self.loaded:
+            return self
+        with self.lock:
+            if not self.loaded:
+                self._load_locked()
+                self.loaded = True
+        return self
+
+    def _load_locked(self) -> None:
+        records_path = self._file("records.json")
+        if not os.path.exists(records_path):
+            return
+        with open(records_path, "r", encoding="utf-8") as f:
+            records = json.load(f)
+        self.ids = records["ids"]
+        self.documents = records["documents"]
+        self.metadatas = records["metadatas"]
+        self.rows = {doc_id: i for i, doc_id in enumerate(self.ids)}
+        self.size = len(self.ids)
+        self._disk_vectors = np.load(self._file("vectors.npy"), mmap_mode="r")
+        if self.lossy:
+            if os.path.exists(self._file("quantized.npy")):
+                self._data = np.load(self._file("quantized.npy"))
+                self._scales = np.load(self._file("scales.npy")) if os.path.exists(self._file("scales.npy")) else None
+            else:
+                # Written with float32 storage; quantized in memory until the next flush
+                stored = quantize(self._disk_vectors, self.storage_dtype)
+                self._data, self._scales = stored.data, stored.scales
+        self.snapshot = self._snapshot()
+
+    def _snapshot(self) -> _Snapshot:
+        n = self.size
+        vectors = self._vectors[:n] if self._vectors is not None else self._disk_vectors
+        if vectors is None:
+            return _EMPTY
+        if not self.lossy:
+            stored = QuantizedVectors(vectors)
+        else:
+            stored = QuantizedVectors(self._data[:n], self._scales[:n] if self._scales is not None else None)
+        return _Snapshot(self.ids, self.documents, self.metadatas, vectors, stored, n)
+
+    def __len__(self) -> int:
+        return len(self.snapshot)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes of the in-memory search matrix (the quantized copy when storage is lossy)"""
+        stored = self.snapshot.stored
+        return stored.nbytes if stored is not None else 0
+
+    @property
+    def full_precision_bytes(self) -> int:
+        """Bytes of the float32 matrix kept on disk only for re-scoring"""
+        snapshot = self.snapshot
+        return snapshot.vectors.nbytes if self.lossy and snapshot.vectors is not None else 0
+
+    def _writable_vectors(self) -> Optional[np.ndarray]:
+        if self._vectors is None and self._disk_vectors is not None:
+            self._vectors = np.array(self._disk_vectors, dtype=np.float32)
+        return self._vectors
+
+    def upsert(self, documents: List[str], metadatas: List[Dict[str, Any]], ids: List[str],
+               embeddings: np.ndarray) -> None:
+        self.load()
+        with self.lock:
+            vectors = self._writable_vectors()
+            dims = embeddings.shape[1]
+            if vectors is not None and self.size and vectors.shape[1] != dims:
+                raise ValueError(f"Embedding dimensions {dims} do not match stored dimensions {vectors.shape[1]}")
+
+            appended: List[int] = []
+            updated: Dict[int, int] = {}
+            for i, doc_id in enumerate(ids):
+                row = self.rows.get(doc_id)
+                if row is None:
+                    self.rows[doc_id] = row = self.size + len(appended)
+                    appended.append(i)
+                    self.ids.append(doc_id)
+                    self.documents.append(documents[i])
+                    self.metadatas.append(metadatas[i])
+                else:
+                    updated[row] = i
+                    self.documents[row] = documents[i]
+                    self.metadatas[row] = metadatas[i]
+
+            new_size = self.size + len(appended)
+            self._vectors = _reserve(vectors, self.size, new_size, (dims,), np.float32)
+            if appended:
+                self._vectors[self.size:new_size] = embeddings[appended]
+            if updated:
+                self._vectors[list(updated)] = embeddings[list(updated.values())]
+            if self.lossy:
+                # Rows quantize independently, so only the written ones are encoded
+                written = list(updated) + list(range(self.size, new_size))
+                stored = quantize(self._vectors[written], self.storage_dtype)
+                self._data = _reserve(self._data, self.size, new_size, (dims,), stored.data.dtype)
+                self._data[written] = stored.data
+                if stored.scales is not None:
+                    self._scales = _reserve(self._scales, self.size, new_size, (), np.float32)
+                    self._scales[written] = stored.scales
+            self.size = new_size
+            self.dirty = True
+            self.snapshot = self._snapshot()
+
+    def delete(self, ids: List[str]) -> int:
+        self.load()
+        with self.lock:
+            doomed = {self.rows[doc_id] for doc_id in ids if doc_id in self.rows}
+            if not doomed:
+                return 0
+            keep = np.array([i for i in range(self.size) if i not in doomed], dtype=np.int64)
+            source = self._vectors if self._vectors is not None else self._disk_vectors
+            # New arrays and lists: searches holding the old snapshot keep reading it
+            self._vectors = np.asarray(source[keep], dtype=np.float32)
+            if self.lossy:
+                self._data = self._data[keep]
+                self._scales = self._scales[keep] if self._scales is not None else None
+            self.ids = [self.ids[i] for i in keep]
+            self.documents = [self.documents[i] for i in keep]
+            self.metadatas = [self.metadatas[i] for i in keep]
+            self.rows = {doc_id: i for i, doc_id in enumerate(self.ids)}
+            self.size = len(self.ids)
+            self.dirty = True
+            self.snapshot = self._snapshot()
+            return len(doomed)
+
+    def flush(self) -> None:
+        """Write pending changes to disk; the float32 rows then leave memory for the new file's mapping"""
+        with self.lock:
+            if not self.dirty or self.dropped:
+                return
+            snapshot = self.snapshot
+            os.makedirs(self.path, exist_ok=True)
+
+            def write_npy(name: str, array: np.ndarray) -> None:
+                tmp = self._file(name + ".tmp")
+                with open(tmp, "wb") as f:
+                    np.save(f, array)
+                os.replace(tmp, self._file(name))
+
+            write_npy("vectors.npy", snapshot.vectors)
+            if self.lossy:
+                write_npy("quantized.npy", snapshot.stored.data)
+                if snapshot.stored.scales is not None:
+                    write_npy("scales.npy", snapshot.stored.scales)
+            tmp = self._file("records.json.tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"ids": snapshot.ids[:snapshot.size], "documents": snapshot.documents[:snapshot.size],
+                           "metadatas": snapshot.metadatas[:snapshot.size]}, f, ensure_ascii=False)
+            os.replace(tmp, self._file("records.json"))
+
+            self._disk_vectors = np.load(self._file("vectors.npy"), mmap_mode="r")
+            self._vectors = None
+            self.snapshot = self._snapshot()
+            self.dirty = False
+
+
+class NumpyBackend(VectorBackend):
+    """In-process exact vector search over per-company NumPy files.
+
+    Each (collection, tenant) partition is a normalized float32 matrix in a
+    memory-mapped ``.npy`` file, so a search is one matrix-vector product
+    plus ``argpartition``. When ``storage_dtype`` is float16/int8
+    the first pass runs over the quantized copy and the top candidates are
+    re-scored against the memory-mapped float32 file. Writes are buffered
+    until ``flush``.
+    """
+
+    name = "numpy"
+
+    def __init__(self, directory: str, storage_dtype: str = "float32", rescore_factor: int = 4):
+        self.directory = directory
+        self.storage_dtype = storage_dtype
+        self.rescore_factor = rescore_factor
+        self._partitions: Dict[str, Dict[str, _Partition]] = {name: {} for name in COLLECTION_NAMES}
+        # Guards the partition maps only; each partition has its own lock
+        self._lock = threading.RLock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _collection_dir(self, collection: str) -> str:
+        if collection not in self._partitions:
+            raise KeyError(f"Collection {collection} not found")
+        return os.path.join(self.directory, collection)
+
+    def _partition(self, collection: str, name: str) -> _Partition:
+        path = os.path.join(self._collection_dir(collection), name)
+        with self._lock:
+            partitions = self._partitions[collection]
+            if name not in partitions:
+                partitions[name] = _Partition(path, self.storage_dtype)
+            return partitions[name]
+
+    def _all_partitions(self, collection: str) -> List[_Partition]:
+        path = self._collection_dir(collection)
+        if os.path.isdir(path):
+            for name in os.listdir(path):
+                if os.path.isdir(os.path.join(path, name)):
+                    self._partition(collection, name)
+        with self._lock:
+            partitions = list(self._partitions[collection].values())
+        return [p.load() for p in partitions]
+
+    def add(self, collection: str, tenant: str, documents: List[str], metadatas: List[Dict[str, Any]],
+            ids: List[str], embeddings: Optional[List[List[float]]] = None) -> None:
+        if embeddings is None:
+            raise ValueError("NumpyBackend requires precomputed embeddings")
+        vectors = normalize_rows(np.asarray(embeddings, dtype=np.float32))
+        self._partition(collection, tenant).upsert(documents, metadatas, ids, vectors)
+
+    def query(self, collection: str, tenant: str, query_embeddings: List[List[float]], n_results: int,
+              where: Optional[Dict[str, Any]] = None) -> List[List[SearchHit]]:
+        queries = normalize_rows(np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32)))
+        snapshot = self._partition(collection, tenant).load().snapshot
+        if not len(snapshot) or snapshot.vectors.shape[1] != queries.shape[1]:
+            return [[] for _ in range(len(queries))]
+        if where:
+            return self._filtered_query(snapshot, queries, n_results, where)
+        indices, scores = search(queries, snapshot.stored, n_results,
+                                 full_precision=snapshot.vectors, rescore_factor=self.rescore_factor)
+        return [[self._hit(snapshot, i, s) for i, s in zip(row_idx, row_scores)]
+                for row_idx, row_scores in zip(indices, scores)]
+
+    def delete(self, collection: str, tenant: str, ids: List[str]) -> int:
+        return self._partition(collection, tenant).delete(ids)
+
+    def ids(self, collection: str, tenant: str) -> List[str]:
+        snapshot = self._partition(collection, tenant).load().snapshot
+        return snapshot.ids[:snapshot.size]
+
+    def documents(self, collection: str, tenant: str) -> Tuple[List[str], List[str], List[Dict[str, Any]]]:
+        snapshot = self._partition(collection, tenant).load().snapshot
+        n = snapshot.size
+        return snapshot.ids[:n], snapshot.documents[:n], snapshot.metadatas[:n]
+
+    def _filtered_query(self, snapshot: _Snapshot, queries: np.ndarray, n_results: int,
+                        where: Dict[str, Any]) -> List[List[SearchHit]]:
+        rows = np.array([i for i, m in enumerate(snapshot.metadatas[:snapshot.size])
+                         if all(m.get(key) == value for key, value in where.items())], dtype=np.int64)
+        if not rows.size:
+            return [[] for _ in range(len(queries))]
+        scores = queries @ np.asarray(snapshot.vectors[rows], dtype=np.float32).T
+        k = min(n_results, rows.size)
+        best = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+        return [[self._hit(snapshot, rows[j], scores[q, j]) for j in best[q]] for q in range(len(queries))]
+
+    @staticmethod
+    def _hit(snapshot: _Snapshot, row: int, score: float) -> SearchHit:
+        return SearchHit(snapshot.ids[row], snapshot.documents[row], snapshot.metadatas[row],
+                         float(score), float(1.0 - score))
+
+    def _selected(self, collection: str, tenant: Optional[str]) -> List[_Partition]:
+        if tenant is not None:
+            return [self._partition(collection, tenant).load()]
+        return self._all_partitions(collection)
+
+    def flush(self, collection: str, tenant: Optional[str] = None) -> None:
+        if tenant is not None:
+            partitions = [self._partition(collection, tenant)]
+        else:
+            with self._lock:
+                partitions = list(self._partitions[collection].values())
+        for partition in partitions:
+            partition.flush()
+
+    def close(self) -> None:
+        for collection in self._partitions:
+            self.flush(collection)
+
+    def clear(self, collection: str, tenant: Optional[str] = None) -> None:
+        for partition in self._selected(collection, tenant):
+            with partition.lock:
+                partition.dropped = True
+                shutil.rmtree(partition.path, ignore_errors=True)
+            with self._lock:
+                self._partitions[collection].pop(os.path.basename(partition.path), None)
+
+    def _legacy_entries(self) -> List[str]:
+        entries = []
+        for collection in self._partitions:
+            path = self._collection_dir(collection)
+            if not os.path.isdir(path):
+                continue
+            for name in os.listdir(path):
+                entry = os.path.join(path, name)
+                # Files are from the shared, pre-partitioning layout
+                if not os.path.isdir(entry) or not is_tenant_key(name):
+                    entries.append(entry)
+        return entries
+
+    def legacy_storage(self) -> List[str]:
+        return [os.path.relpath(entry, self.directory) for entry in self._legacy_entries()]
+
+    def drop_legacy(self) -> List[str]:
+        removed = []
+        for entry in self._legacy_entries():
+            if os.path.isdir(entry):
+                shutil.rmtree(entry, ignore_errors=True)
+            else:
+                os.remove(entry)
+            removed.append(os.path.relpath(entry, self.directory))
+        return removed
+
+    def count(self, collection: str, tenant: Optional[str] = None) -> int:
+        return sum(len(p) for p in self._selected(collection, tenant))
+
+    def tenants(self, collection: str) -> List[str]:
+        return [os.path.basename(p.path) for p in self._all_partitions(collection) if len(p)]
+
+    def memory_bytes(self, collection: str, tenant: Optional[str] = None) -> int:
+        return sum(p.nbytes for p in self._selected(collection, tenant))
+
+    def full_precision_bytes(self, collection: str, tenant: Optional[str] = None) -> int:
+        return sum(p.full_precision_bytes for p in self._selected(collection, tenant))
@@ -1,173 +1,440 @@
+import logging
 import os
 import asyncio
-from typing import List, Dict, Any, Optional, Tuple
-import chromadb
+import functools
+import heapq
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Dict, Any, Optional, Tuple
 from app.config.settings import settings
+from app.services.lexical_index import BM25Index, LexicalHit, reciprocal_rank_fusion
+from app.services.metrics import metrics
+from app.services.vector_backends import COLLECTION_NAMES, SearchHit, VectorBackend, create_backend, tenant_key
+
+logger = logging.getLogger(__name__)
 
 class VectorStoreService:
-    def __init__(self):
+    """Async facade over a tenant-partitioned vector backend.
+
+    Every read and write is scoped to one company: documents are stored in
+    that company's partition and searches only scan it, so query cost and
+    re-indexing are proportional to one tenant's data. A BM25 index per
+    (company, collection) is built lazily from the stored documents and kept
+    in sync with adds and deletes, for ``hybrid_search``; at most
+    ``lexical_index_max_entries`` are kept, least recently searched first out.
+    """
+
+    def __init__(self, embedding_service=None, backend: Optional[VectorBackend] = None):
+        self.backend = backend or create_backend()
+        self.embedding_service = embedding_service
         self.persist_directory = settings.chromadb_persist_directory
-        self.client = chromadb.PersistentClient(path=self.persist_directory)
         self.collections = {}
+        # Backend calls are blocking (Chroma, NumPy/disk); they run on a
+        # bounded pool so they never stall the event loop
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.vector_store_max_workers,
+            thread_name_prefix="vector-store"
+        )
+        self._lexical: "OrderedDict[Tuple[str, str], BM25Index]" = OrderedDict()
+        # One build per key at a time, and the writes that arrive while it runs
+        self._lexical_builds: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._lexical_pending: Dict[Tuple[str, str], List[Callable[[BM25Index], None]]] = {}
+
+    async def _run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+
+    def close(self) -> None:
+        try:
+            self.backend.close()
+        except Exception as e:
+            logger.error("❌ Error closing vector backend: %s", e)
+        self._executor.shutdown(wait=False, cancel_futures=True)
 
     async def _initialize_collections(self):
-        """Initialize ChromaDB collections"""
+        """Initialize collections"""
         try:
-            collection_names = [
-                "products",
-                "raw_materials", 
-                "inventory_movements",
-                "company_info"
-            ]
-            for name in collection_names:
-                try:
-                    collection = self.client.get_or_create_collection(
-                        name=name,
-                        metadata={"description": f"Collection for {name}"}
-                    )
-                    self.collections[name] = collection
-                except Exception as e:
-                    print(f"❌ Error creating collection {name}: {e}")
+            for name in COLLECTION_NAMES:
+                self.collections[name] = name
         except Exception as e:
-            print(f"❌ Error initializing collections: {e}")
+            logger.error("❌ Error initializing collections: %s", e)
 
     async def add_documents(self, collection_name: str, documents: List[str], 
-                           metadatas: List[Dict[str, Any]], ids: List[str]) -> bool:
-        """Add documents to a collection"""
+                           metadatas: List[Dict[str, Any]], ids: List[str],
+                           embeddings: Optional[List[List[float]]] = None, *, company_id: str) -> bool:
+        """Add or update documents (by id) in a company's partition of a collection.
+
+        When ``embeddings`` is not given and an embedding service is
+        configured, documents are embedded with it; documents whose embedding
+        fails are skipped.
+        """
         try:
             if collection_name not in self.collections:
                 await self._initialize_collections()
             if collection_name not in self.collections:
-                print(f"❌ Collection {collection_name} not found")
+                logger.error("❌ Collection %s not found", collection_name)
                 return False
             
-            collection = self.collections[collection_name]
-            
-            # Process in batches to avoid memory issues
-            batch_size = 100
-            for i in range(0, len(documents), batch_size):
-                batch_docs = documents[i:i + batch_size]
-                batch_metadatas = metadatas[i:i + batch_size]
-                batch_ids = ids[i:i + batch_size]
-                
-                collection.add(
-                    documents=batch_docs,
-                    metadatas=batch_metadatas,
-                    ids=batch_ids
-                )
+            if embeddings is None and self.embedding_service is not None:
+                embeddings = await self.embedding_service.generate_embeddings_batch(documents)
+                keep = [i for i, embedding in enumerate(embeddings) if embedding is not None]
+                if len(keep) < len(documents):
+                    logger.warning("⚠️ Skipping %d documents without embeddings in %s",
+                                   len(documents) - len(keep), collection_name)
+                documents = [documents[i] for i in keep]
+                metadatas = [metadatas[i] for i in keep]
+                ids = [ids[i] for i in keep]
+                embeddings = [embeddings[i] for i in keep]
+            if not documents:
+                return True
             
+            await self._run(self.backend.add, collection_name, tenant_key(company_id), documents, metadatas, ids, embeddings)
+            self._lexical_update((tenant_key(company_id), collection_name),
+                                 lambda index: index.upsert(ids, documents, metadatas))
             return True
         except Exception as e:
-            print(f"❌ Error adding documents to {collection_name}: {e}")
+            logger.error("❌ Error adding documents to %s: %s", collection_name, e)
             return False
 
+    async def delete_documents(self, collection_name: str, ids: List[str], *, company_id: str) -> int:
+        """Delete documents by id from a company's partition; returns how many were removed"""
+        try:
+            if collection_name not in self.collections:
+                await self._initialize_collections()
+            if collection_name not in self.collections or not ids:
+                return 0
+            
+            self._lexical_update((tenant_key(company_id), collection_name), lambda index: index.remove(ids))
+            return await self._run(self.backend.delete, collection_name, tenant_key(company_id), ids)
+        except Exception as e:
+            logger.error("❌ Error deleting documents from %s: %s", collection_name, e)
+            return 0
+
+    async def flush(self, collection_name: str, *, company_id: str) -> None:
+        """Persist a company's buffered writes to a collection; call once per index run"""
+        await self._run(self.backend.flush, collection_name, tenant_key(company_id))
+
+    async def count_documents(self, collection_name: str, *, company_id: str) -> int:
+        """Number of documents indexed for a company in a collection"""
+        if collection_name not in self.collections:
+            await self._initialize_collections()
+        if collection_name not in self.collections:
+            return 0
+        return await self._run(self.backend.count, collection_name, tenant_key(company_id))
+
+    async def get_document_ids(self, collection_name: str, *, company_id: str) -> List[str]:
+        """Ids currently indexed for a company in a collection"""
+        if collection_name not in self.collections:
+            await self._initialize_collections()
+        if collection_name not in self.collections:
+            return []
+        return await self._run(self.backend.ids, collection_name, tenant_key(company_id))
+
+    @staticmethod
+    def _format_hits(hits: List[SearchHit], threshold: float) -> List[Dict[str, Any]]:
+        return [
+            {
+                "content": hit.document,
+                "metadata": hit.metadata,
+                "similarity": hit.similarity,
+                "distance": hit.distance
+            }
+            for hit in hits if hit.similarity >= threshold
+        ]
+
     async def search_similar(self, collection_name: str, query_embedding: List[float], 
-                           n_results: int = 5, threshold: float = 0.7) -> List[Dict[str, Any]]:
-        """Search for similar documents"""
+                           n_results: int = 5, threshold: float = 0.7,
+                           where: Optional[Dict[str, Any]] = None, *, company_id: str) -> List[Dict[str, Any]]:
+        """Search for similar documents within a company's data"""
+        results = await self.search_similar_batch(collection_name, [query_embedding], n_results, threshold, where,
+                                                  company_id=company_id)
+        return results[0] if results else []
+
+    async def search_similar_batch(self, collection_name: str, query_embeddings: List[List[float]],
+                                   n_results: int = 5, threshold: float = 0.7,
+                                   where: Optional[Dict[str, Any]] = None, *,
+                                   company_id: str) -> List[List[Dict[str, Any]]]:
+        """Search for similar documents for several queries in one backend call"""
         try:
             if collection_name not in self.collections:
                 await self._initialize_collections()
             if collection_name not in self.collections:
-                print(f"❌ Collection {collection_name} not found")
-                return []
-            
-            collection = self.collections[collection_name]
+                logger.error("❌ Collection %s not found", collection_name)
+                return [[] for _ in query_embeddings]
             
-            results = collection.query(
-                query_embeddings=[query_embedding],
-                n_results=n_results,
-                include=["documents", "metadatas", "distances"]
-            )
-            
-            similar_docs = []
-            if results["documents"] and results["documents"][0]:
-                for i, (doc, metadata, distance) in enumerate(zip(
-                    results["documents"][0],
-                    results["metadatas"][0], 
-                    results["distances"][0]
-                )):
-                    similarity = 1 - distance
-                    if similarity >= threshold:
-                        similar_docs.append({
-                            "content": doc,
-                            "metadata": metadata,
-                            "similarity": similarity,
-                            "distance": distance
-                        })
-            
-            return similar_docs
+            with metrics.stage("vector_search"):
+                results = await self._run(self.backend.query, collection_name, tenant_key(company_id),
+                                          query_embeddings, n_results, where)
+            return [self._format_hits(hits, threshold) for hits in results]
         except Exception as e:
-            print(f"❌ Error searching in {collection_name}: {e}")
-            return []
+            logger.error("❌ Error searching in %s: %s", collection_name, e)
+            return [[] for _ in query_embeddings]
+
+    async def _search_collections(self, query_embedding: List[float], names: List[str], n_results: int,
+                                  where: Optional[Dict[str, Any]], company_id: str) -> List[Tuple[str, SearchHit]]:
+        """Query ``names`` concurrently; the global top ``n_results`` as (collection, hit), best first"""
+        tenant = tenant_key(company_id)
+        
+        async def search_one(name: str) -> List[Tuple[str, SearchHit]]:
+            try:
+                hits = await self._run(self.backend.query, name, tenant, [query_embedding], n_results, where)
+                return [(name, hit) for hit in hits[0]] if hits else []
+            except Exception as e:
+                logger.error("❌ Error searching in %s: %s", name, e)
+                return []
+        
+        with metrics.stage("vector_search"):
+            per_collection = await asyncio.gather(*(search_one(name) for name in names))
+        return heapq.nlargest(
+            n_results,
+            (item for items in per_collection for item in items),
+            key=lambda item: item[1].similarity
+        )
+
+    async def search_many(self, query_embedding: List[float], collection_names: Optional[List[str]] = None,
+                          n_results: int = 5, threshold: float = 0.7,
+                          where: Optional[Dict[str, Any]] = None, *, company_id: str) -> List[Dict[str, Any]]:
+        """Search several collections of one company concurrently and return the global top ``n_results``.
+
+        Each result carries the ``collection`` it came from. The threshold is
+        applied once, after merging.
+        """
+        await self._initialize_collections()
+        names = [name for name in (collection_names or list(COLLECTION_NAMES)) if name in self.collections]
+        best = await self._search_collections(query_embedding, names, n_results, where, company_id)
+        return [
+            {**formatted, "collection": name}
+            for name, hit in best
+            for formatted in self._format_hits([hit], threshold)
+        ]
+
+    def _lexical_update(self, key: Tuple[str, str], apply: Callable[[BM25Index], None]) -> None:
+        """Apply a write to the key's BM25 index, and replay it on one being built"""
+        index = self._lexical.get(key)
+        if index is not None:
+            apply(index)
+        pending = self._lexical_pending.get(key)
+        if pending is not None:
+            # Upserts and removes are idempotent, so replaying one the build
+            # already read from the backend is harmless
+            pending.append(apply)
+
+    async def _build_lexical_index(self, key: Tuple[str, str]) -> BM25Index:
+        pending = self._lexical_pending[key] = []
+        try:
+            def build() -> BM25Index:
+                built = BM25Index()
+                built.upsert(*self.backend.documents(key[1], key[0]))
+                return built
+            index = await self._run(build)
+            for apply in pending:
+                apply(index)
+            self._lexical[key] = index
+            while len(self._lexical) > max(1, settings.lexical_index_max_entries):
+                self._lexical.popitem(last=False)
+            return index
+        finally:
+            del self._lexical_pending[key]
+            del self._lexical_builds[key]
+
+    async def _lexical_index(self, collection_name: str, company_id: str) -> BM25Index:
+        key = (tenant_key(company_id), collection_name)
+        index = self._lexical.get(key)
+        if index is not None:
+            self._lexical.move_to_end(key)
+            return index
+        build = self._lexical_builds.get(key)
+        if build is None:
+            build = self._lexical_builds[key] = asyncio.ensure_future(self._build_lexical_index(key))
+        # Shielded: a cancelled search must not cancel a build others wait on
+        return await asyncio.shield(build)
+
+    async def lexical_search(self, collection_name: str, query: str, n_results: int = 5, *,
+                             company_id: str) -> Tuple[List[LexicalHit], bool]:
+        """BM25 search in a company's collection; also returns whether the match is exact"""
+        try:
+            if collection_name not in self.collections:
+                await self._initialize_collections()
+            if collection_name not in self.collections:
+                return [], False
+            index = await self._lexical_index(collection_name, company_id)
+            hits = index.search(query, n_results)
+            return hits, index.is_exact(query, hits)
+        except Exception as e:
+            logger.error("❌ Error in lexical search in %s: %s", collection_name, e)
+            return [], False
+
+    async def hybrid_search(self, query: str, collection_names: Optional[List[str]] = None,
+                            n_results: int = 5, threshold: float = 0.0, *, company_id: str) -> Dict[str, Any]:
+        """Lexical (BM25) + vector search over a company's collections.
+
+        If the lexical index matches the query exactly (a SKU/folio, or a
+        name only one document contains) its hits are returned without
+        embedding the query. Otherwise lexical and vector rankings are
+        merged by reciprocal-rank fusion. ``threshold`` filters vector hits.
+        """
+        await self._initialize_collections()
+        names = [name for name in (collection_names or list(COLLECTION_NAMES)) if name in self.collections]
+        depth = max(n_results, settings.hybrid_candidates)
+        
+        with metrics.stage("lexical_search"):
+            lexical_results = await asyncio.gather(
+                *(self.lexical_search(name, query, depth, company_id=company_id) for name in names)
+            )
+        lexical = sorted(
+            ((name, hit) for name, (hits, _) in zip(names, lexical_results) for hit in hits),
+            key=lambda item: -item[1].score
+        )
+        exact = [(name, hits[0]) for name, (hits, is_exact) in zip(names, lexical_results) if is_exact]
+        
+        def lexical_result(name: str, hit: LexicalHit) -> Dict[str, Any]:
+            return {"content": hit.document, "metadata": hit.metadata, "collection": name,
+                    "lexical_score": hit.score}
+        
+        if exact:
+            return {"method": "lexical", "results": [lexical_result(name, hit) for name, hit in exact[:n_results]]}
+        
+        embedding = None
+        if self.embedding_service is not None:
+            embedding = await self.embedding_service.generate_embedding(query)
+        if embedding is None:
+            return {"method": "lexical", "results": [lexical_result(name, hit) for name, hit in lexical[:n_results]]}
+        
+        vector = [(name, hit) for name, hit in
+                  await self._search_collections(embedding, names, depth, None, company_id)
+                  if hit.similarity >= threshold]
+        
+        results: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        for name, hit in lexical:
+            results[(name, hit.id)] = lexical_result(name, hit)
+        for name, hit in vector:
+            entry = results.setdefault((name, hit.id), {"content": hit.document, "metadata": hit.metadata,
+                                                        "collection": name})
+            entry["similarity"] = hit.similarity
+        fused = reciprocal_rank_fusion(
+            [[(name, hit.id) for name, hit in lexical], [(name, hit.id) for name, hit in vector]],
+            k=settings.hybrid_rrf_k
+        )
+        return {
+            "method": "hybrid" if lexical else "vector",
+            "results": [{**results[key], "score": score} for key, score in fused[:n_results]]
+        }
 
-    async def get_collection_stats(self, collection_name: str) -> Dict[str, Any]:
-        """Get statistics for a collection"""
+    async def get_collection_stats(self, collection_name: str, company_id: Optional[str] = None) -> Dict[str, Any]:
+        """Get statistics for a collection, optionally for a single company"""
         try:
             if collection_name not in self.collections:
                 await self._initialize_collections()
             if collection_name not in self.collections:
                 return {"error": f"Collection {collection_name} not found"}
             
-            collection = self.collections[collection_name]
-            count = collection.count()
+            tenant = tenant_key(company_id) if company_id is not None else None
+            count, memory_bytes = await asyncio.gather(
+                self._run(self.backend.count, collection_name, tenant),
+                self._run(self.backend.memory_bytes, collection_name, tenant)
+            )
             
-            return {
+            stats = {
                 "name": collection_name,
                 "document_count": count,
+                "memory_bytes": memory_bytes,
                 "status": "active"
             }
+            if company_id is not None:
+                stats["company_id"] = company_id
+            return stats
         except Exception as e:
-            print(f"❌ Error getting stats for {collection_name}: {e}")
+            logger.error("❌ Error getting stats for %s: %s", collection_name, e)
             return {"error": str(e)}
 
+    async def get_company_stats(self, company_id: str) -> Dict[str, Any]:
+        """Document counts and vector memory of one company across collections"""
+        await self._initialize_collections()
+        names = list(self.collections)
+        results = await asyncio.gather(*(self.get_collection_stats(name, company_id) for name in names))
+        collections = dict(zip(names, results))
+        return {
+            "company_id": company_id,
+            "collections": collections,
+            "total_documents": sum(s.get("document_count", 0) for s in collections.values()),
+            "memory_bytes": sum(s.get("memory_bytes", 0) for s in collections.values())
+        }
+
     async def get_all_stats(self) -> Dict[str, Any]:
         """Get statistics for all collections"""
         try:
             await self._initialize_collections()
             stats = {}
             total_documents = 0
+            total_bytes = 0
+            tenants = set()
             
-            for name, collection in self.collections.items():
-                try:
-                    count = collection.count()
-                    stats[name] = {
-                        "document_count": count,
-                        "status": "active"
-                    }
-                    total_documents += count
-                except Exception as e:
-                    stats[name] = {"error": str(e)}
+            names = list(self.collections)
+            
+            def collect(name: str) -> Dict[str, Any]:
+                return {
+                    "document_count": self.backend.count(name),
+                    "memory_bytes": self.backend.memory_bytes(name),
+                    "full_precision_bytes": self.backend.full_precision_bytes(name),
+                    "tenants": self.backend.tenants(name)
+                }
+            
+            results = await asyncio.gather(
+                *(self._run(collect, name) for name in names),
+                return_exceptions=True
+            )
+            for name, result in zip(names, results):
+                if isinstance(result, Exception):
+                    stats[name] = {"error": str(result)}
+                    continue
+                stats[name] = {
+                    "document_count": result["document_count"],
+                    "memory_bytes": result["memory_bytes"],
+                    "full_precision_bytes": result["full_precision_bytes"],
+                    "tenant_count": len(result["tenants"]),
+                    "status": "active"
+                }
+                total_documents += result["document_count"]
+                total_bytes += result["memory_bytes"]
+                tenants.update(result["tenants"])
             
             return {
+                "backend": self.backend.name,
                 "collections": stats,
                 "total_collections": len(self.collections),
-                "total_documents": total_documents
+                "total_documents": total_documents,
+                "total_tenants": len(tenants),
+                "memory_bytes": total_bytes
             }
         except Exception as e:
-            print(f"❌ Error getting all stats: {e}")
+            logger.error("❌ Error getting all stats: %s", e)
             return {"error": str(e)}
 
     async def test_connection(self) -> bool:
-        """Test ChromaDB connection"""
+        """Test vector store connection"""
         try:
             await self._initialize_collections()
             stats = await self.get_all_stats()
             return "error" not in stats
         except Exception as e:
-            print(f"❌ ChromaDB connection test failed: {e}")
+            logger.error("❌ Vector store connection test failed: %s", e)
             return False
 
-    async def clear_collection(self, collection_name: str) -> bool:
-        """Clear a collection"""
+    async def clear_collection(self, collection_name: str, company_id: Optional[str] = None) -> bool:
+        """Clear one company's documents in a collection, or the whole collection when no company is given"""
         try:
             if collection_name not in self.collections:
                 await self._initialize_collections()
             if collection_name not in self.collections:
                 return False
             
-            collection = self.collections[collection_name]
-            collection.delete(where={})
+            tenant = tenant_key(company_id) if company_id is not None else None
+            for key in [k for k in self._lexical if k[1] == collection_name and tenant in (None, k[0])]:
+                del self._lexical[key]
+            for key in [k for k in self._lexical_pending if k[1] == collection_name and tenant in (None, k[0])]:
+                self._lexical_pending[key].append(lambda index: index.remove(list(index.doc_terms)))
+            await self._run(self.backend.clear, collection_name, tenant)
             return True
         except Exception as e:
-            print(f"❌ Error clearing collection {collection_name}: {e}")
+            logger.error("❌ Error clearing collection %s: %s", collection_name, e)
             return False
@@ -0,0 +1 @@
+# Benchmarks for the Axura RAG System
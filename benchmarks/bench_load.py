@@ -0,0 +1,228 @@
+"""
+Offline end-to-end load test: /api/v1/ask, /api/invoice-rag/query and /api/v1/index.
+
+Starts the fake upstreams (OpenAI + business backend, see
+benchmarks/loadtest/fakes.py) and the app with a seeded in-memory MongoDB
+(benchmarks/loadtest/serve.py) as subprocesses, then drives each endpoint at
+every concurrency level and reports throughput and p50/p99 latency. No
+network access or credentials are needed. The app's own per-stage latency
+summary (from /api/v1/stats) is included in the JSON output, so results can
+be diffed between commits.
+
+    python -m benchmarks.bench_load --concurrency 1 8 32 --requests 200 --json load.json
+    python -m benchmarks.bench_load --endpoints index --tenants 8 --tenant-size 2000
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+import numpy as np
+
+from benchmarks.loadtest.data import invoices, tenant_ids
+from benchmarks.loadtest.fakes import add_arguments
+
+ASK_QUESTIONS = [
+    "¿Qué productos tengo?",
+    "¿Qué productos tienen bajo stock?",
+    "¿Cuánto vale el inventario?",
+    "¿Quiénes son mis proveedores?",
+    "Dame un resumen del inventario"
+]
+# One aggregate question (answered by analytics) and one that needs the LLM
+INVOICE_QUESTIONS = [
+    "¿Cuál es el total facturado por mes?",
+    "Explica la factura con folio F-12 y su receptor"
+]
+
+RequestFactory = Callable[[int], Tuple[str, Dict[str, Any]]]
+
+
+def percentile(values: List[float], q: float) -> float:
+    return float(np.percentile(np.asarray(values), q)) if values else 0.0
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def wait_healthy(url: str, process: subprocess.Popen, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise SystemExit(f"{url} exited with code {process.returncode}")
+            try:
+                if (await client.get(url)).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise SystemExit(f"{url} did not become healthy within {timeout:.0f}s")
+
+
+def request_factories(args: argparse.Namespace) -> Dict[str, RequestFactory]:
+    tenants = tenant_ids(args.tenants)
+    invoice_data = {tenant: {"data": invoices(tenant, args.invoices, args.seed)} for tenant in tenants}
+
+    def ask(i: int):
+        return "/api/v1/ask", {"question": ASK_QUESTIONS[i % len(ASK_QUESTIONS)], "company_id": tenants[i % len(tenants)]}
+
+    def invoice(i: int):
+        tenant = tenants[i % len(tenants)]
+        return "/api/invoice-rag/query", {"question": INVOICE_QUESTIONS[i % len(INVOICE_QUESTIONS)],
+                                          "company_id": tenant, "invoice_data": invoice_data[tenant]}
+
+    def index(i: int):
+        return "/api/v1/index", {"company_id": tenants[i % len(tenants)], "force_reindex": args.full_reindex,
+                                 "wait": True, "timeout": 600}
+
+    return {"ask": ask, "invoice": invoice, "index": index}
+
+
+async def run_load(client: httpx.AsyncClient, factory: RequestFactory, requests: int,
+                   concurrency: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async def worker() -> None:
+        nonlocal errors
+        for i in counter:
+            path, body = factory(i)
+            started = time.perf_counter()
+            try:
+                response = await client.post(path, json=body)
+                ok = response.status_code < 400 and (path != "/api/v1/index" or response.json()["status"] == "succeeded")
+            except httpx.HTTPError:
+                ok = False
+            latencies.append((time.perf_counter() - started) * 1000)
+            errors += not ok
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    seconds = time.perf_counter() - started
+    return {
+        "requests": requests,
+        "errors": errors,
+        "seconds": round(seconds, 4),
+        "throughput_rps": round(requests / seconds, 2) if seconds else 0.0,
+        "mean_ms": round(float(np.mean(latencies)), 3) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p99_ms": round(percentile(latencies, 99), 3)
+    }
+
+
+def start(module: str, options: List[str], env: Dict[str, str], log) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, "-m", module, *options], env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+async def bench(args: argparse.Namespace) -> Dict[str, Any]:
+    workdir = tempfile.mkdtemp(prefix="bench-load-")
+    upstream_port, app_port = free_port(), free_port()
+    upstream_url, app_url = f"http://127.0.0.1:{upstream_port}", f"http://127.0.0.1:{app_port}"
+    env = {
+        **os.environ,
+        "OPENAI_API_KEY": "sk-bench",
+        "OPENAI_BASE_URL": f"{upstream_url}/v1",
+        "BUSINESS_BACKEND_URL": upstream_url,
+        "BUSINESS_BACKEND_HTTP2": "false",
+        "VECTOR_BACKEND": args.vector_backend,
+        "NUMPY_VECTOR_DIRECTORY": os.path.join(workdir, "vectors"),
+        "CHROMA_PERSIST_DIRECTORY": os.path.join(workdir, "chroma"),
+        "EMBEDDING_CACHE_PATH": os.path.join(workdir, "embeddings.sqlite3"),
+        "INDEX_STATE_PATH": os.path.join(workdir, "watermarks.json"),
+        "INDEX_JOB_STORE_PATH": os.path.join(workdir, "jobs.sqlite3"),
+        "SEMANTIC_CACHE_ENABLED": "true" if args.semantic_cache else "false",
+        "LOG_LEVEL": "WARNING"
+    }
+    shared = ["--tenant-size", str(args.tenant_size), "--seed", str(args.seed)]
+    upstream_options = [
+        "--port", str(upstream_port), "--dims", str(args.dims),
+        "--embedding-latency-ms", str(args.embedding_latency_ms), "--chat-latency-ms", str(args.chat_latency_ms),
+        "--tokens-per-second", str(args.tokens_per_second), "--completion-tokens", str(args.completion_tokens),
+        "--backend-latency-ms", str(args.backend_latency_ms), *shared
+    ]
+    app_options = ["--port", str(app_port), "--tenants", str(args.tenants),
+                   "--mongo-latency-ms", str(args.mongo_latency_ms), *shared]
+
+    with open(os.path.join(workdir, "servers.log"), "w") as log:
+        upstream = start("benchmarks.loadtest.fakes", upstream_options, env, log)
+        server = start("benchmarks.loadtest.serve", app_options, env, log)
+        try:
+            await wait_healthy(f"{upstream_url}/health", upstream)
+            await wait_healthy(f"{app_url}/health", server)
+            factories = request_factories(args)
+            results = []
+            timeout = httpx.Timeout(600.0, connect=10.0)
+            limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+            async with httpx.AsyncClient(base_url=app_url, timeout=timeout, limits=limits) as client:
+                for endpoint in args.endpoints:
+                    # Warm caches and connection pools so the first level isn't penalized
+                    await run_load(client, factories[endpoint], min(args.tenants, args.requests), 1)
+                    for concurrency in args.concurrency:
+                        result = {"endpoint": endpoint, "concurrency": concurrency,
+                                  **await run_load(client, factories[endpoint], args.requests, concurrency)}
+                        results.append(result)
+                        print(f"{endpoint:>8} c={concurrency:>4} {result['throughput_rps']:>9.2f} req/s "
+                              f"p50={result['p50_ms']:>9.2f}ms p99={result['p99_ms']:>9.2f}ms "
+                              f"errors={result['errors']}")
+                stats = (await client.get("/api/v1/stats")).json()
+        finally:
+            for process in (server, upstream):
+                process.terminate()
+            for process in (server, upstream):
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+    config = {key: value for key, value in vars(args).items() if key != "json"}
+    return {"benchmark": "load", "commit": git_commit(), "config": config, "results": results,
+            "server_latency": stats.get("latency", {}), "logs": os.path.join(workdir, "servers.log")}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoints", nargs="+", default=["ask", "invoice", "index"], choices=["ask", "invoice", "index"])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint and concurrency level")
+    parser.add_argument("--tenants", type=int, default=4)
+    parser.add_argument("--invoices", type=int, default=500, help="Invoices sent per invoice query")
+    parser.add_argument("--mongo-latency-ms", type=float, default=1.0)
+    parser.add_argument("--vector-backend", default="numpy", choices=["numpy", "chroma"])
+    parser.add_argument("--full-reindex", action="store_true", help="Rebuild the index on every /api/v1/index call")
+    parser.add_argument("--semantic-cache", action="store_true", help="Keep the semantic answer cache enabled")
+    parser.add_argument("--json", help="Write results to this file")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    report = asyncio.run(bench(args))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    failed = [f"{r['endpoint']} c={r['concurrency']}: {r['errors']} of {r['requests']} requests failed"
+              for r in report["results"] if r["errors"]]
+    if failed:
+        raise SystemExit("❌ Requests failed (see " + report["logs"] + "):\n" + "\n".join(failed))
+
+
+if __name__ == "__main__":
+    main()
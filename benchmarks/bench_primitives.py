@@ -0,0 +1,282 @@
+"""
+Micro-benchmarks for the indexing and retrieval primitives at tenant scale.
+
+Operations, each over one synthetic tenant of N documents:
+
+  format       DataProcessorService.format_inventory_for_rag
+  embed        EmbeddingService.generate_embeddings_batch (in-process fake client,
+               so only planning, token counting and bookkeeping are measured)
+  add          VectorStoreService.add_documents with precomputed embeddings,
+               once per --add-batch-sizes value
+  search       VectorStoreService.search_similar on a populated partition
+
+Every (operation, size) runs in a fresh subprocess and inputs are built
+before measuring starts, so figures cover the operation alone. Time and RSS
+growth (peak RSS minus RSS when the operation started) are measured without
+tracemalloc; a second pass under tracemalloc reports peak and retained Python
+allocations (skip it with --no-alloc). Results are reported per operation and
+per item: documents, or queries for ``search``. Each operation also reports
+how many items it should have produced; a shortfall fails the measurement.
+
+    python -m benchmarks.bench_primitives --sizes 1000 10000 100000 --json primitives.json
+    python -m benchmarks.bench_primitives --ops add --sizes 100000 1000000 --add-batch-sizes 256 5000
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+
+OPERATIONS = ("format", "embed", "add", "search")
+# Documents per tenant split like real inventories: 2 products : 1 raw material : 4 movements
+SPLIT = {"products": 2 / 7, "raw_materials": 1 / 7, "movements": 4 / 7}
+
+
+def rss_bytes() -> int:
+    """Current resident set size (Linux), falling back to the peak elsewhere"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return peak_rss_bytes()
+
+
+def peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def inventory(size: int) -> Dict[str, List[Dict[str, Any]]]:
+    from benchmarks.loadtest.data import inventory_documents
+
+    # inventory_documents yields 3.5 documents per product; trim to the split above
+    documents = inventory_documents("bench", max(1, round(size * SPLIT["products"])))
+    counts = {key: max(1, round(size * share)) for key, share in SPLIT.items()}
+    return {
+        "products": documents["products"][:counts["products"]],
+        "raw_materials": documents["rawmaterials"][:counts["raw_materials"]],
+        "movements": (documents["movements"] * 2)[:counts["movements"]]
+    }
+
+
+def texts(size: int) -> List[str]:
+    return [f"Producto: Producto {i} Ferretería - Stock: {i % 500} - Precio: {i % 997}.50 - Categoría: Herramientas"
+            for i in range(size)]
+
+
+class _FakeEmbeddingsAPI:
+    """``client.embeddings.create`` returning one shared vector per input"""
+
+    def __init__(self, dims: int):
+        self.vector = np.ones(dims, dtype=np.float32).tolist()
+        self.calls = 0
+
+    async def create(self, input, **kwargs):
+        self.calls += 1
+        inputs = input if isinstance(input, list) else [input]
+        return SimpleNamespace(data=[SimpleNamespace(index=i, embedding=self.vector) for i in range(len(inputs))])
+
+
+def vector_store(directory: str):
+    from app.services.vector_backends.numpy_backend import NumpyBackend
+    from app.services.vector_store import VectorStoreService
+
+    return VectorStoreService(None, backend=NumpyBackend(directory))
+
+
+Operation = Callable[[], Awaitable[Dict[str, Any]]]
+
+
+async def setup_format(size: int, args: argparse.Namespace, directory: str) -> Operation:
+    from app.services.data_processor import DataProcessorService
+
+    service = DataProcessorService.__new__(DataProcessorService)  # no Mongo client needed
+    data = inventory(size)
+    expected = sum(map(len, data.values()))
+
+    async def run():
+        return {"items": len(await service.format_inventory_for_rag(data)), "expected": expected}
+    return run
+
+
+async def setup_embed(size: int, args: argparse.Namespace, directory: str) -> Operation:
+    from app.services.embeddings import EmbeddingService
+
+    service = EmbeddingService()
+    service.cache = None
+    service._client = SimpleNamespace(embeddings=_FakeEmbeddingsAPI(args.dims))
+    inputs = texts(size)
+
+    async def run():
+        vectors = await service.generate_embeddings_batch(inputs)
+        return {"items": sum(v is not None for v in vectors), "expected": size,
+                "api_calls": service.client.embeddings.calls}
+    return run
+
+
+async def setup_add(size: int, args: argparse.Namespace, directory: str) -> Operation:
+    from app.services.vector_backends import tenant_key
+
+    store = vector_store(directory)
+    documents = texts(size)
+    metadatas = [{"type": "product", "stock": i % 500} for i in range(size)]
+    ids = [f"product:{i}" for i in range(size)]
+    embeddings = np.random.default_rng(size).standard_normal((size, args.dims), dtype=np.float32).tolist()
+    batch = args.batch
+
+    async def run():
+        for i in range(0, size, batch):
+            await store.add_documents("products", documents[i:i + batch], metadatas[i:i + batch], ids[i:i + batch],
+                                      embeddings[i:i + batch], company_id="bench")
+        store.close()  # flushes the partition to disk
+        return {"items": store.backend.count("products", tenant_key("bench")), "expected": size, "batch_size": batch}
+    return run
+
+
+async def setup_search(size: int, args: argparse.Namespace, directory: str) -> Operation:
+    from app.services.vector_backends import tenant_key
+
+    store = vector_store(directory)
+    rng = np.random.default_rng(size)
+    # Populate in one backend call; write cost is what the add operation measures
+    store.backend.add("products", tenant_key("bench"), texts(size), [{"type": "product"}] * size,
+                      [f"product:{i}" for i in range(size)], rng.standard_normal((size, args.dims), dtype=np.float32))
+    queries = rng.standard_normal((args.queries, args.dims), dtype=np.float32).tolist()
+    await store.search_similar("products", queries[0], args.k, 0.0, company_id="bench")  # load the partition
+
+    async def run():
+        latencies = []
+        answered = 0
+        for query in queries:
+            started = time.perf_counter()
+            results = await store.search_similar("products", query, args.k, 0.0, company_id="bench")
+            latencies.append(time.perf_counter() - started)
+            answered += len(results) == min(args.k, size)
+        store.close()
+        return {"items": answered, "expected": len(queries), "query_p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 4),
+                "query_p99_ms": round(float(np.percentile(latencies, 99)) * 1000, 4)}
+    return run
+
+
+SETUPS = {"format": setup_format, "embed": setup_embed, "add": setup_add, "search": setup_search}
+
+
+async def run_operation(args: argparse.Namespace, directory: str) -> Dict[str, Any]:
+    """Build the inputs for one operation, then measure only the operation itself"""
+    operation = await SETUPS[args.op](args.size, args, directory)
+    gc.collect()
+    baseline_rss = rss_bytes()
+    if args.alloc:
+        tracemalloc.start()
+    started = time.perf_counter()
+    result = await operation()
+    seconds = time.perf_counter() - started
+    expected = result.pop("expected")
+    if result["items"] != expected:
+        raise AssertionError(f"{args.op} n={args.size} produced {result['items']} of {expected} items")
+    if args.alloc:
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return {"alloc_peak_bytes": peak, "alloc_retained_bytes": retained}
+    peak_rss = peak_rss_bytes()
+    return {"operation": args.op, "size": args.size, "seconds": seconds, **result,
+            "peak_rss_bytes": peak_rss, "rss_growth_bytes": max(0, peak_rss - baseline_rss)}
+
+
+def child(args: argparse.Namespace) -> None:
+    """Run one measurement and print it as JSON (invoked in a subprocess)"""
+    directory = tempfile.mkdtemp(prefix="bench-primitives-")
+    try:
+        print(json.dumps(asyncio.run(run_operation(args, directory))))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def measure(op: str, size: int, args: argparse.Namespace, alloc: bool) -> Optional[Dict[str, Any]]:
+    command = [sys.executable, "-m", "benchmarks.bench_primitives", "--child", "--op", op, "--size", str(size),
+               "--dims", str(args.dims), "--batch", str(args.batch), "--queries", str(args.queries), "--k", str(args.k)]
+    if alloc:
+        command.append("--alloc")
+    env = {**os.environ, "EMBEDDING_CACHE_ENABLED": "false", "LOG_LEVEL": "ERROR"}
+    try:
+        completed = subprocess.run(command, capture_output=True, text=True, env=env, timeout=args.timeout)
+    except subprocess.TimeoutExpired:
+        print(f"⚠️ {op} n={size} timed out after {args.timeout:.0f}s")
+        return None
+    if completed.returncode != 0:
+        print(f"❌ {op} n={size} failed:\n{completed.stderr[-2000:]}")
+        return None
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def summarize(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Add per-item figures: items are documents, or queries for ``search``"""
+    items = max(1, result["items"])
+    summary = {**result, "seconds": round(result["seconds"], 4),
+               "us_per_item": round(result["seconds"] / items * 1e6, 3),
+               "rss_growth_bytes_per_item": round(result["rss_growth_bytes"] / items, 1)}
+    if "alloc_peak_bytes" in result:
+        summary["alloc_peak_bytes_per_item"] = round(result["alloc_peak_bytes"] / items, 1)
+        summary["alloc_retained_bytes_per_item"] = round(result["alloc_retained_bytes"] / items, 1)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ops", nargs="+", default=list(OPERATIONS), choices=OPERATIONS)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--add-batch-sizes", type=int, nargs="+", default=[100, 256, 5000])
+    parser.add_argument("--dims", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--no-alloc", dest="measure_alloc", action="store_false",
+                        help="Skip the tracemalloc pass")
+    parser.add_argument("--timeout", type=float, default=1800, help="Seconds per measurement")
+    parser.add_argument("--json", help="Write results to this file")
+    # Internal: one measurement in this process
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--op", help=argparse.SUPPRESS)
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--batch", type=int, default=256, help=argparse.SUPPRESS)
+    parser.add_argument("--alloc", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args)
+        return
+
+    results = []
+    for op in args.ops:
+        for batch in (args.add_batch_sizes if op == "add" else [args.batch]):
+            args.batch = batch
+            for size in args.sizes:
+                result = measure(op, size, args, alloc=False)
+                if result is None:
+                    continue
+                if args.measure_alloc:
+                    result.update(measure(op, size, args, alloc=True) or {})
+                result = summarize(result)
+                results.append(result)
+                label = f"{op}/{batch}" if op == "add" else op
+                print(f"{label:>10} n={size:>8} {result['seconds']:>9.3f}s {result['us_per_item']:>9.2f}us/item "
+                      f"rss+={result['rss_growth_bytes'] / 2**20:>8.1f}MiB "
+                      f"alloc_peak={result.get('alloc_peak_bytes_per_item', float('nan')):>9.1f}B/item")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "primitives", "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
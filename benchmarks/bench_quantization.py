@@ -0,0 +1,130 @@
+"""
+Recall vs. memory benchmark for reduced-dimension and quantized vector storage.
+
+Compares every (dimensions, storage dtype, rescoring) combination against
+exact float32 search at full width and reports recall@k, index memory and
+query latency. Vectors come from the embedding cache (real embeddings) when
+available, otherwise from a synthetic corpus whose variance decays across
+dimensions the way text-embedding-3 vectors do.
+
+    python -m benchmarks.bench_quantization --docs 20000 --queries 200
+    python -m benchmarks.bench_quantization --embedding-cache ./embedding_cache/embeddings.sqlite3 --json results.json
+"""
+import argparse
+import json
+import sqlite3
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from app.services.quantization import STORAGE_DTYPES, normalize_rows, quantize, search, top_k, truncate_dimensions
+
+
+def synthetic_corpus(n_docs: int, n_queries: int, dims: int, seed: int = 7):
+    rng = np.random.default_rng(seed)
+    n_clusters = max(8, n_docs // 200)
+    # Leading components carry most of the energy, as in Matryoshka-trained embeddings
+    scale = (1.0 / np.sqrt(1.0 + np.arange(dims) / 64.0)).astype(np.float32)
+    centers = rng.normal(size=(n_clusters, dims)).astype(np.float32) * scale
+    labels = rng.integers(0, n_clusters, size=n_docs + n_queries)
+    noise = rng.normal(size=(n_docs + n_queries, dims)).astype(np.float32) * scale * 0.6
+    vectors = normalize_rows(centers[labels] + noise)
+    return vectors[:n_docs], vectors[n_docs:]
+
+
+def cached_corpus(path: str, n_queries: int, seed: int = 7):
+    conn = sqlite3.connect(path)
+    blobs = [row[0] for row in conn.execute("SELECT vector FROM embeddings")]
+    conn.close()
+    if not blobs:
+        raise SystemExit(f"No embeddings found in {path}")
+    dims = max(len(b) for b in blobs) // 4
+    vectors = normalize_rows(np.stack([np.frombuffer(b, dtype=np.float32) for b in blobs if len(b) == dims * 4]))
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(vectors))
+    n_queries = min(n_queries, len(vectors) // 10 or 1)
+    return vectors[order[n_queries:]], vectors[order[:n_queries]]
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def run(docs: np.ndarray, queries: np.ndarray, dimensions: List[int], k: int, rescore_factor: int) -> List[Dict]:
+    exact = top_k(queries @ docs.T, k)
+    baseline_bytes = docs.nbytes
+    results = []
+    for dims in dimensions:
+        if dims > docs.shape[1]:
+            continue
+        reduced_docs = truncate_dimensions(docs, dims)
+        reduced_queries = truncate_dimensions(queries, dims)
+        for dtype in STORAGE_DTYPES:
+            stored = quantize(reduced_docs, dtype)
+            rescore_options = [False] if dtype == "float32" else [False, True]
+            for rescore in rescore_options:
+                started = time.perf_counter()
+                found, _ = search(
+                    reduced_queries, stored, k,
+                    full_precision=reduced_docs if rescore else None,
+                    rescore_factor=rescore_factor
+                )
+                elapsed = time.perf_counter() - started
+                results.append({
+                    "dimensions": dims,
+                    "dtype": dtype,
+                    "rescore": rescore,
+                    "recall_at_k": round(recall_at_k(found, exact), 4),
+                    "index_bytes": stored.nbytes,
+                    "memory_reduction": round(baseline_bytes / stored.nbytes, 2),
+                    "ms_per_query": round(elapsed * 1000 / len(queries), 4)
+                })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--full-dimensions", type=int, default=3072)
+    parser.add_argument("--dimensions", type=int, nargs="+", default=[3072, 1536, 1024, 512, 256])
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rescore-factor", type=int, default=4)
+    parser.add_argument("--embedding-cache", help="SQLite embedding cache to read real vectors from")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    if args.embedding_cache:
+        docs, queries = cached_corpus(args.embedding_cache, args.queries)
+    else:
+        docs, queries = synthetic_corpus(args.docs, args.queries, args.full_dimensions)
+
+    results = run(docs, queries, args.dimensions, args.k, args.rescore_factor)
+    report = {
+        "benchmark": "quantization",
+        "docs": int(docs.shape[0]),
+        "queries": int(queries.shape[0]),
+        "full_dimensions": int(docs.shape[1]),
+        "k": args.k,
+        "rescore_factor": args.rescore_factor,
+        "source": "embedding_cache" if args.embedding_cache else "synthetic",
+        "results": results
+    }
+
+    print(f"{'dims':>6} {'dtype':>8} {'rescore':>8} {'recall@k':>9} {'MB':>9} {'x less':>7} {'ms/query':>9}")
+    for r in results:
+        print(f"{r['dimensions']:>6} {r['dtype']:>8} {str(r['rescore']):>8} {r['recall_at_k']:>9.4f} "
+              f"{r['index_bytes'] / 1e6:>9.2f} {r['memory_reduction']:>7.2f} {r['ms_per_query']:>9.4f}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    # Sanity check of the harness: unreduced float32 search is the exact baseline
+    baseline = [r for r in results if r["dimensions"] == docs.shape[1] and r["dtype"] == "float32"]
+    if baseline and baseline[0]["recall_at_k"] < 1.0:
+        raise SystemExit(f"❌ float32 search at full width has recall@k {baseline[0]['recall_at_k']}, expected 1.0")
+
+
+if __name__ == "__main__":
+    main()
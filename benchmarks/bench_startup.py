@@ -0,0 +1,150 @@
+"""
+Cold-start cost: import of ``app.main`` and process start to first ``/health`` response.
+
+Each run starts a fresh interpreter: one that only imports ``app.main`` (and
+reports which heavy SDKs that pulled in), and one running uvicorn that is
+polled until ``/health`` answers. The working tree is measured once per
+``--warmup`` mode (SERVICE_WARMUP); ``--ref`` also measures a git revision,
+checked out in a temporary worktree, for a before/after comparison.
+
+    python -m benchmarks.bench_startup --runs 5
+    python -m benchmarks.bench_startup --ref HEAD~1 --warmup none background --json startup.json
+"""
+import argparse
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import httpx
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("openai", "motor", "pymongo", "chromadb", "httpx", "numpy", "tiktoken")
+IMPORT_PROBE = f"""
+import json, sys, time
+started = time.perf_counter()
+import app.main
+print(json.dumps({{"seconds": time.perf_counter() - started,
+                  "modules": [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure_import(tree: str, env: Dict[str, str]) -> Dict[str, Any]:
+    completed = subprocess.run([sys.executable, "-c", IMPORT_PROBE], cwd=tree, env=env, capture_output=True,
+                               text=True, check=True)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def measure_first_health(tree: str, env: Dict[str, str], timeout: float) -> float:
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+                                "--port", str(port), "--log-level", "warning"],
+                               cwd=tree, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    try:
+        with httpx.Client(timeout=1.0) as client:
+            while time.perf_counter() - started < timeout:
+                if process.poll() is not None:
+                    raise SystemExit(f"Server in {tree} exited with code {process.returncode}:\n"
+                                     f"{process.stderr.read().decode()[-2000:]}")
+                try:
+                    if client.get(f"http://127.0.0.1:{port}/health").status_code == 200:
+                        return time.perf_counter() - started
+                except httpx.HTTPError:
+                    pass
+                time.sleep(0.005)
+        raise SystemExit(f"Server in {tree} did not answer /health within {timeout:.0f}s")
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def bench(label: str, tree: str, env: Dict[str, str], runs: int, timeout: float) -> Dict[str, Any]:
+    env = {**env, "PYTHONPATH": os.pathsep.join(filter(None, [tree, env.get("PYTHONPATH")]))}
+    imports = [measure_import(tree, env) for _ in range(runs)]
+    health = [measure_first_health(tree, env, timeout) for _ in range(runs)]
+    import_ms = [run["seconds"] * 1000 for run in imports]
+    health_ms = [seconds * 1000 for seconds in health]
+    result = {
+        "target": label,
+        "runs": runs,
+        "import_ms": round(float(np.median(import_ms)), 1),
+        "import_ms_min": round(min(import_ms), 1),
+        "first_health_ms": round(float(np.median(health_ms)), 1),
+        "first_health_ms_min": round(min(health_ms), 1),
+        "modules_at_import": imports[-1]["modules"]
+    }
+    print(f"{label:>24} import={result['import_ms']:>8.1f}ms first /health={result['first_health_ms']:>8.1f}ms "
+          f"loaded={','.join(result['modules_at_import']) or '-'}")
+    return result
+
+
+def add_worktree(ref: str) -> str:
+    path = tempfile.mkdtemp(prefix="bench-startup-")
+    os.rmdir(path)
+    subprocess.run(["git", "worktree", "add", "--detach", "--quiet", path, ref], cwd=REPO_ROOT, check=True)
+    return path
+
+
+def remove_worktree(path: str) -> None:
+    subprocess.run(["git", "worktree", "remove", "--force", path], cwd=REPO_ROOT, check=False)
+    shutil.rmtree(path, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--warmup", nargs="+", default=["none", "background"],
+                        choices=["none", "background", "blocking"], help="SERVICE_WARMUP modes for the working tree")
+    parser.add_argument("--ref", nargs="*", default=[], help="Git revisions to compare against")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds to wait for /health")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench-startup-state-")
+    env = {
+        **os.environ,
+        "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "sk-bench"),
+        "NUMPY_VECTOR_DIRECTORY": os.path.join(workdir, "vectors"),
+        "CHROMA_PERSIST_DIRECTORY": os.path.join(workdir, "chroma"),
+        "EMBEDDING_CACHE_PATH": os.path.join(workdir, "embeddings.sqlite3"),
+        "INDEX_STATE_PATH": os.path.join(workdir, "watermarks.json"),
+        "INDEX_JOB_STORE_PATH": os.path.join(workdir, "jobs.sqlite3"),
+        "LOG_LEVEL": "WARNING"
+    }
+    results: List[Dict[str, Any]] = []
+    try:
+        for ref in args.ref:
+            tree = add_worktree(ref)
+            try:
+                results.append(bench(ref, tree, env, args.runs, args.timeout))
+            finally:
+                remove_worktree(tree)
+        for mode in args.warmup:
+            results.append(bench(f"working tree ({mode})", REPO_ROOT, {**env, "SERVICE_WARMUP": mode},
+                                 args.runs, args.timeout))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "startup", "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
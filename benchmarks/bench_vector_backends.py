@@ -0,0 +1,146 @@
+"""
+Vector backend benchmark: NumPy (mmap, exact) vs ChromaDB.
+
+For each tenant size it measures bulk add time, single-query latency
+(p50/p99) and per-query cost of batched multi-query search, using synthetic
+normalized vectors. ChromaDB is skipped when it is not installed.
+
+Results are also checked: every document must be stored, batched queries
+must return the single-query hits and, for the NumPy backend (exact search,
+re-scored when quantized), recall@k against brute force must reach
+--min-recall; otherwise the run exits with an error. Chroma's HNSW recall is
+reported but not checked, since it is approximate by design.
+
+    python -m benchmarks.bench_vector_backends --sizes 1000 10000 50000 --dims 1024
+"""
+import argparse
+import json
+import shutil
+import tempfile
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from app.services.quantization import normalize_rows
+
+
+def percentile(values: List[float], q: float) -> float:
+    return float(np.percentile(np.asarray(values), q)) if values else 0.0
+
+
+def recall_at_k(found: List[List[str]], truth: np.ndarray, ids: List[str]) -> float:
+    hits = sum(len(set(f) & {ids[i] for i in t}) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def make_backend(name: str, directory: str, storage_dtype: str):
+    if name == "numpy":
+        from app.services.vector_backends.numpy_backend import NumpyBackend
+        return NumpyBackend(directory, storage_dtype=storage_dtype)
+    from app.services.vector_backends.chroma import ChromaBackend
+    return ChromaBackend(directory)
+
+
+def bench_backend(name: str, size: int, dims: int, queries: int, batch: int, k: int, storage_dtype: str) -> Dict:
+    rng = np.random.default_rng(size)
+    vectors = normalize_rows(rng.normal(size=(size, dims)).astype(np.float32))
+    query_vectors = normalize_rows(rng.normal(size=(queries, dims)).astype(np.float32))
+    documents = [f"Producto {i} - Stock: {i % 97}" for i in range(size)]
+    metadatas = [{"type": "product", "company": "bench"} for _ in range(size)]
+    ids = [f"product:{i}" for i in range(size)]
+
+    directory = tempfile.mkdtemp(prefix=f"bench-{name}-")
+    try:
+        backend = make_backend(name, directory, storage_dtype)
+        started = time.perf_counter()
+        for i in range(0, size, 5000):
+            backend.add("products", "bench", documents[i:i + 5000], metadatas[i:i + 5000], ids[i:i + 5000],
+                        vectors[i:i + 5000].tolist())
+        backend.flush("products", "bench")
+        add_seconds = time.perf_counter() - started
+
+        single, single_ids = [], []
+        for query in query_vectors:
+            started = time.perf_counter()
+            hits = backend.query("products", "bench", [query.tolist()], k)
+            single.append((time.perf_counter() - started) * 1000)
+            single_ids.append([hit.id for hit in hits[0]])
+
+        batched_ids = []
+        started = time.perf_counter()
+        for i in range(0, queries, batch):
+            hits = backend.query("products", "bench", query_vectors[i:i + batch].tolist(), k)
+            batched_ids.extend([hit.id for hit in row] for row in hits)
+        batched_ms = (time.perf_counter() - started) * 1000 / queries
+
+        exact = np.argsort(-(query_vectors @ vectors.T), axis=1)[:, :k]
+        count = backend.count("products", "bench")
+
+        return {
+            "backend": name,
+            "storage_dtype": storage_dtype if name == "numpy" else "float32",
+            "size": size,
+            "dims": dims,
+            "add_seconds": round(add_seconds, 4),
+            "query_p50_ms": round(percentile(single, 50), 4),
+            "query_p99_ms": round(percentile(single, 99), 4),
+            "batched_ms_per_query": round(batched_ms, 4),
+            "recall_at_k": round(recall_at_k(single_ids, exact, ids), 4),
+            "stored": count,
+            "batched_matches_single": [set(b) for b in batched_ids] == [set(s) for s in single_ids]
+        }
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--dims", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--storage-dtype", default="float32", choices=["float32", "float16", "int8"])
+    parser.add_argument("--backends", nargs="+", default=["numpy", "chroma"])
+    parser.add_argument("--min-recall", type=float, default=0.99,
+                        help="Fail when the NumPy backend's recall@k against exact search is lower")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    results = []
+    for name in args.backends:
+        if name == "chroma":
+            try:
+                import chromadb  # noqa: F401
+            except ImportError:
+                print("⚠️ chromadb is not installed, skipping the Chroma backend")
+                continue
+        for size in args.sizes:
+            result = bench_backend(name, size, args.dims, args.queries, args.batch, args.k, args.storage_dtype)
+            results.append(result)
+            print(f"{result['backend']:>7} {result['storage_dtype']:>8} n={size:>8} add={result['add_seconds']:>8.3f}s "
+                  f"p50={result['query_p50_ms']:>8.3f}ms p99={result['query_p99_ms']:>8.3f}ms "
+                  f"batched={result['batched_ms_per_query']:>8.3f}ms/query recall@k={result['recall_at_k']:.4f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "vector_backends", "results": results}, f, indent=2)
+
+    failures = []
+    for r in results:
+        problems = []
+        if r["stored"] != r["size"]:
+            problems.append(f"{r['stored']} of {r['size']} documents stored")
+        if r["backend"] == "numpy" and r["recall_at_k"] < args.min_recall:
+            problems.append(f"recall@k {r['recall_at_k']} < {args.min_recall}")
+        if not r["batched_matches_single"]:
+            problems.append("batched hits differ from single-query hits")
+        if problems:
+            failures.append(f"{r['backend']} {r['storage_dtype']} n={r['size']}: " + ", ".join(problems))
+    if failures:
+        raise SystemExit("❌ Incorrect results:\n" + "\n".join(failures))
+
+
+if __name__ == "__main__":
+    main()
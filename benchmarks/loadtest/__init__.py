@@ -0,0 +1 @@
+# Offline load-test harness: fake upstreams, a seeded Mongo substitute and the app under test
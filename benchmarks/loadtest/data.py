@@ -0,0 +1,121 @@
+"""Deterministic synthetic tenants shared by the fake upstreams and the fake Mongo."""
+import hashlib
+import random
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+CATEGORIES = ["Electrónicos", "Herramientas", "Muebles", "Papelería", "Limpieza", "Ferretería"]
+SUPPLIERS = ["ABC Supplies", "Bosques del Norte", "Metales MX", "Químicos SA", "Textiles Luna"]
+MOVEMENT_TYPES = ["entrada", "salida", "ajuste"]
+CURRENCIES = ["MXN", "MXN", "MXN", "USD"]
+EPOCH = datetime(2024, 1, 1)
+
+
+def tenant_ids(count: int) -> List[str]:
+    return [f"tenant-{i:03d}" for i in range(count)]
+
+
+def _rng(company_id: str, seed: int) -> random.Random:
+    digest = hashlib.sha256(f"{company_id}:{seed}".encode()).digest()
+    return random.Random(int.from_bytes(digest[:8], "big"))
+
+
+def inventory_documents(company_id: str, size: int, seed: int = 7) -> Dict[str, List[Dict[str, Any]]]:
+    """Mongo-shaped documents for one tenant: ``size`` products, size/2 raw materials, 2×size movements"""
+    rng = _rng(company_id, seed)
+
+    def stamps(i: int) -> Dict[str, datetime]:
+        created = EPOCH + timedelta(minutes=i)
+        return {"createdAt": created, "updatedAt": created + timedelta(minutes=rng.randint(0, 600))}
+
+    products = [{
+        "_id": f"{company_id}-p{i}",
+        "company": company_id,
+        "name": f"Producto {i} {rng.choice(CATEGORIES)}",
+        "stock": rng.randint(0, 500),
+        "stockMinimo": rng.randint(5, 60),
+        "precio": round(rng.uniform(5, 5000), 2),
+        "categoria": rng.choice(CATEGORIES),
+        **stamps(i)
+    } for i in range(size)]
+    raw_materials = [{
+        "_id": f"{company_id}-r{i}",
+        "company": company_id,
+        "name": f"Materia {i}",
+        "stock": rng.randint(0, 2000),
+        "stockMinimo": rng.randint(10, 200),
+        "precio": round(rng.uniform(1, 300), 2),
+        "proveedor": rng.choice(SUPPLIERS),
+        **stamps(i)
+    } for i in range(max(1, size // 2))]
+    movements = [{
+        "_id": f"{company_id}-m{i}",
+        "company": company_id,
+        "tipo": rng.choice(MOVEMENT_TYPES),
+        "productName": f"Producto {rng.randrange(max(1, size))}",
+        "cantidad": rng.randint(1, 100),
+        "fecha": EPOCH + timedelta(hours=i),
+        **stamps(i)
+    } for i in range(2 * size)]
+    return {"products": products, "rawmaterials": raw_materials, "movements": movements}
+
+
+def company_user(company_id: str) -> Dict[str, Any]:
+    return {
+        "_id": f"{company_id}-admin",
+        "company": company_id,
+        "role": "empresajefe",
+        "companyName": f"Empresa {company_id}",
+        "name": "Admin",
+        "email": f"admin@{company_id}.example",
+        "createdAt": EPOCH
+    }
+
+
+def inventory_payload(company_id: str, size: int, seed: int = 7) -> Dict[str, Any]:
+    """Body of the business backend's ``/api/companies/public/inventory/{company_id}``"""
+    documents = inventory_documents(company_id, size, seed)
+
+    def public(doc: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: (value.isoformat() if isinstance(value, datetime) else value) for key, value in doc.items()}
+
+    products = [public(doc) for doc in documents["products"]]
+    raw_materials = [public(doc) for doc in documents["rawmaterials"]]
+    items = products + raw_materials
+    return {
+        "success": True,
+        "company_name": f"Empresa {company_id}",
+        "products": products,
+        "raw_materials": raw_materials,
+        "statistics": {
+            "total_products": len(products),
+            "total_raw_materials": len(raw_materials),
+            "low_stock_items": sum(1 for item in items if item["stock"] <= item["stockMinimo"]),
+            "total_inventory_value": round(sum(item["stock"] * item["precio"] for item in items), 2)
+        }
+    }
+
+
+def invoices(company_id: str, count: int, seed: int = 7) -> List[Dict[str, Any]]:
+    """Invoice records as sent in ``invoice_data.data`` to ``/api/invoice-rag/query``"""
+    rng = _rng(company_id, seed + 1)
+    emisores = [f"Proveedor {i}" for i in range(12)]
+    receptores = [f"Cliente {i}" for i in range(25)]
+    records = []
+    for i in range(count):
+        subtotal = round(rng.uniform(100, 50000), 2)
+        iva = round(subtotal * 0.16, 2)
+        records.append({"invoiceData": {
+            "uuid": f"{rng.getrandbits(32):08x}-0000-4000-8000-{i:012d}",
+            "folio": f"F-{i}",
+            "serie": rng.choice("ABC"),
+            "fecha": (EPOCH + timedelta(days=rng.randint(0, 540))).strftime("%Y-%m-%d"),
+            "emisor_nombre": rng.choice(emisores),
+            "receptor_nombre": rng.choice(receptores),
+            "subtotal": subtotal,
+            "iva_trasladado": [{"importe": iva}],
+            "total": round(subtotal + iva, 2),
+            "moneda": rng.choice(CURRENCIES),
+            "uso_cfdi": "G03"
+        }})
+    return records
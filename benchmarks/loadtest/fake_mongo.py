@@ -0,0 +1,169 @@
+"""
+In-memory stand-in for the Motor database used by ``DataProcessorService``.
+
+Supports what the service issues: ``find`` with a projection and
+``batch_size`` (equality, ``$or``, ``$and``, ``$gt``, ``$gte``, ``$in`` and
+``$ne`` filters), ``count_documents``, ``find_one``, ``create_index`` and the
+inventory statistics aggregation.
+The aggregation is answered by computing the same facets in Python, not by
+interpreting the pipeline. An optional per-round-trip latency models the
+network hop to a real server.
+"""
+import asyncio
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.services.data_processor import TOMBSTONE_FIELDS
+
+from benchmarks.loadtest.data import company_user, inventory_documents
+
+
+def matches(document: Dict[str, Any], query: Dict[str, Any]) -> bool:
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(matches(document, branch) for branch in condition):
+                return False
+            continue
+        if key == "$and":
+            if not all(matches(document, branch) for branch in condition):
+                return False
+            continue
+        value = document.get(key)
+        if isinstance(condition, dict):
+            if "$gt" in condition and not (value is not None and value > condition["$gt"]):
+                return False
+            if "$gte" in condition and not (value is not None and value >= condition["$gte"]):
+                return False
+            if "$in" in condition and value not in condition["$in"]:
+                return False
+            if "$ne" in condition and value == condition["$ne"]:
+                return False
+        elif value != condition:
+            return False
+    return True
+
+
+class FakeCursor:
+    def __init__(self, documents: List[Dict[str, Any]], latency: float):
+        self.documents = documents
+        self.latency = latency
+        self._batch_size = 101
+        self.closed = False
+
+    def batch_size(self, size: int) -> "FakeCursor":
+        self._batch_size = max(1, size)
+        return self
+
+    async def __aiter__(self):
+        for i, document in enumerate(self.documents):
+            if i % self._batch_size == 0 and self.latency:
+                await asyncio.sleep(self.latency)
+            yield document
+
+    async def close(self) -> None:
+        self.closed = True
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict[str, Any]]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return list(self.documents[:length] if length else self.documents)
+
+
+class FakeCollection:
+    def __init__(self, name: str, database: "FakeDatabase"):
+        self.name = name
+        self.database = database
+        self.latency = database.latency
+        self.documents: List[Dict[str, Any]] = []
+        # Per-company lists keep a tenant's scan independent of other tenants
+        self._by_company: Dict[str, List[Dict[str, Any]]] = {}
+
+    def insert_many(self, documents: Iterable[Dict[str, Any]]) -> None:
+        for document in documents:
+            self.documents.append(document)
+            self._by_company.setdefault(document.get("company"), []).append(document)
+
+    def _scan(self, query: Dict[str, Any]) -> List[Dict[str, Any]]:
+        candidates = self._by_company.get(query["company"], []) if "company" in query else self.documents
+        return [document for document in candidates if matches(document, query)]
+
+    def find(self, query: Dict[str, Any], projection: Optional[Dict[str, int]] = None) -> FakeCursor:
+        found = self._scan(query)
+        if projection:
+            fields = set(projection) | {"_id"}
+            found = [{key: value for key, value in document.items() if key in fields} for document in found]
+        return FakeCursor(found, self.latency)
+
+    async def count_documents(self, query: Dict[str, Any]) -> int:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return len(self._scan(query))
+
+    async def find_one(self, query: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        found = self._scan(query)
+        return found[0] if found else None
+
+    def aggregate(self, pipeline: List[Dict[str, Any]]) -> FakeCursor:
+        if self.name != "products":
+            raise NotImplementedError(f"No aggregation on {self.name} in the fake database")
+        return self.database.inventory_statistics(pipeline)
+
+    async def create_index(self, keys, **kwargs) -> str:
+        return "_".join(f"{field}_{direction}" for field, direction in keys)
+
+
+class FakeDatabase:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self._collections: Dict[str, FakeCollection] = {}
+
+    def __getitem__(self, name: str) -> FakeCollection:
+        if name not in self._collections:
+            self._collections[name] = FakeCollection(name, self)
+        return self._collections[name]
+
+    def __getattr__(self, name: str) -> FakeCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    @classmethod
+    def seeded(cls, companies: List[str], size: int, seed: int = 7, latency: float = 0.0) -> "FakeDatabase":
+        db = cls(latency)
+        for company_id in companies:
+            for collection, documents in inventory_documents(company_id, size, seed).items():
+                db[collection].insert_many(documents)
+            db.users.insert_many([company_user(company_id)])
+        return db
+
+    def inventory_statistics(self, pipeline: List[Dict[str, Any]]) -> FakeCursor:
+        """Result of ``inventory_statistics_pipeline``, computed directly"""
+        company_id = pipeline[0]["$match"]["company"]
+        limit = next(stage["$limit"] for stage in pipeline[-1]["$facet"]["low_stock"] if "$limit" in stage)
+
+        def live(collection: str) -> List[Dict[str, Any]]:
+            return [doc for doc in self[collection]._by_company.get(company_id, [])
+                    if not any(doc.get(field) is True for field in TOMBSTONE_FIELDS)]
+
+        items = [(doc, "product") for doc in live("products")] + [(doc, "raw_material") for doc in live("rawmaterials")]
+        movements = live("movements")
+        low = sorted((item for item in items if (item[0].get("stock") or 0) <= (item[0].get("stockMinimo") or 0)),
+                     key=lambda item: ((item[0].get("stock") or 0), str(item[0]["_id"])))
+        values: Dict[str, float] = {}
+        for doc, kind in items:
+            values[kind] = values.get(kind, 0) + (doc.get("stock") or 0) * (doc.get("precio") or 0)
+        by_type: Dict[str, int] = {}
+        for doc in movements:
+            by_type[doc.get("tipo")] = by_type.get(doc.get("tipo"), 0) + 1
+        counts = {"product": sum(1 for _, kind in items if kind == "product"),
+                  "raw_material": sum(1 for _, kind in items if kind == "raw_material"),
+                  "movement": len(movements)}
+        return FakeCursor([{
+            "counts": [{"_id": kind, "count": count} for kind, count in counts.items() if count],
+            "inventory_value": [{"_id": kind, "value": value} for kind, value in values.items()],
+            "low_stock_count": [{"count": len(low)}] if low else [],
+            "low_stock": [{"id": str(doc["_id"]), "kind": kind, "name": doc.get("name"), "stock": doc.get("stock"),
+                           "stockMinimo": doc.get("stockMinimo")} for doc, kind in low[:limit]],
+            "movements_by_type": [{"_id": tipo, "count": count} for tipo, count in by_type.items()]
+        }], self.latency)
@@ -0,0 +1,129 @@
+"""
+Local stand-ins for the service's HTTP upstreams, served by one app:
+
+  POST /v1/embeddings                           OpenAI embeddings (float or base64)
+  POST /v1/chat/completions                     OpenAI chat, plain or streamed (SSE)
+  GET  /api/companies/public/inventory/{id}     business backend inventory payload
+
+Embeddings are deterministic per input text. Chat answers are emitted at a
+fixed token rate after a fixed time to first token. Inventory payloads are
+the same synthetic tenants the fake Mongo is seeded with.
+
+    python -m benchmarks.loadtest.fakes --port 9100 --embedding-latency-ms 20 --tokens-per-second 80
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import time
+from functools import lru_cache
+from typing import Any, Dict, List
+
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import Response, StreamingResponse
+
+from benchmarks.loadtest.data import inventory_payload
+
+
+def fake_embedding(text: str, dims: int) -> np.ndarray:
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dims).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def create_app(dims: int = 256, embedding_latency_ms: float = 20.0, chat_latency_ms: float = 300.0,
+               tokens_per_second: float = 80.0, completion_tokens: int = 60, backend_latency_ms: float = 30.0,
+               tenant_size: int = 200, seed: int = 7) -> FastAPI:
+    app = FastAPI(title="Axura benchmark upstreams")
+
+    @lru_cache(maxsize=None)
+    def inventory_body(company_id: str) -> bytes:
+        return json.dumps(inventory_payload(company_id, tenant_size, seed), ensure_ascii=False).encode("utf-8")
+
+    def completion_words(messages: List[Dict[str, Any]]) -> List[str]:
+        prompt = " ".join(str(m.get("content", "")) for m in messages)
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        return [f"palabra{digest[i % len(digest)]}{i} " for i in range(completion_tokens)]
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy"}
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        size = int(body.get("dimensions") or dims)
+        await asyncio.sleep(embedding_latency_ms / 1000)
+        data = []
+        for i, text in enumerate(inputs):
+            vector = fake_embedding(str(text), size)
+            encoded = (base64.b64encode(vector.astype("<f4").tobytes()).decode("ascii")
+                       if body.get("encoding_format") == "base64" else vector.tolist())
+            data.append({"object": "embedding", "index": i, "embedding": encoded})
+        tokens = sum(len(str(text).split()) for text in inputs)
+        return {"object": "list", "data": data, "model": body.get("model", "fake-embedding"),
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens}}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        words = completion_words(body.get("messages", []))[:int(body.get("max_tokens") or completion_tokens)]
+        created = int(time.time())
+        model = body.get("model", "fake-chat")
+
+        if not body.get("stream"):
+            await asyncio.sleep(chat_latency_ms / 1000 + len(words) / tokens_per_second)
+            return {
+                "id": "chatcmpl-bench", "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(words)},
+                             "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(words), "total_tokens": len(words)}
+            }
+
+        async def stream():
+            await asyncio.sleep(chat_latency_ms / 1000)
+            for word in words:
+                chunk = {"id": "chatcmpl-bench", "object": "chat.completion.chunk", "created": created,
+                         "model": model, "choices": [{"index": 0, "delta": {"content": word}, "finish_reason": None}]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(1 / tokens_per_second)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    @app.get("/api/companies/public/inventory/{company_id}")
+    async def inventory(company_id: str):
+        await asyncio.sleep(backend_latency_ms / 1000)
+        return Response(inventory_body(company_id), media_type="application/json")
+
+    return app
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--dims", type=int, default=256)
+    parser.add_argument("--embedding-latency-ms", type=float, default=20.0)
+    parser.add_argument("--chat-latency-ms", type=float, default=300.0, help="Time to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=80.0)
+    parser.add_argument("--completion-tokens", type=int, default=60)
+    parser.add_argument("--backend-latency-ms", type=float, default=30.0)
+    parser.add_argument("--tenant-size", type=int, default=200, help="Products per tenant")
+    parser.add_argument("--seed", type=int, default=7)
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=9100)
+    add_arguments(parser)
+    args = parser.parse_args()
+    app = create_app(args.dims, args.embedding_latency_ms, args.chat_latency_ms, args.tokens_per_second,
+                     args.completion_tokens, args.backend_latency_ms, args.tenant_size, args.seed)
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning", access_log=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""
+The app under test, with MongoDB replaced by a seeded in-memory database.
+
+OpenAI and the business backend are reached over HTTP; point them at the
+fakes with ``OPENAI_BASE_URL`` and ``BUSINESS_BACKEND_URL`` (bench_load does
+this). Settings are read from the environment at import time.
+
+    python -m benchmarks.loadtest.serve --port 9200 --tenants 4 --tenant-size 200
+"""
+import argparse
+
+from benchmarks.loadtest.data import tenant_ids
+from benchmarks.loadtest.fake_mongo import FakeDatabase
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=9200)
+    parser.add_argument("--tenants", type=int, default=4)
+    parser.add_argument("--tenant-size", type=int, default=200, help="Products per tenant")
+    parser.add_argument("--mongo-latency-ms", type=float, default=1.0, help="Per round trip")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    import app.main
+
+    app.main.services.data_processor.db = FakeDatabase.seeded(
+        tenant_ids(args.tenants), args.tenant_size, args.seed, latency=args.mongo_latency_ms / 1000
+    )
+    uvicorn.run(app.main.app, host="127.0.0.1", port=args.port, log_level="warning", access_log=False)
+
+
+if __name__ == "__main__":
+    main()
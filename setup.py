@@ -14,7 +14,7 @@ setup(
         "uvicorn[standard]==0.24.0",
         "python-multipart==0.0.6",
         "pydantic==2.5.0",
-        "openai==1.3.7",
+        "openai==1.10.0",
         "tiktoken==0.5.1",
         "chromadb==0.4.18",
         "langchain==0.0.350",
@@ -28,7 +28,7 @@ setup(
         "pymongo==4.6.0",
         "motor==3.3.2",
         "python-dotenv==1.0.0",
-        "httpx==0.25.2",
+        "httpx[http2]==0.25.2",
         "aiofiles==23.2.1"
     ],
     extras_require={
@@ -0,0 +1,126 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.services.business_backend import BusinessBackendClient
+from app.services.circuit_breaker import CircuitBreaker
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr("app.services.circuit_breaker.time.monotonic", clock)
+    return clock
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=30)
+    for _ in range(2):
+        assert breaker.allow_request()
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+
+
+def test_success_resets_failure_count(clock):
+    breaker = CircuitBreaker("test", failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_lets_one_trial_through(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+
+
+def test_trial_outcome_closes_or_reopens(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+
+    clock.now += 30
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow_request()
+
+
+def test_release_frees_the_trial_slot(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow_request()
+    breaker.release()
+    assert breaker.allow_request()
+
+
+def _client(handler) -> BusinessBackendClient:
+    client = BusinessBackendClient()
+    client.breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0)
+    client._client = httpx.AsyncClient(base_url="http://backend", transport=httpx.MockTransport(handler))
+    return client
+
+
+def test_unexpected_error_counts_as_failure_and_frees_trial():
+    def handler(request):
+        raise RuntimeError("protocol error")
+
+    client = _client(handler)
+    assert asyncio.run(client.get_company_inventory("acme")) is None
+    assert client.breaker.state == CircuitBreaker.HALF_OPEN
+    assert client.breaker.allow_request()
+
+
+def test_cancelled_trial_does_not_wedge_the_breaker():
+    started = asyncio.Event()
+
+    async def handler(request):
+        started.set()
+        await asyncio.sleep(60)
+
+    async def run():
+        client = _client(handler)
+        client.breaker.record_failure()
+        task = asyncio.create_task(client.get_company_inventory("acme"))
+        await started.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return client
+
+    client = asyncio.run(run())
+    assert client.breaker.allow_request()
+
+
+def test_server_errors_open_and_success_closes():
+    responses = iter([httpx.Response(503), httpx.Response(200, json={"success": True})])
+
+    def handler(request):
+        return next(responses)
+
+    client = _client(handler)
+    assert asyncio.run(client.get_company_inventory("acme")) is None
+    assert client.breaker.state == CircuitBreaker.HALF_OPEN
+    assert asyncio.run(client.get_company_inventory("acme")) == {"success": True}
+    assert client.breaker.state == CircuitBreaker.CLOSED
@@ -0,0 +1,136 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.services.container import ServiceContainer, _service
+
+
+class Container(ServiceContainer):
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+        self.builds = []
+
+    @_service
+    def slow(self):
+        self.builds.append("slow")
+        self.release.wait(5)
+        return "slow"
+
+    @_service
+    def fast(self):
+        self.builds.append("fast")
+        return "fast"
+
+
+def test_building_one_service_does_not_block_the_others():
+    container = Container()
+    builder = threading.Thread(target=lambda: container.slow)
+    builder.start()
+    while "slow" not in container.builds:
+        time.sleep(0.001)
+
+    started = time.perf_counter()
+    assert container.fast == "fast"
+    assert time.perf_counter() - started < 1
+    assert not container.built("slow")
+
+    container.release.set()
+    builder.join()
+    assert container.slow == "slow"
+    assert container.builds == ["slow", "fast"]
+
+
+def test_each_service_is_built_once_under_concurrent_access():
+    container = Container()
+    container.release.set()
+    threads = [threading.Thread(target=lambda: container.slow) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert container.builds == ["slow"]
+
+
+def test_start_once_shares_a_run_and_retries_after_a_failure():
+    container = ServiceContainer()
+    calls = []
+
+    async def start():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        if len(calls) == 1:
+            raise RuntimeError("mongo down")
+
+    async def scenario():
+        results = await asyncio.gather(container._start_once("x", start), container._start_once("x", start),
+                                       return_exceptions=True)
+        assert [type(r) for r in results] == [RuntimeError, RuntimeError]
+        await container._start_once("x", start)
+        await container._start_once("x", start)
+
+    asyncio.run(scenario())
+    assert len(calls) == 2
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_start():
+    container = ServiceContainer()
+    finished = []
+
+    async def start():
+        await asyncio.sleep(0.05)
+        finished.append(1)
+
+    async def scenario():
+        first = asyncio.ensure_future(container._start_once("x", start))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        await container._start_once("x", start)
+
+    asyncio.run(scenario())
+    assert finished == [1]
+
+
+def test_get_builds_off_the_event_loop():
+    container = Container()
+    builder = threading.Thread(target=lambda: container.slow)
+    builder.start()
+    while "slow" not in container.builds:
+        time.sleep(0.001)
+
+    async def scenario():
+        waiting = asyncio.ensure_future(container.get("slow"))
+        ticks = 0
+        while not waiting.done():
+            await asyncio.sleep(0.001)
+            ticks += 1
+            if ticks == 20:
+                container.release.set()  # only reachable if the loop kept running
+        return await waiting, ticks
+
+    service, ticks = asyncio.run(scenario())
+    assert service == "slow"
+    assert ticks >= 20
+    builder.join()
+    assert container.builds == ["slow"]
+
+
+def test_close_closes_the_mongo_client():
+    from app.services.data_processor import DataProcessorService
+
+    class Client:
+        closed = False
+
+        def close(self):
+            self.closed = True
+
+    container = ServiceContainer()
+    processor = DataProcessorService.__new__(DataProcessorService)
+    processor.client = Client()
+    container._instances["data_processor"] = processor
+    asyncio.run(container.close())
+    assert processor.client.closed
@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+
+from app.config.settings import settings
+from app.services.data_processor import (INVENTORY_PROJECTIONS, DataProcessorService,
+                                         inventory_statistics_pipeline)
+from benchmarks.loadtest.data import inventory_documents
+from benchmarks.loadtest.fake_mongo import FakeDatabase
+
+SIZE = 40
+
+
+@pytest.fixture
+def processor():
+    service = DataProcessorService.__new__(DataProcessorService)
+    service.db = FakeDatabase.seeded(["acme", "globex"], SIZE)
+    return service
+
+
+def collect(processor, collection, query=None, batch_size=None):
+    async def run():
+        return [batch async for batch in processor.iter_inventory_documents("acme", collection, query, batch_size)]
+    return asyncio.run(run())
+
+
+def test_documents_stream_in_bounded_batches_with_the_projection(processor):
+    batches = collect(processor, "products", batch_size=16)
+    assert [len(batch) for batch in batches] == [16, 16, 8]
+    documents = [doc for batch in batches for doc in batch]
+    assert {doc["company"] for doc in documents} == {"acme"}
+    allowed = set(INVENTORY_PROJECTIONS["products"]) | {"_id"}
+    assert all(set(doc) <= allowed for doc in documents)
+
+
+def test_soft_deleted_documents_are_skipped(processor):
+    products = processor.db["products"]._by_company["acme"]
+    products[0]["deleted"] = True
+    products[1]["isDeleted"] = True
+    documents = [doc for batch in collect(processor, "products") for doc in batch]
+    assert len(documents) == SIZE - 2
+    assert products[0]["_id"] not in {doc["_id"] for doc in documents}
+
+
+def test_query_narrows_the_stream(processor):
+    wanted = ["acme-p3", "acme-p7"]
+    documents = [doc for batch in collect(processor, "products", {"_id": {"$in": wanted}}) for doc in batch]
+    assert sorted(doc["_id"] for doc in documents) == wanted
+
+
+def test_statistics_match_the_seeded_documents(processor):
+    seeded = inventory_documents("acme", SIZE)
+    items = seeded["products"] + seeded["rawmaterials"]
+    low = [doc for doc in items if doc["stock"] <= doc["stockMinimo"]]
+
+    stats = asyncio.run(processor.get_inventory_statistics("acme", low_stock_limit=3))
+    assert (stats["total_products"], stats["total_raw_materials"], stats["total_movements"]) == (
+        len(seeded["products"]), len(seeded["rawmaterials"]), len(seeded["movements"]))
+    assert stats["low_stock_items"] == len(low)
+    assert len(stats["low_stock"]) == min(3, len(low))
+    assert [item["stock"] for item in stats["low_stock"]] == sorted(item["stock"] for item in stats["low_stock"])
+    assert stats["products_value"] == pytest.approx(sum(d["stock"] * d["precio"] for d in seeded["products"]))
+    assert stats["total_inventory_value"] == pytest.approx(sum(d["stock"] * d["precio"] for d in items))
+    assert sum(stats["movements_by_type"].values()) == len(seeded["movements"])
+    assert "error" not in stats
+
+
+def test_statistics_failure_returns_zeroes_with_the_error(processor):
+    def fail(pipeline):
+        raise RuntimeError("connection refused")
+
+    processor.db["products"].aggregate = fail
+    stats = asyncio.run(processor.get_inventory_statistics("acme"))
+    assert stats["total_products"] == 0
+    assert stats["error"] == "connection refused"
+
+
+def test_statistics_pipeline_is_one_company_scoped_facet():
+    pipeline = inventory_statistics_pipeline("acme", low_stock_limit=7)
+    assert pipeline[0]["$match"] == {"company": "acme", "deleted": {"$ne": True}, "isDeleted": {"$ne": True}}
+    unions = [stage["$unionWith"] for stage in pipeline if "$unionWith" in stage]
+    assert [union["coll"] for union in unions] == ["rawmaterials", "movements"]
+    assert all(union["pipeline"][0]["$match"]["company"] == "acme" for union in unions)
+    facet = pipeline[-1]["$facet"]
+    assert set(facet) == {"counts", "inventory_value", "low_stock_count", "low_stock", "movements_by_type"}
+    assert {"$limit": 7} in facet["low_stock"]
+    assert len(pipeline) == 5
+
+
+def test_mongo_batch_size_is_passed_to_the_cursor(processor, monkeypatch):
+    monkeypatch.setattr(settings, "mongo_batch_size", 13)
+    sizes = []
+    find = processor.db["products"].find
+
+    def recording_find(*args, **kwargs):
+        cursor = find(*args, **kwargs)
+        batch_size = cursor.batch_size
+
+        def record(size):
+            sizes.append(size)
+            return batch_size(size)
+
+        cursor.batch_size = record
+        return cursor
+
+    processor.db["products"].find = recording_find
+    collect(processor, "products")
+    assert sizes == [13]
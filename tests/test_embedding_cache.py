@@ -0,0 +1,87 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.services.embedding_cache import EmbeddingCache, embedding_cache_key
+
+DIMS = 8
+VECTOR_BYTES = DIMS * 4
+
+
+def vector(seed):
+    return np.random.default_rng(seed).standard_normal(DIMS).astype(np.float32).tolist()
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "cache" / "embeddings.sqlite3")
+
+
+def test_hits_and_misses(path):
+    cache = EmbeddingCache(path, memory_entries=10)
+
+    async def run():
+        await cache.put_many({"a": vector(1), "b": vector(2)})
+        return await cache.get_many(["a", "b", "c"])
+
+    found = asyncio.run(run())
+    assert sorted(found) == ["a", "b"]
+    np.testing.assert_array_equal(found["a"], np.asarray(vector(1), dtype=np.float32))
+    stats = cache.get_stats()
+    assert (stats["memory_hits"], stats["misses"], stats["disk_bytes"]) == (2, 1, 2 * VECTOR_BYTES)
+    cache.close()
+
+
+def test_reopened_cache_serves_from_disk(path):
+    first = EmbeddingCache(path)
+    asyncio.run(first.put_many({"a": vector(1)}))
+    first.close()
+
+    reopened = EmbeddingCache(path)
+    found = asyncio.run(reopened.get_many(["a"]))
+    np.testing.assert_array_equal(found["a"], np.asarray(vector(1), dtype=np.float32))
+    stats = reopened.get_stats()
+    assert (stats["disk_hits"], stats["disk_bytes"]) == (1, VECTOR_BYTES)
+    reopened.close()
+
+
+def test_least_recently_used_rows_are_evicted_past_the_budget(path):
+    cache = EmbeddingCache(path, max_bytes=10 * VECTOR_BYTES, memory_entries=0)
+
+    async def run():
+        for i in range(10):
+            await cache.put_many({f"k{i}": vector(i)})
+            await asyncio.sleep(0.001)  # distinct last_access times
+        await cache.get_many(["k0"])  # touched: now the most recently used
+        await asyncio.sleep(0.001)
+        await cache.put_many({"k10": vector(10)})
+        return await cache.get_many([f"k{i}" for i in range(11)])
+
+    found = asyncio.run(run())
+    stats = cache.get_stats()
+    assert stats["disk_bytes"] <= 9 * VECTOR_BYTES
+    assert stats["evictions"] == 2
+    assert "k0" in found and "k10" in found
+    assert "k1" not in found and "k2" not in found
+    cache.close()
+
+
+def test_failed_write_leaves_the_byte_count_unchanged(path):
+    cache = EmbeddingCache(path)
+    asyncio.run(cache.put_many({"a": vector(1)}))
+    # The second vector fails to encode after the first row is written
+    bad = [("b", np.asarray(vector(2), dtype=np.float32)), ("c", np.array(["not a number"]))]
+    with pytest.raises(ValueError):
+        cache._disk_put_many(bad)
+    assert cache.get_stats()["disk_bytes"] == VECTOR_BYTES
+    assert asyncio.run(cache.get_many(["b"])) == {}
+    cache.close()
+
+
+def test_key_depends_on_model_dimensions_and_text():
+    key = embedding_cache_key("text-embedding-3-large", None, "tornillo")
+    assert key == embedding_cache_key("text-embedding-3-large", 0, "tornillo")
+    assert key != embedding_cache_key("text-embedding-3-small", None, "tornillo")
+    assert key != embedding_cache_key("text-embedding-3-large", 256, "tornillo")
+    assert key != embedding_cache_key("text-embedding-3-large", None, "tornillos")
@@ -0,0 +1,125 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+from app.config.settings import settings
+from app.services import embeddings as embeddings_module
+from app.services.embeddings import EmbeddingService
+
+
+def api_error(error_class, status_code, body):
+    request = httpx.Request("POST", "https://api.openai.com/v1/embeddings")
+    response = httpx.Response(status_code, request=request)
+    return error_class(body.get("message", "error"), response=response, body=body)
+
+
+class FakeEmbeddingsAPI:
+    """``client.embeddings.create`` that rejects any batch containing a "BAD" input"""
+
+    def __init__(self):
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def create(self, input, **params):
+        self.calls.append(list(input))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            if any(text.startswith("BAD") for text in input):
+                raise api_error(openai.BadRequestError, 400,
+                                {"message": "'$.input' is invalid", "param": "input"})
+            return SimpleNamespace(data=[SimpleNamespace(index=i, embedding=[float(len(text)), 1.0])
+                                         for i, text in enumerate(input)])
+        finally:
+            self.in_flight -= 1
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(settings, "embedding_cache_enabled", False)
+    monkeypatch.setattr(settings, "embedding_batch_max_inputs", 4)
+    monkeypatch.setattr(settings, "embedding_max_concurrency", 2)
+    monkeypatch.setattr(settings, "embedding_max_retries", 0)
+    service = EmbeddingService()
+    service._client = SimpleNamespace(embeddings=FakeEmbeddingsAPI())
+    return service
+
+
+def test_results_align_with_inputs(service):
+    texts = ["uno", "", "dos", "uno", "  tres  "]
+    result = asyncio.run(service.generate_embeddings_batch(texts))
+    assert result == [[3.0, 1.0], None, [3.0, 1.0], [3.0, 1.0], [4.0, 1.0]]
+    assert sum(len(call) for call in service.client.embeddings.calls) == 3
+
+
+def test_bad_input_only_fails_itself(service):
+    texts = [f"texto {i}" for i in range(8)]
+    texts[5] = "BAD input"
+    result = asyncio.run(service.generate_embeddings_batch(texts))
+    assert result[5] is None
+    assert all(vector is not None for i, vector in enumerate(result) if i != 5)
+
+
+def test_tokens_counted_once_per_input(service, monkeypatch):
+    counted = []
+
+    def count(text, model=None):
+        counted.append(text)
+        return 1
+
+    monkeypatch.setattr(embeddings_module, "count_tokens", count)
+    texts = [f"texto {i}" for i in range(10)]
+    asyncio.run(service.generate_embeddings_batch(texts))
+    assert sorted(counted) == sorted(texts)
+
+
+def test_concurrency_is_bounded_across_callers(service):
+    async def run():
+        await asyncio.gather(*(service.generate_embeddings_batch([f"{c} {i}" for i in range(12)]) for c in "abc"))
+
+    asyncio.run(run())
+    api = service.client.embeddings
+    assert len(api.calls) == 9
+    assert api.max_in_flight <= settings.embedding_max_concurrency
+
+
+class FailingEmbeddingsAPI:
+    def __init__(self, error):
+        self.error = error
+        self.calls = 0
+
+    async def create(self, input, **params):
+        self.calls += 1
+        raise self.error
+
+
+def test_auth_error_fails_without_bisecting(service):
+    api = FailingEmbeddingsAPI(api_error(openai.AuthenticationError, 401, {"message": "Incorrect API key"}))
+    service._client = SimpleNamespace(embeddings=api)
+    result = asyncio.run(service.generate_embeddings_batch(["uno", "dos", "tres", "cuatro"]))
+    assert result == [None] * 4
+    assert api.calls == 1
+
+
+def test_unsupported_parameter_fails_without_bisecting(service):
+    error = api_error(openai.BadRequestError, 400,
+                      {"message": "This model does not support specifying dimensions.", "param": None})
+    api = FailingEmbeddingsAPI(error)
+    service._client = SimpleNamespace(embeddings=api)
+    asyncio.run(service.generate_embeddings_batch(["uno", "dos", "tres", "cuatro"]))
+    assert api.calls == 1
+
+
+def test_context_length_error_bisects(service):
+    error = api_error(openai.BadRequestError, 400,
+                      {"message": "maximum context length", "code": "context_length_exceeded"})
+    api = FailingEmbeddingsAPI(error)
+    service._client = SimpleNamespace(embeddings=api)
+    asyncio.run(service.generate_embeddings_batch(["uno", "dos", "tres", "cuatro"]))
+    # 4 -> 2 + 2 -> 1 + 1 + 1 + 1
+    assert api.calls == 7
@@ -0,0 +1,170 @@
+import asyncio
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+from app.services import index_jobs
+from app.services.index_jobs import FAILED, QUEUED, RUNNING, SUCCEEDED, IndexJob, IndexJobManager, JobStore
+
+
+class FakeIndexer:
+    def __init__(self):
+        self.runs = []
+        self.active = set()
+        self.overlap = False
+        self.gate = None
+
+    async def index_company(self, company_id, full=False, progress=None):
+        if company_id in self.active:
+            self.overlap = True
+        self.active.add(company_id)
+        self.runs.append((company_id, full))
+        try:
+            progress("products", {"status": "running"})
+            if self.gate is not None:
+                await self.gate.wait()
+            if company_id == "broken":
+                raise RuntimeError("mongo down")
+            return {"company_id": company_id}
+        finally:
+            self.active.discard(company_id)
+
+
+def test_job_store_round_trip_and_prune(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"), history=2)
+    jobs = [IndexJob(id=f"j{i}", company_id="acme", created_at=float(i),
+                     status=SUCCEEDED if i < 3 else RUNNING) for i in range(4)]
+    for job in jobs:
+        store.save(job)
+    store.prune()
+    store.close()
+
+    reopened = JobStore(str(tmp_path / "jobs.sqlite3"), history=2)
+    assert reopened.get("j0") is None  # oldest finished jobs pruned
+    assert reopened.get("j2").status == SUCCEEDED
+    assert [job.id for job in reopened.active()] == ["j3"]
+    reopened.close()
+
+
+def test_requests_coalesce_and_a_company_never_runs_twice(tmp_path):
+    indexer = FakeIndexer()
+
+    async def scenario():
+        indexer.gate = asyncio.Event()
+        manager = IndexJobManager(indexer, JobStore(str(tmp_path / "jobs.sqlite3")), workers=4)
+        await manager.start()
+        first = manager.enqueue("acme")
+        await asyncio.sleep(0.01)
+        assert first.status == RUNNING
+        # Requests while acme runs join one follow-up job
+        follow_up = manager.enqueue("acme")
+        assert manager.enqueue("acme", full=True) is follow_up
+        assert (follow_up.status, follow_up.requests, follow_up.full) == (QUEUED, 2, True)
+        indexer.gate.set()
+        await manager.wait(first.id, timeout=1)
+        done = await manager.wait(follow_up.id, timeout=1)
+        await manager.close()
+        return first, done
+
+    first, follow_up = asyncio.run(scenario())
+    assert (first.status, follow_up.status) == (SUCCEEDED, SUCCEEDED)
+    assert indexer.runs == [("acme", False), ("acme", True)]
+    assert not indexer.overlap
+    assert first.stages["products"] == {"status": "running"}
+
+
+def test_failed_jobs_are_recorded_and_unfinished_ones_resume_after_restart(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    indexer = FakeIndexer()
+
+    async def crash():
+        indexer.gate = asyncio.Event()
+        manager = IndexJobManager(indexer, JobStore(path), workers=1)
+        await manager.start()
+        broken = manager.enqueue("broken")
+        pending = manager.enqueue("acme")
+        await asyncio.sleep(0.01)
+        await manager.close()  # process stops with both jobs unfinished
+        return broken.id, pending.id
+
+    broken_id, pending_id = asyncio.run(crash())
+
+    async def restart():
+        manager = IndexJobManager(indexer, JobStore(path), workers=1)
+        await manager.start()
+        results = [await manager.wait(job_id, timeout=1) for job_id in (broken_id, pending_id)]
+        await manager.close()
+        return results
+
+    indexer.gate = None
+    broken, pending = asyncio.run(restart())
+    assert (broken.status, broken.error) == (FAILED, "mongo down")
+    assert pending.status == SUCCEEDED
+
+
+class RecordingStore(JobStore):
+    """Job store that records each written stage snapshot and the writing thread"""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.written = []
+        self.threads = set()
+
+    def save_rows(self, rows):
+        self.threads.add(threading.get_ident())
+        self.written.extend(json.loads(row[-1])["stages"] for row in rows)
+        super().save_rows(rows)
+
+
+def test_stage_progress_is_persisted_throttled_and_off_the_loop(tmp_path, monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr(index_jobs, "time", SimpleNamespace(time=time.time, monotonic=lambda: clock[0]))
+
+    class CountingIndexer:
+        async def index_company(self, company_id, full=False, progress=None):
+            progress("products", {"status": "running"})
+            for upserted in range(1, 7):
+                clock[0] += 0.5
+                progress("products", {"upserted": upserted})
+                await asyncio.sleep(0.01)  # let the writer drain
+            progress("products", {"status": "done"})
+            return {}
+
+    store = RecordingStore(str(tmp_path / "jobs.sqlite3"))
+
+    async def scenario():
+        manager = IndexJobManager(CountingIndexer(), store, workers=1, progress_interval=1.0)
+        await manager.start()
+        job = manager.enqueue("acme")
+        await manager.wait(job.id, timeout=1)
+        await manager.close()
+        return job.id
+
+    job_id = asyncio.run(scenario())
+    progress = [stages["products"] for stages in store.written if "products" in stages]
+    assert [stage.get("upserted") for stage in progress if stage["status"] == "running"] == [None, 2, 4, 6]
+    assert progress[-1] == {"status": "done", "upserted": 6}
+    assert threading.get_ident() not in store.threads
+
+    reopened = JobStore(str(tmp_path / "jobs.sqlite3"))
+    assert reopened.get(job_id).stages["products"] == {"status": "done", "upserted": 6}
+    reopened.close()
+
+
+def test_finished_job_is_readable_before_its_write_lands(tmp_path):
+    class SlowStore(JobStore):
+        def save_rows(self, rows):
+            time.sleep(0.05)
+            super().save_rows(rows)
+
+    async def scenario():
+        manager = IndexJobManager(FakeIndexer(), SlowStore(str(tmp_path / "jobs.sqlite3")), workers=1)
+        await manager.start()
+        job = manager.enqueue("acme")
+        done = await manager.wait(job.id, timeout=1)
+        status = manager.get(job.id).status
+        await manager.close()
+        return done.status, status
+
+    assert asyncio.run(scenario()) == (SUCCEEDED, SUCCEEDED)
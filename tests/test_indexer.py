@@ -0,0 +1,192 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from app.config.settings import settings
+from app.services import data_processor
+from app.services.data_processor import DataProcessorService
+from app.services.indexer import IncrementalIndexer, IndexStateStore
+from app.services.vector_backends.numpy_backend import NumpyBackend
+from app.services.vector_store import VectorStoreService
+from benchmarks.loadtest.fake_mongo import FakeDatabase
+
+
+def now():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class FakeEmbeddings:
+    async def generate_embeddings_batch(self, texts):
+        return [np.random.default_rng(abs(hash(t)) % 2**32).standard_normal(8).tolist() for t in texts]
+
+
+class Products:
+    """The fake database's ``products`` collection, with a list to edit and a read counter"""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.docs = []
+        self.reads = 0
+        find = collection.find
+
+        def counted_find(*args, **kwargs):
+            self.reads += 1
+            return find(*args, **kwargs)
+
+        collection.find = counted_find
+
+    def publish(self):
+        self.collection.documents, self.collection._by_company = [], {}
+        self.collection.insert_many(self.docs)
+
+
+def make_indexer(tmp_path):
+    processor = DataProcessorService.__new__(DataProcessorService)
+    processor.db = FakeDatabase()
+    store = VectorStoreService(FakeEmbeddings(), NumpyBackend(str(tmp_path / "vectors")))
+    indexer = IncrementalIndexer(processor, store, IndexStateStore(str(tmp_path / "state.json")))
+    return indexer, Products(processor.db["products"])
+
+
+def product(doc_id, stamp, **fields):
+    return {"_id": doc_id, "company": "acme", "name": f"Producto {doc_id}", "updatedAt": stamp, **fields}
+
+
+def sync(indexer, products):
+    products.publish()
+    return asyncio.run(indexer._sync_collection("acme", "products", False))
+
+
+def indexed_ids(indexer):
+    return sorted(asyncio.run(indexer.vector_store.get_document_ids("products", company_id="acme")))
+
+
+def count_diffs(indexer):
+    calls = []
+    original = indexer.data_processor.get_inventory_diff
+
+    async def spy(*args):
+        calls.append(args)
+        return await original(*args)
+
+    indexer.data_processor.get_inventory_diff = spy
+    return calls
+
+
+def test_watermark_does_not_skip_documents_stamped_by_a_lagging_clock(tmp_path):
+    indexer, products = make_indexer(tmp_path)
+    stamp = now()
+    # A writer whose clock runs ahead must not push the watermark past other writers
+    products.docs = [product("a", stamp + timedelta(hours=1)), product("b", stamp - timedelta(days=1))]
+    assert sync(indexer, products)["upserted"] == 2
+
+    products.docs.append(product("c", stamp))
+    result = sync(indexer, products)
+    assert result["mode"] == "incremental"
+    assert indexed_ids(indexer) == ["a", "b", "c"]
+
+
+def test_incremental_run_without_changes_reads_no_id_set(tmp_path):
+    indexer, products = make_indexer(tmp_path)
+    old = now() - timedelta(days=2)
+    products.docs = [product(str(i), old) for i in range(10)]
+    sync(indexer, products)
+    diffs = count_diffs(indexer)
+    products.reads = 0
+
+    result = sync(indexer, products)
+    assert (result["upserted"], result["deleted"], result["total"]) == (0, 0, 10)
+    assert diffs == []
+    assert products.reads == 2  # tombstones since the watermark, then the (empty) change stream
+
+
+def test_soft_deletes_are_found_by_the_tombstone_query(tmp_path):
+    indexer, products = make_indexer(tmp_path)
+    old = now() - timedelta(days=2)
+    products.docs = [product(str(i), old) for i in range(5)]
+    sync(indexer, products)
+    diffs = count_diffs(indexer)
+
+    products.docs[1] = product("1", now(), deleted=True)
+    result = sync(indexer, products)
+    assert result["deleted"] == 1
+    assert diffs == []
+    assert indexed_ids(indexer) == ["0", "2", "3", "4"]
+
+
+def test_count_mismatch_reconciles_hard_deletes_and_missing_documents(tmp_path):
+    indexer, products = make_indexer(tmp_path)
+    old = now() - timedelta(days=2)
+    products.docs = [product(str(i), old) for i in range(5)]
+    sync(indexer, products)
+    diffs = count_diffs(indexer)
+
+    del products.docs[0]  # hard delete
+    result = sync(indexer, products)
+    assert len(diffs) == 1
+    assert (result["upserted"], result["deleted"]) == (0, 1)
+
+    products.docs.append(product("late", old))  # older than the watermark, never indexed
+    result = sync(indexer, products)
+    assert len(diffs) == 2
+    assert (result["upserted"], result["deleted"]) == (1, 0)
+    assert indexed_ids(indexer) == ["1", "2", "3", "4", "late"]
+
+    # Counts agree again: the next run skips the id diff
+    sync(indexer, products)
+    assert len(diffs) == 2
+
+
+def test_reconcile_fetches_missing_documents_in_id_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_processor, "ID_QUERY_CHUNK", 3)
+    indexer, products = make_indexer(tmp_path)
+    old = now() - timedelta(days=2)
+    products.docs = [product("0", old)]
+    sync(indexer, products)
+
+    chunks = []
+    find = products.collection.find
+
+    def recording_find(query, projection=None):
+        if "_id" in query:
+            chunks.append(len(query["_id"]["$in"]))
+        return find(query, projection)
+
+    products.collection.find = recording_find
+    products.docs += [product(f"late-{i}", old) for i in range(8)]  # behind the watermark
+    result = sync(indexer, products)
+    assert result["upserted"] == 8
+    assert chunks == [3, 3, 2]
+    assert len(indexed_ids(indexer)) == 9
+
+
+def test_failed_upsert_stops_a_reader_blocked_on_a_full_queue(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "index_queue_size", 1)
+    indexer, _ = make_indexer(tmp_path)
+    closed = asyncio.Event()
+
+    async def batches():
+        try:
+            for i in range(100):
+                yield [product(str(i), now())]
+        finally:
+            closed.set()
+
+    async def fail(*args, **kwargs):
+        await asyncio.sleep(0.01)  # lets the reader fill the queue
+        return False
+
+    indexer.vector_store.add_documents = fail
+
+    async def run():
+        try:
+            await indexer._stream_upserts("acme", "products", batches())
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError("expected the failed upsert to raise")
+        assert [task for task in asyncio.all_tasks() if task is not asyncio.current_task()] == []
+        assert closed.is_set()
+
+    asyncio.run(asyncio.wait_for(run(), timeout=5))
@@ -0,0 +1,109 @@
+from datetime import date
+
+import pytest
+
+from app.services.invoice_analytics import InvoiceTable, answer_invoice_question, fold_text, parse_analytics_query
+
+TODAY = date(2024, 5, 20)
+
+
+def invoice(emisor, receptor, total, fecha="2024-05-10", moneda="MXN", uuid="", concepto=""):
+    return {"invoiceData": {"emisor_nombre": emisor, "receptor_nombre": receptor, "total": total,
+                            "subtotal": round(total / 1.16, 2), "fecha": fecha, "moneda": moneda, "uuid": uuid,
+                            "iva_trasladado": [{"importe": round(total - total / 1.16, 2)}], "concepto": concepto}}
+
+
+@pytest.fixture
+def table():
+    return InvoiceTable.from_invoices([
+        invoice("Walmart de México SAB de CV", "Mi Empresa SA de CV", 1000.0),
+        invoice("Walmart de México SAB de CV", "Mi Empresa SA de CV", 500.0, fecha="2024-04-02"),
+        invoice("Cadena Comercial OXXO SA de CV", "Mi Empresa SA de CV", 250.0, concepto="Gasolina"),
+        invoice("Comercial Mexicana SA de CV", "Mi Empresa SA de CV", 100.0),
+        invoice("Mi Empresa SA de CV", "Cliente Uno SA de CV", 4000.0),
+    ])
+
+
+def test_total_question_sums_every_invoice(table):
+    answer = answer_invoice_question("¿Cuál es el total facturado?", table, TODAY)
+    assert answer.query.operation == "sum"
+    assert answer.invoices_matched == 5
+    assert "$5,850.00 MXN" in answer.answer
+
+
+def test_emisor_named_by_one_word_filters_the_sum(table):
+    answer = answer_invoice_question("¿Cuánto me facturó Walmart este mes?", table, TODAY)
+    walmart = table.emisor_names.index("Walmart de México SAB de CV")
+    assert answer.query.filters == {"emisor": walmart}
+    assert answer.invoices_matched == 1
+    assert "$1,000.00 MXN" in answer.answer
+
+
+def test_partial_name_matches_by_prefix(table):
+    query = parse_analytics_query("¿Cuántas facturas tengo de Walm?", table, TODAY)
+    assert query.filters == {"emisor": table.emisor_names.index("Walmart de México SAB de CV")}
+
+
+def test_receptor_filter(table):
+    answer = answer_invoice_question("¿Cuánto le facturé a Cliente Uno?", table, TODAY)
+    assert answer.query.filters == {"receptor": table.receptor_names.index("Cliente Uno SA de CV")}
+    assert "$4,000.00 MXN" in answer.answer
+
+
+def test_single_invoice_question_goes_to_the_llm(table):
+    assert answer_invoice_question("¿Cuál es el total de la factura de Oxxo?", table, TODAY) is None
+
+
+def test_unresolved_concept_goes_to_the_llm(table):
+    assert answer_invoice_question("¿Cuánto gasté en facturas de gasolina?", table, TODAY) is None
+
+
+def test_unknown_name_goes_to_the_llm(table):
+    assert answer_invoice_question("¿Cuánto me facturó Soriana este mes?", table, TODAY) is None
+
+
+def test_ambiguous_name_goes_to_the_llm(table):
+    # "comercial" is in two emisor names
+    assert answer_invoice_question("¿Cuánto me facturó Comercial?", table, TODAY) is None
+
+
+def test_name_that_is_both_emisor_and_receptor_goes_to_the_llm(table):
+    assert answer_invoice_question("¿Cuánto facturó Mi Empresa?", table, TODAY) is None
+
+
+def test_top_emisores(table):
+    answer = answer_invoice_question("¿Quiénes son los 2 proveedores que más me facturaron?", table, TODAY)
+    assert answer.query.operation == "top"
+    assert answer.query.top_k == 2
+    lines = answer.answer.splitlines()
+    assert lines[2].startswith("1. **Mi Empresa SA de CV**")
+    assert lines[3].startswith("2. **Walmart de México SAB de CV**")
+
+
+def test_count_in_month(table):
+    answer = answer_invoice_question("¿Cuántas facturas tengo en abril?", table, TODAY)
+    assert answer.query.operation == "count"
+    assert answer.invoices_matched == 1
+
+
+def test_find_category_uses_words_not_full_labels(table):
+    assert table.find_category("emisor", fold_text("facturas de oxxo")) == \
+        table.emisor_names.index("Cadena Comercial OXXO SA de CV")
+    assert table.find_category("emisor", fold_text("facturas de comercial")) is None
+
+
+@pytest.mark.parametrize("question", [
+    "¿Cuál es el total del 31/02/2024 al 01/03/2024?",
+    "¿Cuál es el total del 2024-13-01 al 2024-14-01?",
+    "¿Cuál es el total del 2024-05-10 al 2024-04-01?",
+    "¿Cuál es el total de los últimos 0 días?",
+])
+def test_invalid_date_range_goes_to_the_llm(table, question):
+    assert parse_analytics_query(question, table, TODAY) is None
+    assert answer_invoice_question(question, table, TODAY) is None
+
+
+def test_valid_dmy_range_filters(table):
+    answer = answer_invoice_question("¿Cuál es el total del 01/04/2024 al 30/04/2024?", table, TODAY)
+    assert (answer.query.date_from, answer.query.date_to) == (date(2024, 4, 1), date(2024, 4, 30))
+    assert answer.invoices_matched == 1
@@ -0,0 +1,79 @@
+import asyncio
+import hashlib
+from datetime import date
+
+import numpy as np
+
+from app.services.invoice_analytics import InvoiceTable
+from app.services.invoice_retrieval import InvoiceRetriever
+
+UUID = "6f1c2a4e-0b3d-4c5e-8f7a-9b0c1d2e3f40"
+
+
+class FakeEmbeddings:
+    """Deterministic bag-of-words vectors, so similar texts score higher"""
+
+    def __init__(self):
+        self.calls = 0
+
+    @staticmethod
+    def _vector(text):
+        vector = np.zeros(64, dtype=np.float32)
+        for word in text.lower().split():
+            vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % 64] += 1
+        return vector.tolist()
+
+    async def generate_embedding(self, text):
+        self.calls += 1
+        return self._vector(text)
+
+    async def generate_embeddings_batch(self, texts):
+        self.calls += 1
+        return [self._vector(text) for text in texts]
+
+
+def invoices(n):
+    return [{"invoiceData": {"uuid": f"00000000-0000-0000-0000-{i:012d}", "folio": str(i),
+                             "emisor_nombre": "Gasolinera Uno" if i == 7 else f"Proveedor {i}",
+                             "receptor_nombre": "Mi Empresa", "total": 100.0 + i, "fecha": "2024-05-01",
+                             "moneda": "MXN"}} for i in range(n)]
+
+
+def test_uuid_filter_returns_the_matching_invoice():
+    data = invoices(30)
+    data[3]["invoiceData"]["uuid"] = UUID
+    result = asyncio.run(InvoiceRetriever(FakeEmbeddings()).retrieve(
+        f"Detalle de la factura {UUID.upper()}", InvoiceTable.from_invoices(data), top_k=5, today=date(2024, 5, 20)))
+    assert [s["uuid"] for s in result.summaries] == [UUID]
+    assert result.filters == {"uuid": [UUID]}
+
+
+def test_unknown_uuid_falls_back_to_similarity_ranking():
+    retriever = InvoiceRetriever(FakeEmbeddings())
+    result = asyncio.run(retriever.retrieve(
+        f"¿Cuánto pagué en la factura {UUID}?", InvoiceTable.from_invoices(invoices(30)), top_k=5, today=date(2024, 5, 20)))
+    assert len(result.summaries) == 5
+    assert result.method == "semantic"
+    assert result.candidates == 30
+
+
+def test_unknown_uuid_still_applies_other_filters():
+    result = asyncio.run(InvoiceRetriever(FakeEmbeddings()).retrieve(
+        f"Factura {UUID} de Gasolinera Uno", InvoiceTable.from_invoices(invoices(30)), top_k=5, today=date(2024, 5, 20)))
+    assert [s["emisor"] for s in result.summaries] == ["Gasolinera Uno"]
+
+
+def test_unknown_folio_falls_back_to_similarity_ranking():
+    result = asyncio.run(InvoiceRetriever(FakeEmbeddings()).retrieve(
+        "Factura con folio X-999", InvoiceTable.from_invoices(invoices(30)), top_k=5, today=date(2024, 5, 20)))
+    assert len(result.summaries) == 5
+    assert result.method == "semantic"
+
+
+def test_few_candidates_skip_embeddings():
+    embeddings = FakeEmbeddings()
+    result = asyncio.run(InvoiceRetriever(embeddings).retrieve(
+        "¿Qué facturas tengo?", InvoiceTable.from_invoices(invoices(3)), top_k=5, today=date(2024, 5, 20)))
+    assert result.method == "all"
+    assert len(result.summaries) == 3
+    assert embeddings.calls == 0
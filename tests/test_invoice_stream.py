@@ -0,0 +1,107 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app import main
+from app.config.settings import settings
+from app.services.invoice_retrieval import RetrievalResult
+
+PAYLOAD = {
+    "question": "¿Qué opinas de mis facturas?",
+    "company_id": "acme",
+    "invoice_data": {"data": [{"invoiceData": {"emisor_nombre": "Walmart", "total": 100.0, "uuid": "u1"}}]}
+}
+
+
+class FakeCompletion:
+    """Streaming completion that yields ``deltas`` and then, if ``stall``, never answers again"""
+
+    def __init__(self, deltas, stall=False):
+        self.deltas = list(deltas)
+        self.stall = stall
+        self.closed = False
+        self.cancelled = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.deltas:
+            return self.deltas.pop(0)
+        if not self.stall:
+            raise StopAsyncIteration
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+    async def aclose(self):
+        self.closed = True
+
+
+class FakeRequest:
+    """Client that disconnects once it has been asked ``connected_checks`` times"""
+
+    def __init__(self, connected_checks):
+        self.connected_checks = connected_checks
+        self.checks = 0
+
+    async def is_disconnected(self):
+        self.checks += 1
+        return self.checks > self.connected_checks
+
+
+def container(completion):
+    async def retrieve(question, table, top_k):
+        return RetrievalResult(summaries=[], method="all", candidates=0)
+
+    services = {
+        "invoice_retriever": SimpleNamespace(retrieve=retrieve),
+        "llm": SimpleNamespace(model="gpt-4o-mini", stream_chat_completion=lambda *args, **kwargs: completion)
+    }
+
+    async def get(name):
+        return services[name]
+
+    return SimpleNamespace(get=get)
+
+
+@pytest.fixture(autouse=True)
+def stream_settings(monkeypatch):
+    monkeypatch.setattr(settings, "openai_api_key", "sk-test")
+    monkeypatch.setattr(settings, "semantic_cache_enabled", False)
+    monkeypatch.setattr(main, "STREAM_DISCONNECT_POLL_SECONDS", 0.01)
+
+
+def collect(completion, request):
+    async def run():
+        response = await main.query_invoices_stream(PAYLOAD, request, container(completion))
+        return [event async for event in response.body_iterator]
+
+    return asyncio.run(asyncio.wait_for(run(), timeout=5))
+
+
+def test_stream_sends_tokens_metadata_and_done():
+    completion = FakeCompletion(["Hola", " mundo"])
+    events = collect(completion, FakeRequest(connected_checks=100))
+    assert [event.split("\n")[0] for event in events] == [
+        "event: token", "event: token", "event: metadata", "event: done"
+    ]
+    assert completion.closed
+
+
+def test_disconnect_between_deltas_stops_and_closes_the_upstream():
+    completion = FakeCompletion(["uno", "dos", "tres", "cuatro"])
+    events = collect(completion, FakeRequest(connected_checks=2))
+    assert events == [main._sse_event("token", {"content": "uno"}), main._sse_event("token", {"content": "dos"})]
+    assert completion.closed
+
+
+def test_disconnect_is_noticed_while_the_upstream_is_stalled():
+    completion = FakeCompletion(["uno"], stall=True)
+    events = collect(completion, FakeRequest(connected_checks=3))
+    assert events == [main._sse_event("token", {"content": "uno"})]
+    assert completion.cancelled
+    assert completion.closed
@@ -0,0 +1,98 @@
+import math
+
+import pytest
+
+from app.services.lexical_index import BM25Index, is_code, reciprocal_rank_fusion, stem, tokenize
+
+
+def index(documents):
+    built = BM25Index()
+    built.upsert(list(documents), list(documents.values()), [{"n": i} for i in range(len(documents))])
+    return built
+
+
+def test_tokenize_folds_accents_and_drops_stop_words():
+    assert tokenize("¿Cuántos TORNILLOS de acero inoxidable hay en el almacén?") == [
+        "tornill", "acer", "inoxidabl", "almacen"
+    ]
+
+
+def test_tokenize_keeps_codes_whole():
+    assert tokenize("Folio FAC-2024/001 y SKU AB12.C") == ["foli", "fac-2024/001", "sku", "ab12.c"]
+
+
+@pytest.mark.parametrize("word, expected", [
+    ("tornillos", "tornill"),
+    ("tornillo", "tornill"),
+    ("pinturas", "pintur"),
+    ("materiales", "material"),
+    ("proveedores", "proveedor"),
+    ("luces", "luc"),
+    ("sal", "sal"),  # short words are left alone
+    ("a4", "a4"),
+])
+def test_light_stemmer(word, expected):
+    assert stem(word) == expected
+
+
+def test_singular_and_plural_share_a_stem():
+    assert tokenize("pintura roja") == tokenize("pinturas rojas")
+
+
+def test_is_code():
+    assert is_code("ab12") and is_code("2024-001") and is_code("fac-2024/001")
+    assert not is_code("tornillo") and not is_code("2024")
+
+
+def test_bm25_scores_follow_the_formula():
+    built = index({"a": "tornillo acero", "b": "tornillo tornillo pintura", "c": "harina"})
+    hits = built.search("tornillo", k=5)
+    assert [hit.id for hit in hits] == ["b", "a"]
+
+    n_docs, df, avg_length = 3, 2, 6 / 3
+    idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+
+    def score(tf, length):
+        return idf * tf * 2.2 / (tf + 1.2 * (1 - 0.75 + 0.75 * length / avg_length))
+
+    assert hits[0].score == pytest.approx(score(2, 3))
+    assert hits[1].score == pytest.approx(score(1, 2))
+    assert hits[1].metadata == {"n": 0}
+
+
+def test_rare_terms_outweigh_common_ones():
+    built = index({"a": "tornillo acero", "b": "tornillo pintura", "c": "tornillo harina"})
+    assert built.search("tornillo harina", k=1)[0].id == "c"
+
+
+def test_upsert_replaces_and_remove_forgets():
+    built = index({"a": "tornillo acero", "b": "pintura roja"})
+    built.upsert(["a"], ["harina integral"])
+    assert built.search("tornillo") == []
+    assert built.search("harina")[0].id == "a"
+    built.remove(["a", "missing"])
+    assert len(built) == 1
+    assert built.search("harina") == []
+    assert "harin" not in built.postings
+    assert built.total_length == 2
+
+
+def test_exact_match_on_a_code():
+    built = index({"a": "Tornillo SKU AB-1234 acero", "b": "Tornillo SKU AB-9999 acero"})
+    hits = built.search("AB-1234", k=5)
+    assert built.is_exact("AB-1234", hits)
+
+
+def test_exact_match_needs_a_unique_document_with_every_term():
+    built = index({"a": "pintura roja mate", "b": "pintura azul mate", "c": "pintura roja brillante"})
+    assert built.is_exact("pintura azul", built.search("pintura azul"))
+    assert not built.is_exact("pintura roja", built.search("pintura roja"))  # two documents have both
+    assert not built.is_exact("pintura verde", built.search("pintura verde"))  # no document has both
+    assert not built.is_exact("de la", built.search("de la"))  # only stop words
+
+
+def test_reciprocal_rank_fusion():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "a"]], k=60)
+    assert [doc_id for doc_id, _ in fused] == ["a", "c", "b"]
+    assert dict(fused)["a"] == pytest.approx(1 / 61 + 1 / 62)
+    assert dict(fused)["b"] == pytest.approx(1 / 62)
@@ -0,0 +1,111 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+from app.config.settings import settings
+from app.services import retry as retry_module
+from app.services.llm import LLMService
+
+
+def rate_limited():
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    return openai.RateLimitError("rate limited", response=httpx.Response(429, request=request), body=None)
+
+
+class FakeStream:
+    def __init__(self, deltas):
+        self.deltas = deltas
+        self.closed = False
+
+    def __aiter__(self):
+        return self._chunks()
+
+    async def _chunks(self):
+        for delta in self.deltas:
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=delta))])
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeCompletions:
+    """Fails the first ``failures`` calls with a 429"""
+
+    def __init__(self, failures, stream):
+        self.failures = failures
+        self.stream = stream
+        self.calls = 0
+
+    async def create(self, **params):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise rate_limited()
+        if params.get("stream"):
+            return self.stream
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="ok"))])
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    monkeypatch.setattr(settings, "llm_max_concurrency", 1)
+    monkeypatch.setattr(settings, "llm_max_retries", 2)
+    service = LLMService()
+    service._client = SimpleNamespace(chat=SimpleNamespace(completions=FakeCompletions(1, FakeStream(["Hola", " mundo"]))))
+    return service
+
+
+@pytest.fixture
+def held_during_sleeps(monkeypatch, llm):
+    held = []
+
+    async def sleep(delay):
+        held.append(llm._semaphore.locked())
+
+    monkeypatch.setattr(retry_module, "asyncio", SimpleNamespace(sleep=sleep))
+    return held
+
+
+def test_completion_backoff_does_not_hold_a_slot(llm, held_during_sleeps):
+    assert asyncio.run(llm.chat_completion([{"role": "user", "content": "hola"}])) == "ok"
+    assert held_during_sleeps == [False]
+    assert not llm._semaphore.locked()
+
+
+def test_stream_backoff_does_not_hold_a_slot(llm, held_during_sleeps):
+    async def run():
+        deltas = []
+        async for delta in llm.stream_chat_completion([{"role": "user", "content": "hola"}]):
+            deltas.append(delta)
+            assert llm._semaphore.locked()  # held while the stream is open
+        return deltas
+
+    assert asyncio.run(run()) == ["Hola", " mundo"]
+    assert held_during_sleeps == [False]
+    assert not llm._semaphore.locked()
+    assert llm.client.chat.completions.stream.closed
+
+
+def test_stream_closed_early_releases_its_slot(llm, held_during_sleeps):
+    async def run():
+        stream = llm.stream_chat_completion([{"role": "user", "content": "hola"}])
+        assert await stream.__anext__() == "Hola"
+        await stream.aclose()
+
+    asyncio.run(run())
+    assert not llm._semaphore.locked()
+    assert llm.client.chat.completions.stream.closed
+
+
+def test_stream_that_never_opens_releases_its_slot(llm, held_during_sleeps):
+    llm.client.chat.completions.failures = 10
+
+    async def run():
+        async for _ in llm.stream_chat_completion([{"role": "user", "content": "hola"}]):
+            pass
+
+    with pytest.raises(openai.RateLimitError):
+        asyncio.run(run())
+    assert not llm._semaphore.locked()
@@ -0,0 +1,37 @@
+import json
+import logging
+import queue
+import sys
+
+from app.config.logging_config import JsonFormatter, NonBlockingQueueHandler
+
+
+def make_record(msg, args, exc_info=None, **extra):
+    record = logging.LogRecord("app.test", logging.WARNING, __file__, 1, msg, args, exc_info)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_prepare_snapshots_the_message_and_extra_fields():
+    handler = NonBlockingQueueHandler(queue.Queue())
+    items = ["a"]
+    payload = {"ids": ["x"]}
+    prepared = handler.prepare(make_record("items: %s", (items,), payload=payload))
+    items.append("b")
+    payload["ids"].append("y")
+
+    assert (prepared.msg, prepared.args) == ("items: ['a']", None)
+    line = json.loads(JsonFormatter().format(prepared))
+    assert line["message"] == "items: ['a']"
+    assert line["payload"] == {"ids": ["x"]}
+
+
+def test_prepare_renders_the_traceback():
+    handler = NonBlockingQueueHandler(queue.Queue())
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        prepared = handler.prepare(make_record("failed", (), sys.exc_info()))
+    assert prepared.exc_info is None
+    line = json.loads(JsonFormatter().format(prepared))
+    assert "ValueError: boom" in line["exception"]
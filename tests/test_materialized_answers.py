@@ -0,0 +1,44 @@
+import pytest
+
+from app.services.materialized_answers import IntentMatcher, MaterializedAnswers, build_company_facts
+
+
+def snapshot(statistics=None):
+    products = [{"name": f"Producto {i}", "stock": i, "stockMinimo": 3, "precio": 10.0} for i in range(5)]
+    raw_materials = [{"name": "Harina", "stock": 50, "stockMinimo": 10, "precio": 2.0}]
+    return {"success": True, "company_name": "Acme", "products": products, "raw_materials": raw_materials,
+            "statistics": statistics}
+
+
+def test_count_answers_use_the_same_totals_as_the_overview():
+    # Statistics computed in Mongo cover more items than the snapshot lists
+    facts = build_company_facts("acme", snapshot({"total_products": 120, "total_raw_materials": 7}))
+    assert "Total de productos: 120" in facts.answers[("overview", "products")][0]
+    assert "**Total de productos:** 120" in facts.answers[("count", "products")][0]
+    assert "**Total de materias primas:** 7" in facts.answers[("count", "raw_materials")][0]
+    assert "**Total de artículos:** 127" in facts.answers[("count", "all")][0]
+
+
+def test_counts_fall_back_to_the_listed_items():
+    facts = build_company_facts("acme", snapshot())
+    assert "**Total de productos:** 5" in facts.answers[("count", "products")][0]
+    assert "**Total de artículos:** 6" in facts.answers[("count", "all")][0]
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("¿Quiénes son mis principales proveedores?", ("suppliers", None)),
+    ("¿Cuáles son las mejores categorías?", ("categories", None)),
+    ("¿Cuáles son los productos principales?", ("top_stock", "products")),
+    ("Top materias primas", ("top_stock", "raw_materials")),
+    ("¿Qué proveedor tiene más stock?", ("top_stock", None)),
+])
+def test_entity_intents_take_precedence_over_ranking_words(question, expected):
+    assert IntentMatcher().match(question) == expected
+
+
+def test_principal_suppliers_get_the_supplier_breakdown():
+    answers = MaterializedAnswers()
+    facts = answers.materialize("acme", snapshot())
+    answer, _, intent = answers.answer(facts, "¿Quiénes son mis principales proveedores?")
+    assert intent == "suppliers"
+    assert "por proveedor" in answer
@@ -0,0 +1,154 @@
+import os
+import threading
+
+import numpy as np
+import pytest
+
+from app.services.vector_backends.numpy_backend import NumpyBackend
+
+
+def vectors(n, dims=32, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.standard_normal((n, dims)).astype(np.float32)
+
+
+def add(backend, n, start=0, tenant="acme", seed=0):
+    embeddings = vectors(n, seed=seed)
+    ids = [f"doc-{i}" for i in range(start, start + n)]
+    backend.add("products", tenant, [f"Producto {i}" for i in range(start, start + n)],
+                [{"type": "product", "i": i} for i in range(start, start + n)], ids, embeddings.tolist())
+    return ids, embeddings
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float16", "int8"])
+def test_search_returns_exact_top_k(tmp_path, dtype):
+    backend = NumpyBackend(str(tmp_path), storage_dtype=dtype, rescore_factor=8)
+    ids, embeddings = add(backend, 200)
+    normalized = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    queries = vectors(5, seed=1)
+    hits = backend.query("products", "acme", queries.tolist(), 10)
+    for query, row in zip(queries, hits):
+        expected = np.argsort(-(normalized @ (query / np.linalg.norm(query))))[:10]
+        assert [hit.id for hit in row] == [ids[i] for i in expected]
+
+
+def test_quantized_storage_reports_only_the_quantized_footprint(tmp_path):
+    full = NumpyBackend(str(tmp_path / "f32"), storage_dtype="float32")
+    int8 = NumpyBackend(str(tmp_path / "i8"), storage_dtype="int8")
+    add(full, 100)
+    add(int8, 100)
+    assert full.memory_bytes("products", "acme") == 100 * 32 * 4
+    assert full.full_precision_bytes("products", "acme") == 0
+    assert int8.memory_bytes("products", "acme") == 100 * 32 + 100 * 4  # int8 rows + per-row scales
+    assert int8.full_precision_bytes("products", "acme") == 100 * 32 * 4
+
+
+def test_float32_storage_is_memory_mapped_after_flush(tmp_path):
+    backend = NumpyBackend(str(tmp_path), storage_dtype="float32")
+    ids, _ = add(backend, 50)
+    backend.flush("products", "acme")
+    assert isinstance(backend._partition("products", "acme").snapshot.vectors, np.memmap)
+    reopened = NumpyBackend(str(tmp_path), storage_dtype="float32")
+    snapshot = reopened._partition("products", "acme").load().snapshot
+    assert isinstance(snapshot.vectors, np.memmap)
+    query = vectors(50)[7]
+    assert reopened.query("products", "acme", [query.tolist()], 1)[0][0].id == ids[7]
+    add(reopened, 10, start=50, seed=2)
+    assert reopened.count("products", "acme") == 60
+
+
+def test_float32_rows_stay_on_disk_when_quantized(tmp_path):
+    backend = NumpyBackend(str(tmp_path), storage_dtype="int8")
+    add(backend, 50)
+    backend.flush("products", "acme")
+    assert isinstance(backend._partition("products", "acme").snapshot.vectors, np.memmap)
+    reopened = NumpyBackend(str(tmp_path), storage_dtype="int8")
+    snapshot = reopened._partition("products", "acme").load().snapshot
+    assert isinstance(snapshot.vectors, np.memmap)
+    assert not isinstance(snapshot.stored.data, np.memmap)
+
+
+@pytest.mark.parametrize("dtype", ["float32", "int8"])
+def test_writes_reach_disk_only_on_flush(tmp_path, dtype):
+    backend = NumpyBackend(str(tmp_path), storage_dtype=dtype)
+    for start in range(0, 300, 100):
+        add(backend, 100, start=start, seed=start)
+    assert backend.count("products", "acme") == 300
+    assert not os.path.exists(tmp_path / "products" / "acme" / "records.json")
+
+    backend.flush("products", "acme")
+    reopened = NumpyBackend(str(tmp_path), storage_dtype=dtype)
+    assert reopened.ids("products", "acme") == [f"doc-{i}" for i in range(300)]
+    query = vectors(1, seed=100)[0]
+    assert [h.id for h in reopened.query("products", "acme", [query.tolist()], 5)[0]] == \
+        [h.id for h in backend.query("products", "acme", [query.tolist()], 5)[0]]
+
+
+@pytest.mark.parametrize("dtype", ["float32", "int8"])
+def test_upsert_replaces_existing_ids_and_delete_removes_them(tmp_path, dtype):
+    backend = NumpyBackend(str(tmp_path), storage_dtype=dtype)
+    add(backend, 20)
+    backend.flush("products", "acme")
+    target = vectors(1, seed=7)[0]
+    # The same id twice in one batch: the last occurrence wins
+    backend.add("products", "acme", ["old", "Nuevo 5"], [{"v": 1}, {"v": 2}], ["doc-5", "doc-5"],
+                [(-target).tolist(), target.tolist()])
+    assert backend.count("products", "acme") == 20
+    hit = backend.query("products", "acme", [target.tolist()], 1)[0][0]
+    assert (hit.id, hit.document, hit.metadata) == ("doc-5", "Nuevo 5", {"v": 2})
+
+    assert backend.delete("products", "acme", ["doc-5", "doc-6", "missing"]) == 2
+    assert backend.delete("products", "acme", ["doc-5"]) == 0
+    remaining = [f"doc-{i}" for i in range(20) if i not in (5, 6)]
+    assert backend.ids("products", "acme") == remaining
+    hits = backend.query("products", "acme", [target.tolist()], 18)[0]
+    assert sorted(h.id for h in hits) == sorted(remaining)
+    assert backend.query("products", "acme", [target.tolist()], 5, where={"i": 7})[0][0].id == "doc-7"
+
+    backend.flush("products", "acme")
+    assert NumpyBackend(str(tmp_path), storage_dtype=dtype).ids("products", "acme") == remaining
+
+
+def test_clear_discards_unflushed_writes(tmp_path):
+    backend = NumpyBackend(str(tmp_path))
+    add(backend, 10)
+    backend.clear("products", "acme")
+    backend.close()
+    assert not os.path.exists(tmp_path / "products" / "acme")
+    assert backend.count("products", "acme") == 0
+
+
+@pytest.mark.parametrize("dtype", ["float32", "int8"])
+def test_queries_during_writes_return_consistent_hits(tmp_path, dtype):
+    backend = NumpyBackend(str(tmp_path), storage_dtype=dtype)
+    add(backend, 100)
+    errors = []
+    done = threading.Event()
+
+    def write():
+        try:
+            for round_ in range(30):
+                add(backend, 50, start=100 + 50 * round_, seed=round_ + 1)
+                backend.delete("products", "acme", [f"doc-{100 + 50 * round_ + i}" for i in range(0, 50, 3)])
+        except Exception as e:
+            errors.append(e)
+        finally:
+            done.set()
+
+    def read():
+        queries = vectors(4, seed=99).tolist()
+        try:
+            while not done.is_set():
+                for row in backend.query("products", "acme", queries, 10):
+                    for hit in row:
+                        # Every hit pairs an id with its own document
+                        assert hit.document == f"Producto {hit.id[4:]}"
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write)] + [threading.Thread(target=read) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
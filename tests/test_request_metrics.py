@@ -0,0 +1,45 @@
+import asyncio
+import time
+
+import httpx
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+
+from app.main import RequestMetricsMiddleware
+from app.services.metrics import metrics
+
+
+def test_streamed_requests_are_timed_until_the_last_chunk(monkeypatch):
+    finished = []
+    original = metrics.finish_request
+
+    def record(trace, token, seconds, method, status):
+        finished.append((trace.endpoint, dict(trace.stages), seconds, status))
+        original(trace, token, seconds, method, status)
+
+    monkeypatch.setattr(metrics, "finish_request", record)
+    app = FastAPI()
+    app.add_middleware(RequestMetricsMiddleware)
+
+    @app.get("/stream/{name}")
+    async def stream(name: str):
+        async def events():
+            with metrics.stage("llm"):
+                for _ in range(3):
+                    await asyncio.sleep(0.05)
+                    yield "data: x\n\n"
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    async def fetch():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return (await client.get("/stream/a")).text
+
+    started = time.perf_counter()
+    assert asyncio.run(fetch()).count("data: x") == 3
+    elapsed = time.perf_counter() - started
+
+    [(endpoint, stages, seconds, status)] = finished
+    assert (endpoint, status) == ("/stream/{name}", 200)
+    assert stages["llm"] >= 0.15
+    assert 0.15 <= seconds <= elapsed
@@ -0,0 +1,96 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+from app.services import retry as retry_module
+from app.services.retry import backoff_delay, is_retryable_openai_error, retry_async
+
+REQUEST = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+
+
+def status_error(error_class, status_code, headers=None):
+    response = httpx.Response(status_code, request=REQUEST, headers=headers)
+    return error_class("error", response=response, body=None)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    recorded = []
+
+    async def sleep(delay):
+        recorded.append(delay)
+
+    monkeypatch.setattr(retry_module, "asyncio", SimpleNamespace(sleep=sleep))
+    return recorded
+
+
+def failing(*errors, result="ok"):
+    calls = []
+
+    async def operation():
+        calls.append(len(calls))
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return result
+
+    return operation, calls
+
+
+def test_backoff_is_full_jitter_up_to_the_capped_exponential(monkeypatch):
+    bounds = []
+    monkeypatch.setattr(retry_module.random, "uniform", lambda low, high: bounds.append((low, high)) or high)
+    assert [backoff_delay(attempt, 0.5, 3.0) for attempt in range(5)] == [0.5, 1.0, 2.0, 3.0, 3.0]
+    assert all(low == 0 for low, _ in bounds)
+
+
+@pytest.mark.parametrize("error, retryable", [
+    (status_error(openai.RateLimitError, 429), True),
+    (status_error(openai.InternalServerError, 500), True),
+    (status_error(openai.InternalServerError, 503), True),
+    (openai.APIConnectionError(request=REQUEST), True),
+    (openai.APITimeoutError(request=REQUEST), True),
+    (status_error(openai.AuthenticationError, 401), False),
+    (status_error(openai.BadRequestError, 400), False),
+    (status_error(openai.NotFoundError, 404), False),
+    (ValueError("not an API error"), False),
+])
+def test_retryable_errors(error, retryable):
+    assert is_retryable_openai_error(error) is retryable
+
+
+def test_retries_until_success(sleeps):
+    operation, calls = failing(status_error(openai.RateLimitError, 429), status_error(openai.InternalServerError, 502))
+    assert asyncio.run(retry_async(operation, max_retries=3, base_delay=0.1, max_delay=1.0)) == "ok"
+    assert len(calls) == 3
+    assert len(sleeps) == 2
+    assert 0 <= sleeps[0] <= 0.1 and 0 <= sleeps[1] <= 0.2
+
+
+def test_retry_after_is_the_minimum_wait_capped_at_max_delay(sleeps):
+    operation, _ = failing(status_error(openai.RateLimitError, 429, {"retry-after": "2"}),
+                           status_error(openai.RateLimitError, 429, {"retry-after": "60"}),
+                           status_error(openai.RateLimitError, 429, {"retry-after": "soon"}))
+    asyncio.run(retry_async(operation, max_retries=3, base_delay=0.01, max_delay=8.0))
+    assert sleeps[0] == 2.0
+    assert sleeps[1] == 8.0
+    assert sleeps[2] <= 0.04  # unparseable header: plain backoff
+
+
+def test_non_retryable_error_is_raised_at_once(sleeps):
+    operation, calls = failing(status_error(openai.AuthenticationError, 401))
+    with pytest.raises(openai.AuthenticationError):
+        asyncio.run(retry_async(operation, max_retries=3))
+    assert len(calls) == 1
+    assert sleeps == []
+
+
+def test_last_error_is_raised_when_retries_run_out(sleeps):
+    errors = [status_error(openai.RateLimitError, 429) for _ in range(4)]
+    operation, calls = failing(*errors)
+    with pytest.raises(openai.RateLimitError) as raised:
+        asyncio.run(retry_async(operation, max_retries=2, base_delay=0.01))
+    assert raised.value is errors[2]
+    assert len(calls) == 3
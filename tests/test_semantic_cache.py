@@ -0,0 +1,141 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.services import semantic_cache as semantic_cache_module
+from app.services.semantic_cache import SemanticAnswerCache, invoice_fingerprint, normalize_question
+
+# Unit vectors by normalized question; the cosine of the first two is 0.96
+VECTORS = {
+    "cuanto gaste en walmart": [1.0, 0.0, 0.0],
+    "cuanto dinero gaste en walmart": [0.96, 0.28, 0.0],
+    "cual es mi proveedor principal": [0.0, 0.0, 1.0],
+}
+
+
+class FakeEmbeddings:
+    def __init__(self):
+        self.calls = []
+
+    async def generate_embedding(self, text):
+        self.calls.append(text)
+        return VECTORS.get(text)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(semantic_cache_module, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def cache(clock):
+    return SemanticAnswerCache(FakeEmbeddings(), threshold=0.92, ttl=60)
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def store(cache, question, response, company="acme", fingerprint="f1"):
+    run(cache.store(company, "invoice", question, response, latency=1.5, fingerprint=fingerprint))
+
+
+def lookup(cache, question, company="acme", fingerprint="f1"):
+    return run(cache.lookup(company, "invoice", question, fingerprint))[0]
+
+
+def test_normalized_question_is_an_exact_hit_without_embedding(cache):
+    store(cache, "¿Cuánto gasté en Walmart?", "mucho")
+    cache.embedding_service.calls.clear()
+    assert lookup(cache, "cuanto GASTE en walmart") == "mucho"
+    assert cache.embedding_service.calls == []
+    assert cache.get_stats()["exact_hits"] == 1
+
+
+def test_similar_question_above_the_threshold_is_a_hit(cache):
+    store(cache, "¿Cuánto gasté en Walmart?", "mucho")
+    assert lookup(cache, "¿Cuánto dinero gasté en Walmart?") == "mucho"
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["exact_hits"]) == (1, 0)
+    assert stats["saved_latency_seconds"] == pytest.approx(1.5)
+
+
+def test_question_below_the_threshold_is_a_miss(cache):
+    cache.threshold = 0.97
+    store(cache, "¿Cuánto gasté en Walmart?", "mucho")
+    assert lookup(cache, "¿Cuánto dinero gasté en Walmart?") is None
+    assert lookup(cache, "¿Cuál es mi proveedor principal?") is None
+    assert cache.get_stats()["misses"] == 2
+
+
+def test_changed_invoice_fingerprint_is_a_miss_and_drops_the_entry(cache):
+    store(cache, "¿Cuánto gasté en Walmart?", "mucho", fingerprint="f1")
+    assert lookup(cache, "¿Cuánto gasté en Walmart?", fingerprint="f2") is None
+    assert lookup(cache, "¿Cuánto dinero gasté en Walmart?", fingerprint="f1") is None  # the stale entry is gone
+    assert cache.get_stats()["stale"] == 1
+    assert cache.get_stats()["entries"] == 0
+
+
+def test_entries_expire_after_the_ttl(cache, clock):
+    store(cache, "¿Cuánto gasté en Walmart?", "mucho")
+    clock.now += 59
+    assert lookup(cache, "¿Cuánto dinero gasté en Walmart?") == "mucho"
+    clock.now += 2
+    assert lookup(cache, "¿Cuánto dinero gasté en Walmart?") is None
+    assert lookup(cache, "¿Cuánto gasté en Walmart?") is None
+    assert cache.get_stats()["stale"] == 1
+
+
+def test_companies_do_not_share_answers(cache):
+    store(cache, "¿Cuánto gasté en Walmart?", "acme", company="acme")
+    assert lookup(cache, "¿Cuánto gasté en Walmart?", company="globex") is None
+    assert lookup(cache, "¿Cuánto dinero gasté en Walmart?", company="globex") is None
+
+    store(cache, "¿Cuánto gasté en Walmart?", "globex", company="globex")
+    assert lookup(cache, "¿Cuánto gasté en Walmart?", company="acme") == "acme"
+    assert lookup(cache, "¿Cuánto dinero gasté en Walmart?", company="globex") == "globex"
+
+    assert cache.invalidate("acme") == 1
+    assert lookup(cache, "¿Cuánto gasté en Walmart?", company="acme") is None
+    assert lookup(cache, "¿Cuánto gasté en Walmart?", company="globex") == "globex"
+
+
+def test_lookup_vector_is_reused_by_store(cache):
+    response, vector = run(cache.lookup("acme", "invoice", "¿Cuánto gasté en Walmart?", "f1"))
+    assert response is None
+    assert np.linalg.norm(vector) == pytest.approx(1.0)
+    run(cache.store("acme", "invoice", "¿Cuánto gasté en Walmart?", "mucho", latency=1.0,
+                    fingerprint="f1", vector=vector))
+    assert cache.embedding_service.calls == ["cuanto gaste en walmart"]
+
+
+def test_per_company_and_global_limits_evict_least_recently_used(clock):
+    cache = SemanticAnswerCache(FakeEmbeddings(), ttl=60, max_entries=2, max_entries_per_company=1)
+    store(cache, "¿Cuánto gasté en Walmart?", "uno")
+    store(cache, "¿Cuál es mi proveedor principal?", "dos")
+    assert lookup(cache, "¿Cuánto gasté en Walmart?") is None
+    assert lookup(cache, "¿Cuál es mi proveedor principal?") == "dos"
+
+    store(cache, "¿Cuánto gasté en Walmart?", "globex", company="globex")
+    store(cache, "¿Cuánto gasté en Walmart?", "initech", company="initech")
+    assert lookup(cache, "¿Cuál es mi proveedor principal?") is None
+    assert cache.get_stats()["entries"] == 2
+    assert cache.get_stats()["evictions"] == 2
+
+
+def test_fingerprint_ignores_invoice_order():
+    invoices = [{"invoiceData": {"uuid": "a", "total": 10}}, {"invoiceData": {"uuid": "b", "total": 20}}]
+    assert invoice_fingerprint(invoices) == invoice_fingerprint(invoices[::-1])
+    assert invoice_fingerprint(invoices) != invoice_fingerprint(invoices[:1])
+    assert normalize_question("  ¿Cuánto   gasté? ") == "cuanto gaste"
@@ -0,0 +1,123 @@
+import asyncio
+import types
+
+import pytest
+
+from app.services.snapshot_cache import SnapshotCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    # Only the cache's clock: the event loop keeps real time
+    monkeypatch.setattr("app.services.snapshot_cache.time", types.SimpleNamespace(monotonic=clock.monotonic))
+    return clock
+
+
+class Loader:
+    def __init__(self, fail=False):
+        self.calls = 0
+        self.fail = fail
+        self.release = None
+
+    async def __call__(self, key):
+        self.calls += 1
+        if self.release is not None:
+            await self.release.wait()
+        return None if self.fail else f"{key}-{self.calls}"
+
+
+def test_concurrent_misses_share_one_load(clock):
+    loader = Loader()
+
+    async def scenario():
+        loader.release = asyncio.Event()
+        cache = SnapshotCache(loader, ttl=30, stale_ttl=300)
+        pending = asyncio.gather(*(cache.get("acme") for _ in range(5)))
+        await asyncio.sleep(0)
+        loader.release.set()
+        return cache, await pending
+
+    cache, values = asyncio.run(scenario())
+    assert values == ["acme-1"] * 5
+    assert loader.calls == 1
+    assert cache.get_stats()["coalesced"] == 4
+
+
+def test_stale_entry_is_served_while_one_refresh_runs(clock):
+    loader = Loader()
+
+    async def scenario():
+        cache = SnapshotCache(loader, ttl=30, stale_ttl=300)
+        assert await cache.get("acme") == "acme-1"
+        clock.now += 60
+        loader.release = asyncio.Event()
+        # Stale reads return at once and start a single background refresh
+        assert [await cache.get("acme") for _ in range(3)] == ["acme-1"] * 3
+        await asyncio.sleep(0)
+        assert loader.calls == 2
+        loader.release.set()
+        await asyncio.sleep(0.01)
+        assert await cache.get("acme") == "acme-2"
+        return cache
+
+    stats = asyncio.run(scenario()).get_stats()
+    assert (stats["stale_hits"], stats["refreshes"], stats["hits"]) == (3, 1, 1)
+
+
+def test_failures_are_not_cached_and_keep_the_expired_entry(clock):
+    loader = Loader()
+
+    async def scenario():
+        cache = SnapshotCache(loader, ttl=30, stale_ttl=60)
+        assert await cache.get("acme") == "acme-1"
+        clock.now += 120
+        loader.fail = True
+        assert await cache.get("acme") == "acme-1"  # expired, but better than nothing
+        assert await cache.get("other") is None
+        loader.fail = False
+        assert await cache.get("other") == "other-4"
+
+    asyncio.run(scenario())
+    assert loader.calls == 4
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_load(clock):
+    loader = Loader()
+
+    async def scenario():
+        loader.release = asyncio.Event()
+        cache = SnapshotCache(loader)
+        first = asyncio.ensure_future(cache.get("acme"))
+        second = asyncio.ensure_future(cache.get("acme"))
+        await asyncio.sleep(0)
+        first.cancel()
+        loader.release.set()
+        return await second
+
+    assert asyncio.run(scenario()) == "acme-1"
+    assert loader.calls == 1
+
+
+def test_least_recently_used_company_is_evicted(clock):
+    loader = Loader()
+    loaded = []
+
+    async def scenario():
+        cache = SnapshotCache(loader, max_entries=2, on_load=lambda key, value: loaded.append(value))
+        for key in ("a", "b", "a", "c"):
+            await cache.get(key)
+        await cache.get("b")
+        return cache
+
+    cache = asyncio.run(scenario())
+    assert loaded == ["a-1", "b-2", "c-3", "b-4"]
+    assert cache.get_stats()["evictions"] == 2
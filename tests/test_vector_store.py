@@ -0,0 +1,140 @@
+import asyncio
+import time
+
+import numpy as np
+
+from app.config.settings import settings
+from app.services.vector_backends import SHARED_TENANT, create_backend, tenant_key
+from app.services.vector_backends.base import is_tenant_key
+from app.services.vector_backends.numpy_backend import NumpyBackend
+from app.services.vector_store import VectorStoreService
+
+
+class AxisEmbeddings:
+    """Each known word is one axis, so similarity counts shared words"""
+
+    WORDS = ["tornillo", "acero", "pintura", "roja", "harina", "entrada", "salida"]
+
+    def _vector(self, text):
+        vector = np.zeros(len(self.WORDS), dtype=np.float32)
+        for word in text.lower().split():
+            if word in self.WORDS:
+                vector[self.WORDS.index(word)] += 1
+        vector[-1] += 0.01  # never all zeros
+        return vector.tolist()
+
+    async def generate_embedding(self, text):
+        return self._vector(text)
+
+    async def generate_embeddings_batch(self, texts):
+        return [self._vector(text) for text in texts]
+
+
+def make_store(tmp_path):
+    store = VectorStoreService(AxisEmbeddings(), NumpyBackend(str(tmp_path)))
+
+    async def fill():
+        await store.add_documents("products", ["tornillo acero", "pintura roja"], [{"n": 1}, {"n": 2}],
+                                  ["p1", "p2"], company_id="acme")
+        await store.add_documents("raw_materials", ["acero", "harina"], [{"n": 3}, {"n": 4}],
+                                  ["r1", "r2"], company_id="acme")
+        await store.add_documents("products", ["acero"], [{"n": 5}], ["p1"], company_id="other")
+
+    asyncio.run(fill())
+    return store
+
+
+def test_search_many_merges_collections_of_one_company(tmp_path):
+    store = make_store(tmp_path)
+    results = asyncio.run(store.search_many(AxisEmbeddings()._vector("acero"), n_results=2, threshold=0.5,
+                                            company_id="acme"))
+    assert [(r["collection"], r["metadata"]["n"]) for r in results] == [("raw_materials", 3), ("products", 1)]
+    store.close()
+
+
+def test_hybrid_search_fuses_lexical_and_vector_hits_across_collections(tmp_path):
+    store = make_store(tmp_path)
+    # No document holds both words, so the lexical side is not exact and vectors are searched
+    result = asyncio.run(store.hybrid_search("acero roja", n_results=3, company_id="acme"))
+    assert result["method"] == "hybrid"
+    found = {(r["collection"], r["metadata"]["n"]) for r in result["results"]}
+    assert found == {("products", 1), ("products", 2), ("raw_materials", 3)}
+    assert all("similarity" in r for r in result["results"])
+    store.close()
+
+
+def test_tenant_keys_keep_similar_company_ids_apart():
+    keys = {tenant_key(company) for company in ["acme.mx", "acme_mx", "acme mx", "ACME.mx"]}
+    assert len(keys) == 4
+    assert all(is_tenant_key(key) for key in keys)
+    assert tenant_key("x" * 200) == tenant_key("x" * 200)
+    assert len(f"inventory_movements__{tenant_key('x' * 200)}") <= 63
+    assert tenant_key(None) == SHARED_TENANT
+
+
+def test_numpy_backend_drops_earlier_layouts(tmp_path):
+    legacy = tmp_path / "products"
+    (legacy / "acme").mkdir(parents=True)
+    (legacy / "vectors.npy").write_bytes(b"")
+    backend = NumpyBackend(str(tmp_path))
+    backend.add("products", tenant_key("acme"), ["doc"], [{}], ["d1"], [[1.0, 0.0]])
+    backend.flush("products", tenant_key("acme"))
+    assert sorted(backend.legacy_storage()) == ["products/acme", "products/vectors.npy"]
+    assert (legacy / "acme").is_dir()
+    assert sorted(backend.drop_legacy()) == ["products/acme", "products/vectors.npy"]
+    assert not (legacy / "acme").exists()
+    assert backend.tenants("products") == [tenant_key("acme")]
+
+
+def test_create_backend_only_lists_legacy_storage_by_default(tmp_path, monkeypatch):
+    (tmp_path / "products" / "acme").mkdir(parents=True)
+    monkeypatch.setattr(settings, "numpy_vector_directory", str(tmp_path))
+    create_backend("numpy")
+    assert (tmp_path / "products" / "acme").is_dir()
+    monkeypatch.setattr(settings, "vector_drop_legacy_storage", True)
+    create_backend("numpy")
+    assert not (tmp_path / "products" / "acme").exists()
+
+
+def test_concurrent_first_searches_build_the_lexical_index_once(tmp_path):
+    store = make_store(tmp_path)
+    calls = []
+    documents = store.backend.documents
+
+    def slow_documents(*args):
+        calls.append(args)
+        snapshot = documents(*args)
+        time.sleep(0.05)
+        return snapshot
+
+    store.backend.documents = slow_documents
+
+    async def run():
+        searches = [asyncio.create_task(store.lexical_search("products", "harina", company_id="acme"))
+                    for _ in range(3)]
+        await asyncio.sleep(0.01)  # the build is running
+        await store.add_documents("products", ["harina integral"], [{"n": 6}], ["p3"], company_id="acme")
+        return await asyncio.gather(*searches)
+
+    results = asyncio.run(run())
+    assert calls == [("products", tenant_key("acme"))]
+    # The write that landed during the build is in the index
+    hits, _ = asyncio.run(store.lexical_search("products", "harina", company_id="acme"))
+    assert [hit.id for hit in hits] == ["p3"]
+    assert len(results) == 3
+    store.close()
+
+
+def test_lexical_indexes_are_evicted_least_recently_used_first(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "lexical_index_max_entries", 2)
+    store = make_store(tmp_path)
+
+    async def run():
+        await store.lexical_search("products", "acero", company_id="acme")
+        await store.lexical_search("raw_materials", "acero", company_id="acme")
+        await store.lexical_search("products", "acero", company_id="acme")  # most recent again
+        await store.lexical_search("products", "acero", company_id="other")
+
+    asyncio.run(run())
+    assert list(store._lexical) == [(tenant_key("acme"), "products"), (tenant_key("other"), "products")]
+    store.close()